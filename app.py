@@ -1,18 +1,60 @@
 import os
+import io
+import csv
+import json
 import sqlite3
 import hashlib
 import base64
 import hmac
 import re
+import queue
 import random
+import threading
+import functools
+import inspect
+import mimetypes
+import multiprocessing
+import tempfile
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import date, datetime, time, timedelta
+from time import perf_counter
 
 import pandas as pd
 import streamlit as st
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import db_backup
+from report_cards import generate_report_cards
+
+try:
+    # PDF 첫 페이지 미리보기용 (없으면 PDF는 미리보기 없이 다운로드만)
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 
 
 DB_NAME = "academy.db"
 UPLOAD_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+THUMB_DIR = os.path.join(UPLOAD_DIR, "thumbs")
+
+# 연결 풀 크기 (프로세스 전체에서 재사용할 최대 유휴 연결 수)
+DB_POOL_SIZE = 8
+# 연결마다 캐시할 prepared statement 수
+DB_STATEMENT_CACHE = 256
+# 새 연결을 열 때 적용하는 PRAGMA 프로필 (운영 환경에 맞게 여기만 조정)
+DB_PRAGMAS = {
+    "journal_mode": "WAL",        # 읽기와 쓰기가 서로 막지 않도록
+    "synchronous": "NORMAL",      # WAL에서는 NORMAL로도 충돌 시 DB가 깨지지 않음
+    "busy_timeout": 5000,         # 잠금 대기 (ms)
+    "cache_size": -16000,         # 페이지 캐시 약 16MB (음수 = KiB 단위)
+    "mmap_size": 268435456,       # 256MB 메모리 매핑 읽기
+    "temp_store": "MEMORY",
+}
 
 st.markdown(
     """
@@ -47,8 +89,164 @@ st.markdown(sidebar_width_css, unsafe_allow_html=True)
 
 # ============== 공통: DB & 유틸 ==============
 
+class PooledConnection(sqlite3.Connection):
+    """close() 해도 실제로 닫지 않고 연결 풀로 돌려보내는 sqlite3 연결.
+
+    기존 함수들의 `conn = get_connection() ... conn.close()` 패턴을 그대로 두고
+    연결/PRAGMA/statement 캐시를 재사용하기 위한 것.
+    """
+
+    in_pool = False
+
+    def close(self):
+        _release_connection(self)
+
+    def close_for_real(self):
+        super().close()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_db_pool():
+    """프로세스 전체에서 공유하는 유휴 연결 풀.
+
+    Streamlit은 매 rerun마다 스크립트 전체를 다시 실행하므로
+    모듈 전역 변수 대신 cache_resource에 보관해야 rerun 사이에도 유지된다.
+    """
+    return queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_NAME,
+        check_same_thread=False,
+        factory=PooledConnection,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    for name, value in DB_PRAGMAS.items():
+        try:
+            conn.execute(f"PRAGMA {name}={value}")
+        except sqlite3.OperationalError:
+            # 읽기 전용 등으로 적용이 안 되는 PRAGMA는 건너뛴다
+            pass
+    if _query_trace is not None:
+        conn.set_trace_callback(_query_trace)
+    return conn
+
+
+def _release_connection(conn):
+    if conn.in_pool:
+        return
+    try:
+        # 커밋하지 않은 변경은 기존 close()와 동일하게 버린다
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+    except sqlite3.ProgrammingError:
+        # 이미 실제로 닫힌 연결
+        return
+    conn.in_pool = True
+    try:
+        _get_db_pool().put_nowait(conn)
+    except queue.Full:
+        conn.close_for_real()
+
+
 def get_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+    """풀에서 연결을 하나 꺼낸다 (없으면 새로 연다). 사용 후 conn.close()로 반납."""
+    try:
+        conn = _get_db_pool().get_nowait()
+    except queue.Empty:
+        conn = _open_connection()
+    conn.in_pool = False
+    return conn
+
+
+@contextmanager
+def db_transaction():
+    """`with db_transaction() as conn:` 블록 전체를 하나의 트랜잭션으로 실행.
+
+    정상 종료 시 commit, 예외 발생 시 rollback 후 예외를 다시 올린다.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ============== 비밀번호 해시 작업 풀 ==============
+#
+# PBKDF2(200,000회)는 한 번에 수십~수백 ms 걸린다. 수업 시작 시 학생들이 한꺼번에
+# 로그인하면 해시가 CPU를 다 차지하므로, 동시에 도는 해시 개수(HASH_WORKERS)와
+# 대기 가능한 개수(HASH_QUEUE_LIMIT)를 제한한 전용 스레드 풀에서 실행한다.
+# (hashlib.pbkdf2_hmac 은 계산 중 GIL을 놓으므로 스레드로 충분하다.)
+
+HASH_WORKERS = 2
+HASH_QUEUE_LIMIT = 16      # 실행 중 + 대기 중 해시 최대 개수
+HASH_SLOT_WAIT = 3.0       # 자리가 없을 때 기다리는 최대 시간(초)
+
+
+class HashServiceBusy(RuntimeError):
+    """해시 대기열이 가득 차서 요청을 받지 못함 (잠시 후 다시 시도)"""
+
+
+@st.cache_resource(show_spinner=False)
+def _get_hash_service():
+    return {
+        "executor": ThreadPoolExecutor(
+            max_workers=HASH_WORKERS, thread_name_prefix="pw-hash"
+        ),
+        "slots": threading.BoundedSemaphore(HASH_QUEUE_LIMIT),
+        "lock": threading.Lock(),
+        "latencies": deque(maxlen=1000),   # 최근 해시 소요 시간(초, 대기 포함)
+        "rejected": 0,
+    }
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    """해시 작업 풀에서 PBKDF2-HMAC-SHA256 계산. 대기열이 가득 차면 HashServiceBusy."""
+    svc = _get_hash_service()
+    if not svc["slots"].acquire(timeout=HASH_SLOT_WAIT):
+        with svc["lock"]:
+            svc["rejected"] += 1
+        raise HashServiceBusy("password hashing queue is full")
+
+    start = perf_counter()
+    try:
+        future = svc["executor"].submit(
+            hashlib.pbkdf2_hmac, "sha256", password.encode("utf-8"), salt, iterations
+        )
+        dk = future.result()
+    finally:
+        svc["slots"].release()
+
+    with svc["lock"]:
+        svc["latencies"].append(perf_counter() - start)
+    return dk
+
+
+def get_hash_service_stats():
+    """최근 해시 소요 시간 p50/p99(ms)와 거절 횟수"""
+    svc = _get_hash_service()
+    with svc["lock"]:
+        samples = sorted(svc["latencies"])
+        rejected = svc["rejected"]
+
+    def _pct(q):
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+    return {
+        "count": len(samples),
+        "p50_ms": _pct(0.50),
+        "p99_ms": _pct(0.99),
+        "rejected": rejected,
+    }
 
 
 def is_legacy_hash(stored: str) -> bool:
@@ -63,7 +261,7 @@ def hash_password(password: str, iterations: int = 200_000) -> str:
       pbkdf2_sha256$<iterations>$<salt_b64>$<hash_b64>
     """
     salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    dk = _pbkdf2(password, salt, iterations)
     return "pbkdf2_sha256${}${}${}".format(
         iterations,
         base64.b64encode(salt).decode("utf-8"),
@@ -86,7 +284,7 @@ def verify_password(password: str, stored_hash: str) -> bool:
         except Exception:
             return False
 
-        dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+        dk = _pbkdf2(password, salt, iterations)
         return hmac.compare_digest(dk, expected)
 
     # legacy fallback (do not create new hashes in this format)
@@ -122,9 +320,377 @@ def validate_password_strength(pw: str) -> tuple[bool, str]:
     return True, ""
 
 
-def init_db():
+# ============== 조회 캐시 ==============
+
+# 캐시 대상 테이블. 각 테이블의 INSERT/UPDATE/DELETE 트리거가
+# table_versions.version 을 1씩 올린다 (마이그레이션 4 참고).
+VERSIONED_TABLES = [
+    "students",
+    "classes",
+    "class_students",
+    "timetables",
+    "notices",
+    "vocab_sets",
+    "vocab_items",
+]
+QUERY_CACHE_SIZE = 256
+
+
+@st.cache_resource(show_spinner=False)
+def _get_query_cache():
+    """모든 세션이 함께 쓰는 조회 결과 캐시 (LRU)."""
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "hits": 0, "misses": 0}
+
+
+def get_table_versions(tables):
+    """테이블별 현재 버전을 tables 순서대로 튜플로 반환."""
     conn = get_connection()
     cur = conn.cursor()
+    placeholders = ",".join(["?"] * len(tables))
+    cur.execute(
+        f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})",
+        list(tables),
+    )
+    versions = dict(cur.fetchall())
+    conn.close()
+    return tuple(versions.get(t, 0) for t in tables)
+
+
+def cached_query(*tables):
+    """
+    조회 함수 결과를 (함수, 인자, 관련 테이블 버전) 키로 캐시하는 데코레이터.
+    테이블이 바뀌면 트리거가 버전을 올리므로 다음 호출부터 자동으로 다시 조회한다.
+    오래된 버전의 결과는 LRU 로 밀려나 사라진다.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (
+                func.__name__,
+                tuple(tuple(a) if isinstance(a, list) else a for a in args),
+                tuple(sorted(kwargs.items())),
+                get_table_versions(tables),
+            )
+            cache = _get_query_cache()
+            entries = cache["entries"]
+            with cache["lock"]:
+                if key in entries:
+                    entries.move_to_end(key)
+                    cache["hits"] += 1
+                    return list(entries[key])
+                cache["misses"] += 1
+
+            rows = func(*args, **kwargs)
+
+            with cache["lock"]:
+                entries[key] = rows
+                entries.move_to_end(key)
+                while len(entries) > QUERY_CACHE_SIZE:
+                    entries.popitem(last=False)
+            return list(rows)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def get_query_cache_stats():
+    cache = _get_query_cache()
+    with cache["lock"]:
+        return {
+            "entries": len(cache["entries"]),
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+        }
+
+
+# ============== 인덱스 ==============
+
+# 앱이 실제로 쓰는 WHERE / ORDER BY 모양에 맞춘 보조 인덱스.
+# 컬럼 순서: 등치 조건 → 범위/정렬 컬럼 → (커버링용) 조회 컬럼
+SECONDARY_INDEXES = [
+    # 출결: 일별 현황/대시보드 카운트 (date=? [AND class_id=?] ORDER BY checkin_time)
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date "
+    "ON attendance (date, class_id, checkin_time)",
+    # 출결: 학생별 월/최근 기록 (student_id=? AND date BETWEEN / ORDER BY date DESC)
+    "CREATE INDEX IF NOT EXISTS idx_attendance_student_date "
+    "ON attendance (student_id, date, checkin_time, status)",
+    # 출결: 반별 월간 캘린더 (class_id=? AND date BETWEEN)
+    "CREATE INDEX IF NOT EXISTS idx_attendance_class_date "
+    "ON attendance (class_id, date, status)",
+    # 반-학생 매핑 (양방향 조회)
+    "CREATE INDEX IF NOT EXISTS idx_class_students_class "
+    "ON class_students (class_id, student_id)",
+    "CREATE INDEX IF NOT EXISTS idx_class_students_student "
+    "ON class_students (student_id, class_id)",
+    # 성적: 학생별 조회 (student_id=? [AND subject=?] ORDER BY date)
+    "CREATE INDEX IF NOT EXISTS idx_school_scores_student_date "
+    "ON school_scores (student_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_academy_scores_student_date "
+    "ON academy_scores (student_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_academy_scores_class "
+    "ON academy_scores (class_id, date)",
+    # 성적: 대시보드 '최근 30일 입력 수' (date>=?) → 인덱스만으로 COUNT
+    "CREATE INDEX IF NOT EXISTS idx_school_scores_date "
+    "ON school_scores (date)",
+    "CREATE INDEX IF NOT EXISTS idx_academy_scores_date "
+    "ON academy_scores (date)",
+    # 진도: 학생별 / 반별 최근 진도 (ORDER BY date DESC, id DESC)
+    "CREATE INDEX IF NOT EXISTS idx_academy_progress_student_date "
+    "ON academy_progress (student_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_academy_progress_class_date "
+    "ON academy_progress (class_id, date)",
+    # 진도: 보관할 학년도 집계 / 기간 내보내기 (date < ? / date BETWEEN)
+    "CREATE INDEX IF NOT EXISTS idx_academy_progress_date "
+    "ON academy_progress (date)",
+    # 시간표
+    "CREATE INDEX IF NOT EXISTS idx_timetables_class "
+    "ON timetables (class_id, weekday, start_time)",
+    # 학생 목록 (ORDER BY name)
+    "CREATE INDEX IF NOT EXISTS idx_students_name "
+    "ON students (name)",
+    # 승인 대기 목록 (role=? AND is_approved=0)
+    "CREATE INDEX IF NOT EXISTS idx_users_role_approved "
+    "ON users (role, is_approved)",
+    # 공지 (ORDER BY pinned DESC, created_at DESC)
+    "CREATE INDEX IF NOT EXISTS idx_notices_pinned_created "
+    "ON notices (pinned, created_at)",
+    # 단어장
+    "CREATE INDEX IF NOT EXISTS idx_vocab_sets_active_created "
+    "ON vocab_sets (is_active, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_vocab_items_set "
+    "ON vocab_items (set_id)",
+    "CREATE INDEX IF NOT EXISTS idx_vocab_assignments_set "
+    "ON vocab_assignments (set_id, assigned_at)",
+    "CREATE INDEX IF NOT EXISTS idx_vocab_assignments_class "
+    "ON vocab_assignments (class_id)",
+    "CREATE INDEX IF NOT EXISTS idx_vocab_assignments_student "
+    "ON vocab_assignments (student_id)",
+    "CREATE INDEX IF NOT EXISTS idx_vocab_results_set_taken "
+    "ON vocab_results (set_id, taken_at)",
+    # 단어 시험: 기간 내보내기 (taken_at BETWEEN)
+    "CREATE INDEX IF NOT EXISTS idx_vocab_results_taken "
+    "ON vocab_results (taken_at)",
+    # 시험지 / 자료 (student_id=? ORDER BY exam_date DESC, uploaded_at DESC)
+    "CREATE INDEX IF NOT EXISTS idx_exam_documents_student "
+    "ON exam_documents (student_id, exam_date, uploaded_at)",
+]
+
+
+def create_secondary_indexes(conn):
+    """SECONDARY_INDEXES 생성 (커밋은 호출한 쪽에서). 만들 수 없는 인덱스는 건너뛴다."""
+    cur = conn.cursor()
+    for ddl in SECONDARY_INDEXES:
+        try:
+            cur.execute(ddl)
+        except sqlite3.OperationalError:
+            # 컬럼이 없는 구버전 테이블 등은 건너뛴다
+            pass
+
+
+# EXPLAIN QUERY PLAN 으로 인덱스 회귀를 확인할 데이터 함수 (이름 → (함수 이름, 예시 인자)).
+# SQL 을 따로 베껴 두지 않고, find_full_scans() 가 실제 함수를 실행하면서
+# 나간 SELECT 문을 모아 그대로 검사한다. 조회하는 데이터 함수(화면 함수 제외)는
+# 모두 여기나 QUERY_PLAN_EXCLUDED 중 한 곳에 있어야 한다 (tests/test_query_plans.py).
+QUERY_PLAN_CHECKS = {
+    "get_table_versions": ("get_table_versions", (("students", "classes"),)),
+    "get_students": ("get_students", ()),
+    "get_classes": ("get_classes", ()),
+    "get_notices": ("get_notices", ()),
+    "get_archive_years": ("get_archive_years", ()),
+    "get_archivable_years": ("get_archivable_years", ()),
+    "get_recent_attendance_for_student_safe": (
+        "get_recent_attendance_for_student_safe", (1, 20),
+    ),
+    "get_attendance_records": ("get_attendance_records", ("2024-01-01", 1)),
+    "get_attendance_for_student_month": ("get_attendance_for_student_month", (1, 2024, 1)),
+    "get_recent_attendance_for_student": ("get_recent_attendance_for_student", (1, 20)),
+    "get_attendance_worst_status_for_student_month": (
+        "get_attendance_worst_status_for_student_month", (1, 2024, 1),
+    ),
+    "get_attendance_month_summary": ("get_attendance_month_summary", (2024, 1, 1)),
+    "get_class_attendance_month": (
+        "get_class_attendance_month", (1, "2024-01-01", "2024-01-31"),
+    ),
+    "get_dashboard_counts": ("get_dashboard_counts", ("2024-01-01", "2024-01-01")),
+    "get_classes_for_student": ("get_classes_for_student", (1,)),
+    "get_class_students": ("get_class_students", (1,)),
+    "get_timetables_for_classes": ("get_timetables_for_classes", ([1, 2],)),
+    "get_scores_for_student.school": ("get_scores_for_student", ("school_scores", 1, "수학")),
+    "get_scores_for_student.academy": ("get_scores_for_student", ("academy_scores", 1)),
+    "get_progress_for_student": ("get_progress_for_student", (1,)),
+    "get_last_class_progress": ("get_last_class_progress", (1,)),
+    "get_waiting_admins": ("get_waiting_admins", ()),
+    "login_user": ("login_user", ("no-such-user", "")),
+    "get_vocab_items": ("get_vocab_items", (1,)),
+    "get_vocab_assignments_for_set": ("get_vocab_assignments_for_set", (1,)),
+    "get_vocab_results_for_set": ("get_vocab_results_for_set", (1,)),
+    "fetch_data_records_page.school_scores": (
+        "fetch_data_records_page", ("학교 성적", [("sc.student_id", 1)], ("2024-01-01", 1)),
+    ),
+    "fetch_data_records_page.attendance": (
+        "fetch_data_records_page",
+        ("출석", [("a.date", "2024-01-01"), ("a.class_id", 1)], ("2024-01-01", 1)),
+    ),
+    "count_data_records.school_scores": (
+        "count_data_records", ("학교 성적", [("sc.student_id", 1)]),
+    ),
+    "count_data_records.attendance": (
+        "count_data_records", ("출석", [("a.date", "2024-01-01"), ("a.class_id", 1)]),
+    ),
+    "get_exam_documents_for_student": ("get_exam_documents_for_student", (1,)),
+    "_get_exam_document_student": ("_get_exam_document_student", (1,)),
+    "get_vocab_sets": ("get_vocab_sets", ()),
+    "get_assigned_vocab_sets_for_student": ("get_assigned_vocab_sets_for_student", (1,)),
+    "search_all": ("search_all", ("김",)),
+    "_load_score_frame": ("_load_score_frame", ()),
+    "collect_report_card_data": (
+        "collect_report_card_data", ([1, 2], "2024-03-01", "2025-02-28"),
+    ),
+    # 내보내기: 기간 + 반 조건을 모두 준 경우
+    "iter_export_chunks.attendance": (
+        "iter_export_chunks", ("attendance", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.academy_scores": (
+        "iter_export_chunks", ("academy_scores", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.school_scores": (
+        "iter_export_chunks", ("school_scores", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.academy_progress": (
+        "iter_export_chunks", ("academy_progress", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.vocab_results": (
+        "iter_export_chunks", ("vocab_results", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.students": (
+        "iter_export_chunks", ("students", "2024-03-01", "2025-02-28", 1),
+    ),
+    "iter_export_chunks.class_students": (
+        "iter_export_chunks", ("class_students", "2024-03-01", "2025-02-28", 1),
+    ),
+}
+# 목록 전체를 읽는 게 목적이라 해당 테이블 SCAN 이 정상인 검사 (검사 이름 → 테이블)
+QUERY_PLAN_FULL_SCANS = {
+    "get_students": {"students"},
+    "get_classes": {"classes"},
+    "get_notices": {"notices"},
+    "_load_score_frame": {"school_scores", "academy_scores", "class_students"},
+}
+# 조회가 있지만 검사하지 않는 데이터 함수 (함수 이름 → 이유)
+QUERY_PLAN_EXCLUDED = {
+    "find_full_scans": "검사 도구 자체",
+    "run_migrations": "스키마 작업 (schema_version 만 읽음)",
+    "history_connection": "보관 파일을 합친 FROM 절만 만듦 (조회는 부르는 함수에서 검사)",
+    "promote_all_students_if_needed": "학년도에 한 번 전체 학생 학년을 고치는 UPDATE",
+    "archive_academic_year": "학년도 전체를 옮기는 관리 작업",
+    "issue_session_token": "users 기본키 조회 (빈 DB 에서는 실행할 수 없음)",
+    "validate_session_token": "users 기본키 조회 (서명이 맞는 토큰이 있어야 실행됨)",
+    "_fetch_student_month_attendance": "get_attendance_for_student_month 등으로 검사",
+    "get_common_subjects": "고정 목록을 반환 (뒤의 조회 코드는 실행되지 않음)",
+    "_existing_pairs": "일괄 등록 중복 검사용으로 기존 키 전체를 읽음",
+    "apply_bulk_import": "MAX(id) / id > ? 기본키 조회",
+    "add_exam_document": "content_hash 조회 (idx_exam_documents_hash), 파일이 있어야 실행됨",
+    "delete_exam_document": "id / content_hash 조회 (idx_exam_documents_hash), 행이 있어야 실행됨",
+}
+# 행이 몇 개 안 되는 관리용 테이블은 전체 SCAN 이어도 문제 삼지 않는다
+# (search_index_config 는 FTS5 가 MATCH 때마다 읽는 한 줄짜리 설정 테이블)
+QUERY_PLAN_SMALL_TABLES = {
+    "archive_years", "table_versions", "schema_version", "search_index_config",
+}
+# FROM/JOIN 뒤의 테이블 이름과 별칭 (plan 의 "SCAN 별칭" 을 테이블 이름으로 바꾸는 데 사용)
+_PLAN_TABLE_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE
+)
+
+_query_trace = None     # capture_queries() 블록 안에서만 설정됨
+
+
+@contextmanager
+def capture_queries():
+    """블록 안에서 get_connection() 연결로 실행된 SQL(파라미터가 채워진 문장)을 모은다."""
+    global _query_trace
+    statements = []
+
+    def set_pool_trace(callback):
+        pool = _get_db_pool()
+        idle = []
+        while True:
+            try:
+                idle.append(pool.get_nowait())
+            except queue.Empty:
+                break
+        for conn in idle:
+            conn.set_trace_callback(callback)
+            pool.put_nowait(conn)
+
+    set_pool_trace(statements.append)
+    _query_trace = statements.append
+    try:
+        yield statements
+    finally:
+        _query_trace = None
+        set_pool_trace(None)
+
+
+def find_full_scans():
+    """QUERY_PLAN_CHECKS 함수들이 실행하는 SELECT 중 테이블 전체 SCAN이 생기는 것을 반환.
+
+    반환값: {체크 이름: ["SCAN ... (테이블)", ...]} (문제 없으면 빈 dict)
+    조회 캐시를 거치지 않도록 cached_query 로 감싼 함수는 원래 함수를 부른다.
+    plan 에는 별칭만 나오므로 SQL 의 FROM/JOIN 에서 테이블 이름을 찾아 판단하고,
+    서브쿼리·FTS 가상 테이블처럼 실제 테이블이 아닌 SCAN 은 건너뛴다.
+    """
+    problems = {}
+    for name, (func_name, args) in QUERY_PLAN_CHECKS.items():
+        func = globals()[func_name]
+        func = getattr(func, "__wrapped__", func)
+        with capture_queries() as statements:
+            result = func(*args)
+            if inspect.isgenerator(result):
+                for _ in result:
+                    pass
+        selects = [
+            sql for sql in statements
+            if sql.lstrip().upper().startswith(("SELECT", "WITH"))
+        ]
+        allowed = QUERY_PLAN_SMALL_TABLES | QUERY_PLAN_FULL_SCANS.get(name, set())
+        conn = get_connection()
+        try:
+            tables = {
+                r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            }
+            scans = []
+            for sql in selects:
+                aliases = {
+                    alias: table
+                    for table, alias in _PLAN_TABLE_ALIAS_RE.findall(sql) if alias
+                }
+                for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall():
+                    detail = row[3]
+                    if not detail.startswith("SCAN ") or "VIRTUAL TABLE" in detail:
+                        continue
+                    target = detail.split()[1].split(".")[-1]
+                    table = aliases.get(target, target)
+                    if table not in tables or table in allowed:
+                        continue
+                    scans.append(f"{detail} ({table})")
+        finally:
+            conn.close()
+        if scans:
+            problems[name] = scans
+    return problems
+
+
+# ============== 스키마 마이그레이션 ==============
+#
+# schema_version 테이블에 적용된 버전을 기록하고, MIGRATIONS의 단계를 순서대로
+# 한 번씩만 적용한다. 스키마를 바꿀 때는 기존 단계를 고치지 말고
+# MIGRATIONS 끝에 새 단계를 추가할 것.
+
+def _migration_001_base_tables(conn):
+    """기본 테이블 생성."""
+    cur = conn.cursor()
 
     # 사용자 (마스터/관리자/학생)
     cur.execute(
@@ -397,31 +963,12 @@ def init_db():
         """
     )
 
-    conn.commit()
-
-    # 마스터 계정 없으면 생성
-    cur.execute("SELECT id FROM users WHERE role='master'")
-    row = cur.fetchone()
-    if row is None:
-        cur.execute(
-            """
-            INSERT INTO users
-            (username, password_hash, role, is_approved, student_id, is_active)
-            VALUES (?, ?, 'master', 1, NULL, 1)
-            """,
-            ("master", hash_password("master1234")),
-        )
-        conn.commit()
-
-    conn.close()
-
 
-
-# ============== 스키마 보정(마이그레이션) ==============
-
-def _get_table_columns(table_name: str):
+def _get_table_columns(table_name: str, conn=None):
     """SQLite 테이블의 컬럼명 리스트 반환. 테이블이 없으면 빈 리스트."""
-    conn = get_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
     cur = conn.cursor()
     try:
         cur.execute(f"PRAGMA table_info({table_name})")
@@ -429,19 +976,14 @@ def _get_table_columns(table_name: str):
     except sqlite3.OperationalError:
         cols = []
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
     return cols
 
 
-def ensure_attendance_schema():
+def _migration_002_attendance_columns(conn):
     """구버전 DB(컬럼 누락)에서도 앱이 죽지 않도록 attendance 스키마를 보정."""
-    cols = set(_get_table_columns("attendance"))
-    if not cols:
-        # 테이블 자체가 없으면 init_db가 만들도록 하고 다시 확인
-        init_db()
-        cols = set(_get_table_columns("attendance"))
-        if not cols:
-            return
+    cols = set(_get_table_columns("attendance", conn))
 
     # 누락 컬럼 추가 (구버전 호환)
     add_cols = []
@@ -456,115 +998,585 @@ def ensure_attendance_schema():
     if "recorded_by" not in cols:
         add_cols.append(("recorded_by", "INTEGER"))
 
-    if add_cols:
-        conn = get_connection()
-        cur = conn.cursor()
-        for c, typ in add_cols:
-            try:
-                cur.execute(f"ALTER TABLE attendance ADD COLUMN {c} {typ}")
-            except sqlite3.OperationalError:
-                # 이미 있거나, 다른 이유(읽기전용 등)면 무시하고 진행
-                pass
-        conn.commit()
-        conn.close()
+    cur = conn.cursor()
+    for c, typ in add_cols:
+        cur.execute(f"ALTER TABLE attendance ADD COLUMN {c} {typ}")
 
 
-def get_recent_attendance_for_student_safe(student_id: int, limit: int = 100):
-    """attendance 컬럼 누락/구버전 DB에서도 안전하게 최근 출결을 가져온다."""
-    ensure_attendance_schema()
-    cols = _get_table_columns("attendance")
-    # 조회 가능한 컬럼만 선택
-    wanted = ["date", "checkin_time", "status", "homework_status", "daily_test_status"]
-    select_cols = [c for c in wanted if c in cols]
-    if not select_cols:
-        return [], select_cols
+def _migration_003_secondary_indexes(conn):
+    """조회 패턴 기준 보조 인덱스 (SECONDARY_INDEXES 참고)."""
+    create_secondary_indexes(conn)
 
-    q = f"""
-        SELECT {', '.join(select_cols)}
-        FROM attendance
-        WHERE student_id=?
-        ORDER BY date DESC
-        LIMIT ?
-    """
 
-    conn = get_connection()
+def _migration_004_table_versions(conn):
+    """조회 캐시 무효화용 테이블 버전 카운터 + 변경 트리거 (VERSIONED_TABLES 참고)."""
     cur = conn.cursor()
-    try:
-        cur.execute(q, (student_id, limit))
-        rows = cur.fetchall()
-    except sqlite3.OperationalError:
-        # 마지막 방어: 스키마 한번 더 보정 후 재시도
-        ensure_attendance_schema()
-        cols = _get_table_columns("attendance")
-        select_cols = [c for c in wanted if c in cols]
-        if not select_cols:
-            conn.close()
-            return [], select_cols
-        q = f"""
-            SELECT {', '.join(select_cols)}
-            FROM attendance
-            WHERE student_id=?
-            ORDER BY date DESC
-            LIMIT ?
+    cur.execute(
         """
-        cur.execute(q, (student_id, limit))
-        rows = cur.fetchall()
-    finally:
-        conn.close()
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    for table in VERSIONED_TABLES:
+        _create_version_triggers(cur, table)
 
-    return rows, select_cols
+
+def _create_version_triggers(cur, table):
+    """table 의 INSERT/UPDATE/DELETE 마다 table_versions 버전을 올리는 트리거"""
+    cur.execute(
+        "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+        (table,),
+    )
+    for action in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{action.lower()}_version
+            AFTER {action} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1
+                WHERE table_name = '{table}';
+            END
+            """
+        )
 
 
+def _migration_005_session_tokens(conn):
+    """로그인 유지 토큰: 사용자별 폐기 카운터 + 서명 키 저장 테이블."""
+    cur = conn.cursor()
+    if "token_version" not in set(_get_table_columns("users", conn)):
+        cur.execute(
+            "ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"
+        )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS app_secrets (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """
+    )
 
-# ============== 인증 / 유저 ==============
 
-def create_admin(username: str, password: str) -> bool:
-    conn = get_connection()
+def _migration_006_grade_promotion_log(conn):
+    """학년 자동 승급 실행 기록 (몇 명이 승급됐는지 감사용)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS grade_promotion_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            year INTEGER NOT NULL,
+            promoted_count INTEGER NOT NULL,
+            run_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _migration_007_search_index(conn):
+    """통합 검색용 FTS5 색인 + 동기화 트리거 + 기존 데이터 색인 (SEARCH_SOURCES 참고)."""
     cur = conn.cursor()
     try:
         cur.execute(
             """
-            INSERT INTO users
-            (username, password_hash, role, is_approved, student_id, is_active)
-            VALUES (?, ?, 'admin', 0, NULL, 1)
-            """,
-            (username, hash_password(password)),
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index
+            USING fts5(title, body, tokenize='unicode61', prefix='1 2 3')
+            """
         )
-        conn.commit()
-        ok = True
-    except sqlite3.IntegrityError:
-        ok = False
-    finally:
-        conn.close()
-    return ok
+    except sqlite3.OperationalError:
+        # FTS5 없이 빌드된 sqlite → 검색 기능만 비활성화
+        return
+    # 제목 일치를 본문보다 높게 (ORDER BY rank 에 적용)
+    cur.execute(
+        "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(5.0, 1.0)')"
+    )
 
+    for code, (table, _, title_cols, body_cols) in SEARCH_SOURCES.items():
+        def _doc(ref):
+            title_sql = _search_text_sql(ref, title_cols)
+            body_sql = _search_text_sql(ref, body_cols)
+            return f"{ref}.id * {SEARCH_KIND_SLOTS} + {code}, {title_sql}, {body_sql}"
 
-def create_student_user(student_id: int, username: str, password: str) -> bool:
-    conn = get_connection()
+        cols = ", ".join(title_cols + body_cols)
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ai
+            AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO search_index (rowid, title, body) VALUES ({_doc("NEW")});
+            END
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_au
+            AFTER UPDATE OF {cols} ON {table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = OLD.id * {SEARCH_KIND_SLOTS} + {code};
+                INSERT INTO search_index (rowid, title, body) VALUES ({_doc("NEW")});
+            END
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ad
+            AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = OLD.id * {SEARCH_KIND_SLOTS} + {code};
+            END
+            """
+        )
+        cur.execute(
+            f"""
+            INSERT OR REPLACE INTO search_index (rowid, title, body)
+            SELECT {_doc(table)} FROM {table}
+            """
+        )
+
+
+def _migration_008_exam_document_hashes(conn):
+    """시험지 파일 내용 해시(중복 제거/참조 수) 컬럼 추가 + 기존 파일 해시 계산."""
     cur = conn.cursor()
-    try:
+    cols = set(_get_table_columns("exam_documents", conn))
+    if "content_hash" not in cols:
+        cur.execute("ALTER TABLE exam_documents ADD COLUMN content_hash TEXT")
+    if "file_size" not in cols:
+        cur.execute("ALTER TABLE exam_documents ADD COLUMN file_size INTEGER")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_exam_documents_hash "
+        "ON exam_documents (content_hash)"
+    )
+
+    # 기존 파일은 옮기지 않고 해시만 기록 → 이후 같은 내용 업로드 시 재사용됨
+    cur.execute("SELECT id, file_path FROM exam_documents WHERE content_hash IS NULL")
+    for doc_id, path in cur.fetchall():
+        try:
+            with open(path, "rb") as f:
+                digest, size = _hash_stream(f)
+        except OSError:
+            continue
+        conn.execute(
+            "UPDATE exam_documents SET content_hash=?, file_size=? WHERE id=?",
+            (digest, size, doc_id),
+        )
+
+
+
+def _migration_009_archive_years(conn):
+    """학년도별 보관(archive) DB 파일 목록. 통합 조회 시 여기 적힌 연도만 ATTACH 한다."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archive_years (
+            year INTEGER PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            row_counts TEXT,
+            archived_at TEXT NOT NULL
+        )
+        """
+    )
+    _create_version_triggers(cur, "archive_years")
+
+
+def _migration_010_score_versions(conn):
+    """성적 분석 캐시 무효화용 school_scores / academy_scores 버전 트리거."""
+    cur = conn.cursor()
+    for table in SCORE_TABLES:
+        _create_version_triggers(cur, table)
+
+
+def _migration_011_date_indexes(conn):
+    """진도 / 단어 시험 날짜 인덱스 (SECONDARY_INDEXES 에 추가된 것만 새로 생김)."""
+    create_secondary_indexes(conn)
+
+
+# (버전, 설명, 적용 함수) — 버전 순서대로 정렬되어 있어야 한다.
+MIGRATIONS = [
+    (1, "기본 테이블 생성", _migration_001_base_tables),
+    (2, "attendance 누락 컬럼 보정", _migration_002_attendance_columns),
+    (3, "보조 인덱스 생성", _migration_003_secondary_indexes),
+    (4, "조회 캐시용 테이블 버전 트리거", _migration_004_table_versions),
+    (5, "로그인 유지 토큰", _migration_005_session_tokens),
+    (6, "학년 승급 실행 기록", _migration_006_grade_promotion_log),
+    (7, "통합 검색 색인(FTS5)", _migration_007_search_index),
+    (8, "시험지 파일 내용 해시", _migration_008_exam_document_hashes),
+    (9, "학년도별 보관 DB 목록", _migration_009_archive_years),
+    (10, "성적 테이블 버전 트리거", _migration_010_score_versions),
+    (11, "진도/단어 시험 날짜 인덱스", _migration_011_date_indexes),
+]
+
+
+def _ensure_master_account(conn):
+    """마스터 계정 없으면 생성"""
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM users WHERE role='master'")
+    row = cur.fetchone()
+    if row is None:
         cur.execute(
             """
             INSERT INTO users
             (username, password_hash, role, is_approved, student_id, is_active)
-            VALUES (?, ?, 'student', 0, ?, 1)   -- 🔴 1 → 0
+            VALUES (?, ?, 'master', 1, NULL, 1)
             """,
-            (username, hash_password(password), student_id),
+            ("master", hash_password("master1234")),
         )
         conn.commit()
-        ok = True
-    except sqlite3.IntegrityError:
-        ok = False
-    finally:
-        conn.close()
-    return ok
 
 
-def login_user(username: str, password: str):
+def run_migrations():
+    """아직 적용되지 않은 MIGRATIONS 단계를 순서대로 적용.
+
+    각 단계는 schema_version 기록과 함께 하나의 트랜잭션으로 실행된다.
+    반환값: 이번에 적용한 버전 목록
+    """
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        """
+    applied = []
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current = cur.fetchone()[0]
+
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            cur.execute("BEGIN")
+            try:
+                step(conn)
+                cur.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.now().isoformat()),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+
+        _ensure_master_account(conn)
+    finally:
+        conn.close()
+    return applied
+
+
+@st.cache_resource(show_spinner=False)
+def _schema_ready(db_name: str) -> bool:
+    # cache_resource: 프로세스(와 DB 파일)당 한 번만 실행되고, 동시에 들어온
+    # 세션은 첫 실행이 끝날 때까지 기다린다.
+    run_migrations()
+    return True
+
+
+def ensure_schema():
+    """프로세스당 한 번만 마이그레이션을 실행. 이후 rerun에서는 DDL/스키마 조회 없음."""
+    _schema_ready(DB_NAME)
+
+
+def get_recent_attendance_for_student_safe(student_id: int, limit: int = 100):
+    """attendance 컬럼 누락/구버전 DB에서도 안전하게 최근 출결을 가져온다.
+
+    스키마는 ensure_schema()에서 이미 보정되어 있으므로 평소에는 바로 조회하고,
+    조회가 실패할 때만 실제 컬럼을 확인해 가능한 컬럼으로 다시 조회한다.
+    """
+    wanted = ["date", "checkin_time", "status", "homework_status", "daily_test_status"]
+    select_cols = wanted
+
+    def _query(cols):
+        cur.execute(
+            f"""
+            SELECT {', '.join(cols)}
+            FROM {src['attendance']}
+            WHERE student_id=?
+            ORDER BY date DESC
+            LIMIT ?
+            """,
+            (student_id, limit),
+        )
+        return cur.fetchall()
+
+    # 보관된 학년도 기록도 함께 조회
+    with history_connection(["attendance"]) as (conn, src):
+        cur = conn.cursor()
+        try:
+            rows = _query(select_cols)
+        except sqlite3.OperationalError:
+            # 마지막 방어: 실제 존재하는 컬럼만 골라서 재시도
+            cols = _get_table_columns("attendance", conn)
+            select_cols = [c for c in wanted if c in cols]
+            if not select_cols:
+                return [], select_cols
+            rows = _query(select_cols)
+
+    return rows, select_cols
+
+
+
+# ============== DB 백업 / 복원 ==============
+#
+# 실제 복사·보관 정책·무결성 검사는 db_backup.py (명령줄에서도 실행 가능).
+# 앱 프로세스마다 백그라운드 스레드 하나가 주기적으로 확인해서, 마지막 스냅샷이
+# db_backup.BACKUP_INTERVAL 보다 오래됐으면 새 스냅샷을 만들고 오래된 것을 정리한다.
+
+BACKUP_CHECK_INTERVAL = 300     # 자동 백업 확인 간격(초)
+
+
+@st.cache_resource(show_spinner=False)
+def _backup_service(db_name: str):
+    state = {
+        "lock": threading.Lock(),   # 자동/수동 백업과 복원이 겹치지 않게
+        "last_check": None,
+        "last_snapshot": None,
+        "last_error": None,
+    }
+
+    def _loop():
+        while True:
+            with state["lock"]:
+                try:
+                    path = db_backup.run_scheduled_backup(db_name, db_backup.BACKUP_DIR)
+                    if path:
+                        state["last_snapshot"] = path
+                    state["last_error"] = None
+                except (db_backup.BackupError, sqlite3.Error, OSError) as e:
+                    state["last_error"] = str(e)
+                state["last_check"] = datetime.now()
+            threading.Event().wait(BACKUP_CHECK_INTERVAL)
+
+    threading.Thread(target=_loop, name="db-backup", daemon=True).start()
+    return state
+
+
+def start_backup_scheduler():
+    """프로세스당 한 번 자동 백업 스레드 시작 (이후 호출은 상태만 반환)"""
+    return _backup_service(DB_NAME)
+
+
+def backup_now():
+    """수동 스냅샷 생성 + 보관 정책 적용 → 스냅샷 경로"""
+    state = start_backup_scheduler()
+    with state["lock"]:
+        path = db_backup.create_snapshot(DB_NAME, db_backup.BACKUP_DIR)
+        db_backup.prune_snapshots(db_backup.BACKUP_DIR)
+        state["last_snapshot"] = path
+    return path
+
+
+def restore_database(snapshot_name):
+    """
+    스냅샷으로 DB 복원 → 복원 직전 상태 스냅샷 경로.
+    복원된 DB가 예전 스키마일 수 있으므로 마이그레이션을 다시 확인하고,
+    프로세스 메모리에 든 조회 결과를 비운다.
+    """
+    state = start_backup_scheduler()
+    path = os.path.join(db_backup.BACKUP_DIR, os.path.basename(snapshot_name))
+    with state["lock"]:
+        before = db_backup.restore_snapshot(path, DB_NAME, db_backup.BACKUP_DIR)
+
+    cache = _get_query_cache()
+    with cache["lock"]:
+        cache["entries"].clear()
+    _grade_promotion_state.clear()
+    _schema_ready.clear()
+    ensure_schema()
+    return before
+
+
+# ============== 로그인 시도 제한 ==============
+#
+# (아이디, 접속 주소)별 / 세션별 토큰 버킷. 로그인 시도마다 토큰 1개를 쓰고 초당
+# LOGIN_REFILL_PER_SEC 만큼 다시 찬다. 연속 실패가 LOGIN_BACKOFF_AFTER 회를
+# 넘으면 실패할 때마다 잠금 시간이 두 배로 늘어난다 (최대 LOGIN_BACKOFF_MAX).
+# 거절은 비밀번호 해시 전에 하므로 비용이 거의 없다.
+#
+# 아이디만으로 잠그면 남이 틀린 비밀번호를 넣어 그 계정을 잠가 버릴 수 있으므로,
+# 아이디 버킷은 접속 주소(IP, 모르면 세션)와 묶는다. 새 세션을 열어도 같은 주소면
+# 같은 버킷이라 세션 버킷만 있을 때처럼 쉽게 피해 가지 못한다. 주소만으로 묶는
+# 버킷은 두지 않는다 (학원 와이파이처럼 여러 학생이 한 주소로 로그인함).
+
+LOGIN_BURST = 5
+LOGIN_REFILL_PER_SEC = 1 / 30
+LOGIN_BACKOFF_AFTER = 5
+LOGIN_BACKOFF_BASE = 10        # 초
+LOGIN_BACKOFF_MAX = 15 * 60    # 초
+LOGIN_LIMITER_MAX_KEYS = 10_000
+
+
+@st.cache_resource(show_spinner=False)
+def _get_login_limiter():
+    return {
+        "lock": threading.Lock(),
+        "buckets": OrderedDict(),  # key → {"tokens", "updated", "failures", "blocked_until"}
+        "allowed": 0,
+        "rejected_rate": 0,
+        "rejected_backoff": 0,
+        "failures": 0,
+    }
+
+
+def _login_limiter_keys(username, client_id, ip_address=None):
+    user = (username or "").strip().lower()
+    return [("user", f"{user}@{ip_address or client_id}"), ("session", client_id)]
+
+
+def _login_bucket(limiter, key, now):
+    buckets = limiter["buckets"]
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = {"tokens": float(LOGIN_BURST), "updated": now,
+                  "failures": 0, "blocked_until": 0.0}
+        buckets[key] = bucket
+        while len(buckets) > LOGIN_LIMITER_MAX_KEYS:
+            buckets.popitem(last=False)
+    else:
+        bucket["tokens"] = min(
+            float(LOGIN_BURST),
+            bucket["tokens"] + (now - bucket["updated"]) * LOGIN_REFILL_PER_SEC,
+        )
+        bucket["updated"] = now
+        buckets.move_to_end(key)
+    return bucket
+
+
+def check_login_allowed(username, client_id, ip_address=None):
+    """
+    로그인 시도를 허용할지 판단하고 허용되면 토큰을 쓴다.
+    반환: (허용 여부, 다시 시도 가능까지 남은 초)
+    """
+    limiter = _get_login_limiter()
+    now = perf_counter()
+    with limiter["lock"]:
+        buckets = [
+            _login_bucket(limiter, k, now)
+            for k in _login_limiter_keys(username, client_id, ip_address)
+        ]
+
+        wait = max(b["blocked_until"] - now for b in buckets)
+        if wait > 0:
+            limiter["rejected_backoff"] += 1
+            return False, int(wait) + 1
+
+        short = [b for b in buckets if b["tokens"] < 1]
+        if short:
+            limiter["rejected_rate"] += 1
+            wait = max((1 - b["tokens"]) / LOGIN_REFILL_PER_SEC for b in short)
+            return False, int(wait) + 1
+
+        for b in buckets:
+            b["tokens"] -= 1
+        limiter["allowed"] += 1
+        return True, 0
+
+
+def record_login_result(username, client_id, success, ip_address=None):
+    """로그인 결과 반영: 성공하면 연속 실패 초기화, 실패가 쌓이면 잠금 시간 증가"""
+    limiter = _get_login_limiter()
+    now = perf_counter()
+    with limiter["lock"]:
+        for key in _login_limiter_keys(username, client_id, ip_address):
+            bucket = _login_bucket(limiter, key, now)
+            if success:
+                bucket["failures"] = 0
+                bucket["blocked_until"] = 0.0
+                continue
+            bucket["failures"] += 1
+            over = bucket["failures"] - LOGIN_BACKOFF_AFTER
+            if over >= 0:
+                bucket["blocked_until"] = now + min(
+                    LOGIN_BACKOFF_BASE * (2 ** over), LOGIN_BACKOFF_MAX
+                )
+        if not success:
+            limiter["failures"] += 1
+
+
+def get_login_limiter_stats():
+    limiter = _get_login_limiter()
+    now = perf_counter()
+    with limiter["lock"]:
+        blocked = [
+            (key, int(b["blocked_until"] - now) + 1, b["failures"])
+            for key, b in limiter["buckets"].items()
+            if b["blocked_until"] > now
+        ]
+        return {
+            "allowed": limiter["allowed"],
+            "rejected_rate": limiter["rejected_rate"],
+            "rejected_backoff": limiter["rejected_backoff"],
+            "failures": limiter["failures"],
+            "tracked_keys": len(limiter["buckets"]),
+            "blocked": sorted(blocked, key=lambda r: -r[1]),
+        }
+
+
+# ============== 인증 / 유저 ==============
+
+def _user_row_to_dict(uid, username, role, is_approved, student_id, is_active):
+    return {
+        "id": uid,
+        "username": username,
+        "role": role,
+        "is_approved": bool(is_approved),
+        "student_id": student_id,
+        "is_active": bool(is_active),
+    }
+
+
+def create_admin(username: str, password: str) -> bool:
+    pw_hash = hash_password(password)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO users
+            (username, password_hash, role, is_approved, student_id, is_active)
+            VALUES (?, ?, 'admin', 0, NULL, 1)
+            """,
+            (username, pw_hash),
+        )
+        conn.commit()
+        ok = True
+    except sqlite3.IntegrityError:
+        ok = False
+    finally:
+        conn.close()
+    return ok
+
+
+def create_student_user(student_id: int, username: str, password: str) -> bool:
+    pw_hash = hash_password(password)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO users
+            (username, password_hash, role, is_approved, student_id, is_active)
+            VALUES (?, ?, 'student', 0, ?, 1)   -- 🔴 1 → 0
+            """,
+            (username, pw_hash, student_id),
+        )
+        conn.commit()
+        ok = True
+    except sqlite3.IntegrityError:
+        ok = False
+    finally:
+        conn.close()
+    return ok
+
+
+def login_user(username: str, password: str):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
         SELECT id, password_hash, role, is_approved, student_id, is_active
         FROM users
         WHERE username=?
@@ -594,14 +1606,7 @@ def login_user(username: str, password: str):
         except Exception:
             pass
 
-    return {
-        "id": uid,
-        "username": username,
-        "role": role,
-        "is_approved": bool(is_approved),
-        "student_id": student_id,
-        "is_active": bool(is_active),
-    }
+    return _user_row_to_dict(uid, username, role, is_approved, student_id, is_active)
 
 def get_waiting_admins():
     conn = get_connection()
@@ -630,16 +1635,153 @@ def approve_admin(user_id: int, approve: bool):
 
 
 def set_user_active(user_id: int, active: bool):
+    conn = get_connection()
+    cur = conn.cursor()
+    # 정지 시 발급된 로그인 유지 토큰도 모두 무효화
+    cur.execute(
+        """
+        UPDATE users
+        SET is_active=?, token_version=token_version + ?
+        WHERE id=?
+        """,
+        (1 if active else 0, 0 if active else 1, user_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ============== 로그인 유지 토큰 ==============
+#
+# 새로고침/재접속 때마다 PBKDF2 로그인을 다시 하지 않도록, 로그인 시
+# "사용자ID.토큰버전.만료시각.HMAC서명" 형태의 토큰을 쿠키에 둔다
+# (URL 에 두면 방문 기록/북마크/공유 링크/프록시 로그로 새어 나간다).
+# 검증은 HMAC 비교 + users 기본키 조회 한 번. users.token_version 을 올리면
+# (로그아웃, 계정 정지, 비밀번호 변경) 그 사용자의 기존 토큰은 즉시 무효가 된다.
+#
+# Streamlit 에는 쿠키를 쓰는 API 가 없어서, 작은 스크립트로 앱 문서에 쿠키를 쓰고
+# (flush_session_cookie), 읽기는 st.context.cookies 로 한다.
+
+SESSION_COOKIE_NAME = "academy_session"
+SESSION_TOKEN_TTL = timedelta(days=7)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_session_secret(db_name: str) -> bytes:
+    """토큰 서명 키 (DB에 한 번 만들어 두고 재사용 → 재시작 후에도 토큰 유지)"""
+    with db_transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('session_token_key', ?)",
+            (base64.b64encode(os.urandom(32)).decode("utf-8"),),
+        )
+        row = conn.execute(
+            "SELECT value FROM app_secrets WHERE name='session_token_key'"
+        ).fetchone()
+    return base64.b64decode(row[0])
+
+
+def _sign_session_payload(payload: str) -> str:
+    digest = hmac.new(
+        _get_session_secret(DB_NAME), payload.encode("utf-8"), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
+
+
+def issue_session_token(user_id: int) -> str:
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT token_version FROM users WHERE id=?", (user_id,))
+    token_version = cur.fetchone()[0]
+    conn.close()
+
+    expires = int((datetime.now() + SESSION_TOKEN_TTL).timestamp())
+    payload = f"{user_id}.{token_version}.{expires}"
+    return f"{payload}.{_sign_session_payload(payload)}"
+
+
+def validate_session_token(token: str):
+    """유효한 토큰이면 login_user()와 같은 형태의 user dict, 아니면 None"""
+    try:
+        payload, sig = (token or "").rsplit(".", 1)
+        uid, token_version, expires = (int(x) for x in payload.split("."))
+    except ValueError:
+        return None
+    if not hmac.compare_digest(sig, _sign_session_payload(payload)):
+        return None
+    if expires < datetime.now().timestamp():
+        return None
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, username, role, is_approved, student_id, is_active, token_version
+        FROM users
+        WHERE id=?
+        """,
+        (uid,),
+    )
+    row = cur.fetchone()
+    conn.close()
+    if not row or row[6] != token_version:
+        return None
+    return _user_row_to_dict(*row[:6])
+
+
+def revoke_session_tokens(user_id: int):
+    """해당 사용자에게 발급된 로그인 유지 토큰을 모두 무효화 (로그아웃)"""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
-        "UPDATE users SET is_active=? WHERE id=?",
-        (1 if active else 0, user_id),
+        "UPDATE users SET token_version=token_version + 1 WHERE id=?",
+        (user_id,),
     )
     conn.commit()
     conn.close()
 
 
+def set_session_cookie(token):
+    """다음 렌더링 때 브라우저 쿠키에 쓸 토큰 예약 (None 이면 쿠키 삭제)"""
+    st.session_state["_session_cookie"] = token or ""
+
+
+def flush_session_cookie():
+    """예약된 쿠키 변경을 반영. st.rerun() 직전에 그리면 브라우저에 안 닿으므로 main 에서 부른다."""
+    if "_session_cookie" not in st.session_state:
+        return
+    token = st.session_state.pop("_session_cookie")
+    max_age = int(SESSION_TOKEN_TTL.total_seconds()) if token else 0
+    # st.html 은 iframe 없이 앱 문서에서 실행된다
+    script = f"""
+        <script>
+        const doc = window.document;
+        const secure = window.location.protocol === "https:" ? "; Secure" : "";
+        doc.cookie = {json.dumps(SESSION_COOKIE_NAME)} + "=" + {json.dumps(token)}
+            + "; Path=/; Max-Age={max_age}; SameSite=Strict" + secure;
+        </script>
+    """
+    st.html(script, unsafe_allow_javascript=True)
+
+
+def restore_session_from_cookie():
+    """
+    쿠키의 로그인 유지 토큰으로 세션 복원 (세션당 한 번).
+    st.context.cookies 는 접속 시점 값이라 같은 세션에서 다시 볼 필요가 없다.
+    """
+    if st.session_state.get("_session_restore_tried"):
+        return
+    st.session_state["_session_restore_tried"] = True
+    token = st.context.cookies.get(SESSION_COOKIE_NAME)
+    if not token:
+        return
+    restored = validate_session_token(token)
+    if restored and restored["is_active"] and (
+        restored["role"] == "master" or restored["is_approved"]
+    ):
+        st.session_state["user"] = restored
+    else:
+        set_session_cookie(None)
+
+
 # ============== 학생 / 반 / 시간표 ==============
 
 # ============== 학년 자동 승급 관련 ==============
@@ -691,64 +1833,98 @@ def _promote_grade_one_step(grade: str) -> str:
         return grade
 
 
+# 승급 대상 학년 → 다음 학년 (_promote_grade_one_step 기준으로 생성).
+# _promote_grade_one_step 처럼 앞 두 글자만 보므로 '중1학년', '중1 ' 도 '중2' 가 된다.
+GRADE_PROMOTION_MAP = {
+    g: _promote_grade_one_step(g)
+    for g in [f"초{n}" for n in range(1, 7)]
+    + [f"중{n}" for n in range(1, 4)]
+    + [f"고{n}" for n in range(1, 4)]
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _grade_promotion_state(db_name: str):
+    """프로세스 메모리에 '이미 확인한 연도'를 보관 → 같은 해에는 DB도 보지 않음"""
+    return {"checked_year": None, "lock": threading.Lock()}
+
+
 def promote_all_students_if_needed():
     """
     매년 한 번만 전체 학생 학년 자동 승급.
     - settings 테이블의 'last_grade_promotion_year' 값을 보고
       현재 연도보다 작을 때만 승급 수행.
     - 처음 실행할 때는 '현재 연도'로 초기화만 하고 승급은 안 함.
+    - 승급은 CASE 매핑 UPDATE 한 번으로 처리하고 grade_promotion_log 에 기록.
+    반환: 이번에 승급한 학생 수 (승급하지 않았으면 None)
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
     current_year = datetime.now().year
+    state = _grade_promotion_state(DB_NAME)
+    if state["checked_year"] == current_year:
+        return None
 
-    # settings 테이블에 기록이 있는지 확인
-    cur.execute(
-        "SELECT value FROM settings WHERE key='last_grade_promotion_year'"
-    )
-    row = cur.fetchone()
-
-    if row is None:
-        # 처음 사용하는 해에는 승급하지 않고 기준 연도만 기록
-        cur.execute(
-            "INSERT INTO settings (key, value) VALUES (?, ?)",
-            ("last_grade_promotion_year", str(current_year)),
-        )
-        conn.commit()
-        conn.close()
-        return
-
-    try:
-        last_year = int(row[0])
-    except ValueError:
-        last_year = current_year
-
-    # 이미 올해 승급했다면 아무 것도 안 함
-    if current_year <= last_year:
-        conn.close()
-        return
-
-    # 여기까지 왔으면 "새해가 되었는데 아직 승급 안 함" → 전체 승급 수행
-    cur.execute("SELECT id, grade FROM students")
-    rows = cur.fetchall()
+    with state["lock"]:
+        if state["checked_year"] == current_year:
+            return None
 
-    for sid, grade in rows:
-        new_grade = _promote_grade_one_step(grade or "")
-        if new_grade != (grade or ""):
+        promoted = None
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            # 다른 프로세스와 동시에 승급하지 않도록 쓰기 잠금부터 잡는다
+            cur.execute("BEGIN IMMEDIATE")
             cur.execute(
-                "UPDATE students SET grade=? WHERE id=?",
-                (new_grade, sid),
+                "SELECT value FROM settings WHERE key='last_grade_promotion_year'"
             )
+            row = cur.fetchone()
 
-    # 승급 완료 후 연도 갱신
-    cur.execute(
-        "UPDATE settings SET value=? WHERE key='last_grade_promotion_year'",
-        (str(current_year),),
-    )
-    conn.commit()
-    conn.close()
+            if row is None:
+                # 처음 사용하는 해에는 승급하지 않고 기준 연도만 기록
+                cur.execute(
+                    "INSERT INTO settings (key, value) VALUES (?, ?)",
+                    ("last_grade_promotion_year", str(current_year)),
+                )
+            else:
+                try:
+                    last_year = int(row[0])
+                except ValueError:
+                    last_year = current_year
+
+                # "새해가 되었는데 아직 승급 안 함" → 전체 승급 수행
+                if current_year > last_year:
+                    case_sql = " ".join("WHEN ? THEN ?" for _ in GRADE_PROMOTION_MAP)
+                    case_params = [v for pair in GRADE_PROMOTION_MAP.items() for v in pair]
+                    in_sql = ",".join("?" * len(GRADE_PROMOTION_MAP))
+                    cur.execute(
+                        f"""
+                        UPDATE students
+                        SET grade = CASE substr(TRIM(grade), 1, 2) {case_sql} END
+                        WHERE substr(TRIM(grade), 1, 2) IN ({in_sql})
+                        """,
+                        case_params + list(GRADE_PROMOTION_MAP),
+                    )
+                    promoted = cur.rowcount
+
+                    cur.execute(
+                        "UPDATE settings SET value=? WHERE key='last_grade_promotion_year'",
+                        (str(current_year),),
+                    )
+                    cur.execute(
+                        """
+                        INSERT INTO grade_promotion_log (year, promoted_count, run_at)
+                        VALUES (?, ?, ?)
+                        """,
+                        (current_year, promoted, datetime.now().isoformat()),
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
 
+        state["checked_year"] = current_year
+        return promoted
 
 def add_student(name, school, grade, parent_phone, memo):
     conn = get_connection()
@@ -764,6 +1940,7 @@ def add_student(name, school, grade, parent_phone, memo):
     conn.close()
 
 
+@cached_query("students")
 def get_students():
     conn = get_connection()
     cur = conn.cursor()
@@ -816,6 +1993,7 @@ def add_class(name, level, memo):
     conn.close()
 
 
+@cached_query("classes")
 def get_classes():
     conn = get_connection()
     cur = conn.cursor()
@@ -880,6 +2058,7 @@ def delete_class(class_id):
     conn.close()
 
 
+@cached_query("classes", "class_students")
 def get_classes_for_student(student_id: int):
     conn = get_connection()
     cur = conn.cursor()
@@ -897,6 +2076,25 @@ def get_classes_for_student(student_id: int):
     return rows
 
 
+@cached_query("students", "class_students")
+def get_class_students(class_id: int):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT s.id, s.name, s.school, s.grade
+        FROM class_students cs
+        JOIN students s ON cs.student_id=s.id
+        WHERE cs.class_id=?
+        ORDER BY s.name
+        """,
+        (class_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
 def add_timetable(class_id, weekday, start_time_str, end_time_str,
                   subject, room, teacher_name, memo):
     conn = get_connection()
@@ -914,6 +2112,7 @@ def add_timetable(class_id, weekday, start_time_str, end_time_str,
     conn.close()
 
 
+@cached_query("timetables", "classes")
 def get_timetables_for_classes(class_ids):
     if not class_ids:
         return []
@@ -934,6 +2133,260 @@ def get_timetables_for_classes(class_ids):
     return rows
 
 
+# ============== 학년도별 보관 (archive) ==============
+#
+# 출석/성적/진도는 해마다 쌓이기만 하므로, 끝난 학년도는 archive/academy-archive-YYYY.db
+# 로 옮겨 운영 DB(academy.db)를 작게 유지한다. 학생 이력 화면처럼 예전 기록까지 봐야 하는
+# 조회는 history_connection() 으로 필요한 연도 파일만 ATTACH 해서 함께 읽는다.
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_TABLES = ["attendance", "school_scores", "academy_scores", "academy_progress"]
+ACADEMIC_YEAR_START_MONTH = 3   # 학년도 시작 월 (3월 ~ 다음 해 2월)
+
+
+def academic_year_of(d):
+    """날짜가 속한 학년도 (2026-02-10 → 2025)"""
+    return d.year if d.month >= ACADEMIC_YEAR_START_MONTH else d.year - 1
+
+
+def academic_year_range(year):
+    """학년도의 날짜 범위 [시작일, 다음 학년도 시작일) — 'YYYY-MM-DD' 문자열"""
+    return (
+        date(year, ACADEMIC_YEAR_START_MONTH, 1).strftime("%Y-%m-%d"),
+        date(year + 1, ACADEMIC_YEAR_START_MONTH, 1).strftime("%Y-%m-%d"),
+    )
+
+
+def archive_file_path(year):
+    return os.path.join(ARCHIVE_DIR, f"academy-archive-{year}.db")
+
+
+@cached_query("archive_years")
+def get_archive_years():
+    """보관된 학년도 목록 [(연도, 파일 경로, 테이블별 행 수 JSON, 보관 시각)]"""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT year, file_path, row_counts, archived_at FROM archive_years ORDER BY year"
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_archivable_years():
+    """
+    운영 DB에 남아 있는 지난 학년도별 행 수 (현재 학년도는 제외).
+    반환: {연도: {테이블: 행 수}}
+    """
+    current = academic_year_of(date.today())
+    start, _ = academic_year_range(current)
+    year_sql = (
+        "CAST(substr(date, 1, 4) AS INTEGER) "
+        f"- (CAST(substr(date, 6, 2) AS INTEGER) < {ACADEMIC_YEAR_START_MONTH})"
+    )
+    result = {}
+    conn = get_connection()
+    cur = conn.cursor()
+    for table in ARCHIVE_TABLES:
+        cur.execute(
+            f"SELECT {year_sql} AS y, COUNT(*) FROM {table} WHERE date < ? GROUP BY y",
+            (start,),
+        )
+        for year, count in cur.fetchall():
+            if year is not None:
+                result.setdefault(int(year), {})[table] = count
+    conn.close()
+    return dict(sorted(result.items()))
+
+
+def _ensure_archive_table(conn, schema, table):
+    """보관 DB에 운영 DB와 같은 컬럼의 테이블을 만들고, 나중에 늘어난 컬럼은 추가"""
+    main_cols = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    arc_cols = {r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+    if not arc_cols:
+        col_defs = [
+            "id INTEGER PRIMARY KEY" if name == "id" else f"{name} {col_type}"
+            for _, name, col_type, _, _, _ in main_cols
+        ]
+        conn.execute(f"CREATE TABLE {schema}.{table} ({', '.join(col_defs)})")
+        conn.execute(
+            f"CREATE INDEX {schema}.idx_{table}_student_date ON {table} (student_id, date)"
+        )
+    else:
+        for _, name, col_type, _, _, _ in main_cols:
+            if name not in arc_cols:
+                conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {col_type}")
+    return [r[1] for r in main_cols]
+
+
+def archive_academic_year(year, vacuum=False):
+    """
+    지난 학년도 기록을 보관 DB 파일로 옮긴다.
+    1) 보관 파일에 복사(같은 id 는 덮어씀 → 중간에 실패해도 다시 실행하면 됨) 후 검사
+    2) 보관 파일을 백업 폴더에 복사하고 사본도 검사 (운영 DB 스냅샷에는 보관 파일이 없음)
+    3) 운영 DB에서 삭제 + archive_years 등록을 한 트랜잭션으로
+    반환: {테이블: 이번에 옮긴 행 수}
+    """
+    if year >= academic_year_of(date.today()):
+        raise ValueError("현재 학년도는 보관할 수 없습니다.")
+    start, end = academic_year_range(year)
+    path = archive_file_path(year)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    counts = {}
+    columns = {}
+    conn = get_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS arc", (path,))
+    except sqlite3.Error:
+        conn.close()
+        raise
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in ARCHIVE_TABLES:
+            cols = columns[table] = ", ".join(_ensure_archive_table(conn, "arc", table))
+            cur = conn.execute(
+                f"""
+                INSERT OR REPLACE INTO arc.{table} ({cols})
+                SELECT {cols} FROM main.{table} WHERE date >= ? AND date < ?
+                """,
+                (start, end),
+            )
+            counts[table] = cur.rowcount
+        conn.commit()
+
+        check = conn.execute("PRAGMA arc.quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"보관 파일 검사 실패: {check}")
+        db_backup.backup_archive(path, db_backup.BACKUP_DIR)
+
+        conn.execute("BEGIN IMMEDIATE")
+        for table in ARCHIVE_TABLES:
+            # 복사 이후 새로 들어오거나 고쳐진 행이 있으면 지우지 않고 중단
+            # (행 전체를 비교하므로 지난 성적 수정도 잡힘 → 다시 실행하면 새 내용으로 옮겨짐)
+            cols = columns[table]
+            changed = conn.execute(
+                f"""
+                SELECT COUNT(*) FROM (
+                    SELECT {cols} FROM main.{table} WHERE date >= ? AND date < ?
+                    EXCEPT
+                    SELECT {cols} FROM arc.{table}
+                )
+                """,
+                (start, end),
+            ).fetchone()[0]
+            if changed:
+                raise sqlite3.DatabaseError(
+                    f"{table}: 복사 중 새로 생기거나 수정된 기록 {changed}건이 있습니다. "
+                    f"다시 실행해 주세요."
+                )
+            conn.execute(
+                f"DELETE FROM main.{table} WHERE date >= ? AND date < ?", (start, end)
+            )
+        archived = {
+            table: conn.execute(f"SELECT COUNT(*) FROM arc.{table}").fetchone()[0]
+            for table in ARCHIVE_TABLES
+        }
+        conn.execute(
+            """
+            INSERT INTO main.archive_years (year, file_path, row_counts, archived_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(year) DO UPDATE SET
+                file_path=excluded.file_path,
+                row_counts=excluded.row_counts,
+                archived_at=excluded.archived_at
+            """,
+            (
+                year,
+                path,
+                json.dumps(archived),
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _detach_and_close(conn, ["arc"])
+
+    if vacuum:
+        # 삭제로 생긴 빈 페이지를 돌려받아 파일 크기를 줄임 (잠시 쓰기가 막힘)
+        conn = get_connection()
+        conn.execute("VACUUM")
+        conn.close()
+    return counts
+
+
+def _detach_and_close(conn, aliases):
+    """
+    ATTACH 했던 DB를 떼고 연결을 반납. 아직 읽는 중인 문장이 있어 떼지 못하면
+    보관 DB가 붙은 채로 풀에 돌아가지 않도록 연결을 아예 닫는다.
+    """
+    try:
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+    except sqlite3.Error:
+        conn.close_for_real()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def history_connection(tables, start_date=None, end_date=None):
+    """
+    보관된 학년도까지 포함해 읽는 연결.
+    `with history_connection(["attendance"]) as (conn, src):` 후
+    f"SELECT ... FROM {src['attendance']} a ..." 처럼 쓴다.
+
+    기간(start_date~end_date, 'YYYY-MM-DD')이 주어지면 겹치는 연도 파일만 ATTACH 하고,
+    보관 파일이 필요 없으면 src 는 그냥 운영 DB 테이블 이름이다.
+    """
+    years = []
+    for year, path, _, _ in get_archive_years():
+        y_start, y_end = academic_year_range(year)
+        if start_date and start_date >= y_end:
+            continue
+        if end_date and end_date < y_start:
+            continue
+        if os.path.exists(path):
+            years.append((year, path))
+        else:
+            # 조용히 빼면 그 학년도 기록이 없던 것처럼 보이므로 화면에 알린다
+            st.warning(
+                f"{year}학년도 보관 파일({path})이 없어 해당 기록이 빠졌습니다. "
+                f"마스터 화면의 학년도별 보관에서 복구 방법을 확인하세요."
+            )
+
+    conn = get_connection()
+    attached = []
+    try:
+        src = {table: table for table in tables}
+        if years:
+            for year, path in years:
+                alias = f"arc_{year}"
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+                attached.append(alias)
+            for table in tables:
+                cols = _get_table_columns(table, conn)
+                parts = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+                for alias in attached:
+                    arc_cols = {
+                        r[1] for r in conn.execute(f"PRAGMA {alias}.table_info({table})")
+                    }
+                    if not arc_cols:
+                        continue
+                    select = ", ".join(c if c in arc_cols else f"NULL AS {c}" for c in cols)
+                    parts.append(f"SELECT {select} FROM {alias}.{table}")
+                src[table] = "(" + " UNION ALL ".join(parts) + ")"
+        yield conn, src
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        _detach_and_close(conn, attached)
+
+
 # ============== 출석 / 공지 ==============
 
 def add_attendance(
@@ -982,6 +2435,40 @@ def add_attendance(
     conn.close()
 
 
+def add_attendance_bulk(rows, via, recorded_by, date_str=None):
+    """
+    여러 학생의 출결을 한 트랜잭션(executemany)으로 저장.
+    rows: (student_id, class_id, status, homework_status, daily_test_status) 목록
+    date_str: 'YYYY-MM-DD' 형식. None이면 오늘 날짜로 처리.
+    반환: 저장한 건수
+    """
+    now = datetime.now()
+    if date_str is None:
+        date_str = now.strftime("%Y-%m-%d")
+    time_str = now.strftime("%H:%M:%S")
+
+    params = [
+        (student_id, class_id, date_str, status,
+         homework_status, daily_test_status, time_str, via, recorded_by)
+        for student_id, class_id, status, homework_status, daily_test_status in rows
+    ]
+    if not params:
+        return 0
+
+    with db_transaction() as conn:
+        conn.executemany(
+            """
+            INSERT INTO attendance
+            (student_id, class_id, date, status,
+             homework_status, daily_test_status,
+             checkin_time, via, recorded_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            params,
+        )
+    return len(params)
+
+
 def get_attendance_records(date_str, class_id=None):
     conn = get_connection()
     cur = conn.cursor()
@@ -1012,55 +2499,160 @@ def get_attendance_records(date_str, class_id=None):
     conn.close()
     return rows
 
+def _month_date_range(year: int, month: int):
+    """지정 월의 ('YYYY-MM-01', 'YYYY-MM-말일') 문자열 범위"""
+    import calendar
+
+    last_day_num = calendar.monthrange(year, month)[1]
+    return (
+        f"{year:04d}-{month:02d}-01",
+        f"{year:04d}-{month:02d}-{last_day_num:02d}",
+    )
+
+
+def _fetch_student_month_attendance(student_id: int, year: int, month: int,
+                                    select_sql: str, tail_sql: str):
+    """학생 한 명의 지정 월 attendance 범위 조회 (SELECT 절과 뒤쪽 절만 달리 사용)"""
+    start_str, end_str = _month_date_range(year, month)
+    with history_connection(["attendance"], start_str, end_str) as (conn, src):
+        rows = conn.execute(
+            f"""
+            SELECT {select_sql}
+            FROM {src['attendance']}
+            WHERE student_id=? AND date BETWEEN ? AND ?
+            {tail_sql}
+            """,
+            (student_id, start_str, end_str),
+        ).fetchall()
+    return rows
+
+
 def get_attendance_for_student_month(student_id: int, year: int, month: int):
     """
     특정 학생의 지정 월 출결/과제/일일테스트 기록 반환
     (date, status, homework_status, daily_test_status)
     """
-    import calendar
+    return _fetch_student_month_attendance(
+        student_id, year, month,
+        "date, status, homework_status, daily_test_status",
+        "ORDER BY date",
+    )
 
-    from datetime import date as _date
 
-    first_day = _date(year, month, 1)
-    last_day_num = calendar.monthrange(year, month)[1]
-    start_str = f"{year:04d}-{month:02d}-01"
-    end_str = f"{year:04d}-{month:02d}-{last_day_num:02d}"
+# 하루에 기록이 여러 개면 가장 나쁜 상태로 표기 (결석 > 지각 > 출석)
+_WORST_STATUS_LABELS = {3: "결석", 2: "지각", 1: "출석"}
+
+
+def get_attendance_worst_status_for_student_month(student_id: int, year: int, month: int):
+    """
+    특정 학생의 지정 월 날짜별 '가장 나쁜' 출결 상태.
+    반환: {일(int): '결석' / '지각' / '출석'} — 기록이 있는 날만 포함
+    """
+    rows = _fetch_student_month_attendance(
+        student_id, year, month,
+        """date,
+               MAX(CASE status
+                       WHEN '미인정결석' THEN 3
+                       WHEN '지각' THEN 2
+                       ELSE 1
+                   END)""",
+        "GROUP BY date",
+    )
+    result = {}
+    for dt_str, rank in rows:
+        try:
+            day = int(dt_str[-2:])
+        except (TypeError, ValueError):
+            continue
+        result[day] = _WORST_STATUS_LABELS[rank]
+    return result
+
+
+def get_attendance_month_summary(year: int, month: int, class_id=None):
+    """
+    지정 월의 날짜별 출결 상태 건수를 한 번의 GROUP BY 쿼리로 집계.
+    반환: {일(int): (정상출석 수, 지각 수, 미인정결석 수)} — 기록이 있는 날만 포함
+    """
+    start_str, end_str = _month_date_range(year, month)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    # get_attendance_records와 같은 기준(삭제된 학생 기록 제외)으로 센다
+    query = """
+        SELECT a.date,
+               SUM(a.status='정상출석'),
+               SUM(a.status='지각'),
+               SUM(a.status='미인정결석')
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+        WHERE a.date BETWEEN ? AND ?
+    """
+    params = [start_str, end_str]
+    if class_id:
+        query += " AND a.class_id=?"
+        params.append(class_id)
+    query += " GROUP BY a.date"
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    conn.close()
+
+    summary = {}
+    for dt_str, normal, late, absent in rows:
+        try:
+            day = int(dt_str[-2:])
+        except (TypeError, ValueError):
+            continue
+        summary[day] = (normal or 0, late or 0, absent or 0)
+    return summary
+
 
+def get_class_attendance_month(class_id, start_str, end_str):
+    """반 하나의 기간 내 출결 기록 [(날짜, 상태, 과제, 일일테스트)]"""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
         SELECT date, status, homework_status, daily_test_status
         FROM attendance
-        WHERE student_id=? AND date BETWEEN ? AND ?
-        ORDER BY date
+        WHERE class_id=? AND date BETWEEN ? AND ?
         """,
-        (student_id, start_str, end_str),
+        (class_id, start_str, end_str),
     )
     rows = cur.fetchall()
     conn.close()
     return rows
 
 
-def get_recent_attendance_for_student(student_id: int, limit: int = 20):
-    """지정 학생의 최근 출결/과제/일일테스트 기록"""
+def get_dashboard_counts(today_str, since_str):
+    """대시보드 요약: (오늘 출결 수, since 이후 학교 성적 수, since 이후 학원 성적 수)"""
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT a.date, a.checkin_time, a.status,
-               a.homework_status, a.daily_test_status,
-               c.name
-        FROM attendance a
-        LEFT JOIN classes c ON a.class_id = c.id
-        WHERE a.student_id=?
-        ORDER BY a.date DESC, a.checkin_time DESC
-        LIMIT ?
-        """,
-        (student_id, limit),
-    )
-    rows = cur.fetchall()
+    cur.execute("SELECT COUNT(*) FROM attendance WHERE date=?", (today_str,))
+    today_att = cur.fetchone()[0] or 0
+    cur.execute("SELECT COUNT(*) FROM school_scores WHERE date>=?", (since_str,))
+    school = cur.fetchone()[0] or 0
+    cur.execute("SELECT COUNT(*) FROM academy_scores WHERE date>=?", (since_str,))
+    academy = cur.fetchone()[0] or 0
     conn.close()
+    return today_att, school, academy
+
+
+def get_recent_attendance_for_student(student_id: int, limit: int = 20):
+    """지정 학생의 최근 출결/과제/일일테스트 기록 (보관된 학년도 포함)"""
+    with history_connection(["attendance"]) as (conn, src):
+        rows = conn.execute(
+            f"""
+            SELECT a.date, a.checkin_time, a.status,
+                   a.homework_status, a.daily_test_status,
+                   c.name
+            FROM {src['attendance']} a
+            LEFT JOIN classes c ON a.class_id = c.id
+            WHERE a.student_id=?
+            ORDER BY a.date DESC, a.checkin_time DESC
+            LIMIT ?
+            """,
+            (student_id, limit),
+        ).fetchall()
     return rows
 
 
@@ -1079,6 +2671,7 @@ def add_notice(title, content, pinned, created_by):
     conn.close()
 
 
+@cached_query("notices")
 def get_notices():
     conn = get_connection()
     cur = conn.cursor()
@@ -1104,6 +2697,43 @@ def delete_notice(notice_id):
 
 # ============== 성적 / 진도 ==============
 
+def get_progress_for_student(student_id, subject=None):
+    """학생 진도 기록 최신순 [(날짜, 과목, 단원, 메모, 반 이름)] (보관된 학년도 포함)"""
+    with history_connection(["academy_progress"]) as (conn, src):
+        query = f"""
+            SELECT p.date, p.subject, p.unit, p.memo, c.name
+            FROM {src['academy_progress']} p
+            LEFT JOIN classes c ON p.class_id=c.id
+            WHERE p.student_id=?
+        """
+        params = [student_id]
+        if subject:
+            query += " AND p.subject=?"
+            params.append(subject)
+        query += " ORDER BY p.date DESC"
+        rows = conn.execute(query, params).fetchall()
+    return rows
+
+
+def get_last_class_progress(class_id):
+    """반의 가장 최근 진도 (날짜, 과목, 단원, 메모) — 없으면 None"""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT date, subject, unit, memo
+        FROM academy_progress
+        WHERE class_id=?
+        ORDER BY date DESC, id DESC
+        LIMIT 1
+        """,
+        (class_id,),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+
 def get_common_subjects():
     """
     자주 사용하는 과목 목록.
@@ -1144,6 +2774,28 @@ def add_academy_progress(student_id, class_id, date_str,
     conn.close()
 
 
+def add_academy_progress_bulk(student_ids, class_id, date_str,
+                              subject, unit, memo, recorded_by):
+    """같은 진도를 여러 학생에게 한 트랜잭션(executemany)으로 저장. 반환: 저장한 건수"""
+    params = [
+        (sid, class_id, date_str, subject, unit, memo, recorded_by)
+        for sid in student_ids
+    ]
+    if not params:
+        return 0
+
+    with db_transaction() as conn:
+        conn.executemany(
+            """
+            INSERT INTO academy_progress
+            (student_id, class_id, date, subject, unit, memo, recorded_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            params,
+        )
+    return len(params)
+
+
 def add_academy_score(student_id, class_id, date_str, subject,
                       test_name, score, max_score, memo, recorded_by):
     conn = get_connection()
@@ -1163,30 +2815,27 @@ def add_academy_score(student_id, class_id, date_str, subject,
 
 
 def get_scores_for_student(table_name, student_id, subject=None):
-    conn = get_connection()
-    cur = conn.cursor()
-
+    """학생 성적 전체 이력 (보관된 학년도 포함)"""
     if table_name == "school_scores":
         name_col = "exam_name"
     else:
         name_col = "test_name"
 
-    query = f"""
-        SELECT date, subject,
-               {name_col},
-               score, max_score
-        FROM {table_name}
-        WHERE student_id=?
-    """
-    params = [student_id]
-    if subject:
-        query += " AND subject=?"
-        params.append(subject)
-    query += " ORDER BY date"
+    with history_connection([table_name]) as (conn, src):
+        query = f"""
+            SELECT date, subject,
+                   {name_col},
+                   score, max_score
+            FROM {src[table_name]}
+            WHERE student_id=?
+        """
+        params = [student_id]
+        if subject:
+            query += " AND subject=?"
+            params.append(subject)
+        query += " ORDER BY date"
 
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
+        rows = conn.execute(query, params).fetchall()
     return rows
 
 def get_common_subjects():
@@ -1217,77 +2866,783 @@ def get_common_subjects():
     return sorted([s for s in subjects if s])
 
 
-# ============== 단어장 DB 함수 ==============
+# ============== 성적 분석 (벡터 연산) ==============
 
-def create_vocab_set(name, description, level, created_by):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO vocab_sets
-        (name, description, level, created_by, created_at, is_active)
-        VALUES (?, ?, ?, ?, ?, 1)
-        """,
-        (name, description, level, created_by, datetime.now().isoformat()),
-    )
-    conn.commit()
-    conn.close()
+# 성적 테이블 → 시험명 컬럼
+SCORE_TABLES = {"school_scores": "exam_name", "academy_scores": "test_name"}
+SCORE_TREND_WINDOW = 3      # 이동 평균에 쓰는 최근 시험 수 (과목별)
+# 이 테이블 중 하나라도 바뀌면 분석 결과를 새로 계산한다
+SCORE_ANALYTICS_TABLES = ("school_scores", "academy_scores", "class_students", "archive_years")
+# 같은 시험으로 묶는 기준
+SCORE_EXAM_KEY = ["kind", "date", "subject", "exam_name"]
 
 
-def get_vocab_sets(active_only=True):
-    conn = get_connection()
-    cur = conn.cursor()
-    query = """
-        SELECT id, name, description, level, created_by, created_at, is_active
-        FROM vocab_sets
+def _load_score_frame():
     """
-    if active_only:
-        query += " WHERE is_active=1"
-    query += " ORDER BY created_at DESC"
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    두 성적 테이블(보관된 학년도 포함)을 한 번에 읽어 열 단위 DataFrame 으로 반환.
+    반환: (성적 DataFrame, 반 배정 DataFrame[class_id, student_id])
+    """
+    parts = []
+    with history_connection(list(SCORE_TABLES)) as (conn, src):
+        for table, name_col in SCORE_TABLES.items():
+            # 학교 성적에는 반 컬럼이 없다 (합친 뒤 NA)
+            columns = ["id", "student_id", "date", "subject", "exam_name", "score", "max_score"]
+            if table == "academy_scores":
+                columns.append("class_id")
+            rows = conn.execute(
+                f"""
+                SELECT id, student_id, date, subject, {name_col}, score, max_score
+                       {", class_id" if "class_id" in columns else ""}
+                FROM {src[table]}
+                """
+            ).fetchall()
+            part = pd.DataFrame.from_records(rows, columns=columns)
+            part["kind"] = table
+            parts.append(part)
+        members = pd.DataFrame.from_records(
+            conn.execute("SELECT class_id, student_id FROM class_students").fetchall(),
+            columns=["class_id", "student_id"],
+        )
 
+    frame = pd.concat(parts, ignore_index=True)
+    frame["exam_name"] = frame["exam_name"].fillna("")
+    frame["class_id"] = pd.to_numeric(frame["class_id"], errors="coerce").astype("Int64")
+    for col in ("score", "max_score"):
+        frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    members["class_id"] = members["class_id"].astype("Int64")
+    return frame, members
 
-def add_vocab_item(set_id, word, meaning, part_of_speech,
-                   example_en, example_ko, tags, difficulty):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO vocab_items
-        (set_id, word, meaning, part_of_speech, example_en,
-         example_ko, tags, difficulty)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (set_id, word, meaning, part_of_speech,
-         example_en, example_ko, tags, difficulty),
-    )
-    conn.commit()
-    conn.close()
 
+def _agg_percent(grouped):
+    """percent 의 평균/중앙값/표준편차/응시 인원"""
+    return grouped["percent"].agg(["mean", "median", "std", "count"])
 
-def get_vocab_items(set_id):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, word, meaning, part_of_speech,
-               example_en, example_ko, tags, difficulty
-        FROM vocab_items
-        WHERE set_id=?
-        ORDER BY id
-        """,
-        (set_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
 
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _score_analytics(versions):
+    """
+    성적 분석 결과 (SCORE_ANALYTICS_TABLES 버전별로 한 번만 계산, 모든 세션 공유).
+    반환 dict 의 DataFrame 은 공유 객체이므로 그대로 수정하지 말 것 (필터/복사해서 사용).
 
-def assign_vocab_to_class(set_id, class_id, user_id):
-    conn = get_connection()
+    - scores: 성적 한 건당 한 행. percent(만점 대비 %), 시험 전체 평균/중앙값/표준편차,
+      대표 반(class_id)의 반 평균/중앙값·반 내 백분위, 과목별 이동 평균(moving_avg)
+    - exam_stats: 시험(SCORE_EXAM_KEY)별 평균/중앙값/표준편차/인원
+    - class_stats: (반, 시험)별 평균/중앙값/표준편차/인원
+    - class_scores: (반, 성적) 한 쌍당 한 행. 반 내 백분위(class_percentile)
+
+    반 기준: 학원 성적은 기록된 class_id, 학교 성적(또는 반 없이 기록된 학원 성적)은
+    학생이 현재 배정된 반 전체. 학생 화면에 보이는 대표 반은 그중 id 가 가장 작은 반.
+    """
+    frame, members = _load_score_frame()
+
+    # 만점이 없거나 0 이면 백분율 없음
+    frame["percent"] = frame["score"] / frame["max_score"].where(frame["max_score"] > 0) * 100
+
+    exam_stats = _agg_percent(frame.groupby(SCORE_EXAM_KEY, sort=False))
+    frame = frame.merge(
+        exam_stats.add_prefix("exam_"), left_on=SCORE_EXAM_KEY, right_index=True, how="left"
+    )
+
+    # 반 단위: 반이 정해진 행은 그대로, 나머지는 학생의 반 배정으로 펼친다
+    has_class = frame["class_id"].notna()
+    by_class = pd.concat(
+        [
+            frame.loc[has_class],
+            frame.loc[~has_class].drop(columns="class_id").merge(members, on="student_id"),
+        ],
+        ignore_index=True,
+    )
+    class_key = ["class_id"] + SCORE_EXAM_KEY
+    grouped = by_class.groupby(class_key, sort=False)
+    class_stats = _agg_percent(grouped)
+    # 반 내 백분위: 같은 반·같은 시험에서 내 점수 이하인 학생 비율 (1등 = 100)
+    by_class["class_percentile"] = grouped["percent"].rank(method="max", pct=True) * 100
+    by_class = by_class.merge(
+        class_stats[["mean", "median"]].add_prefix("class_"),
+        left_on=class_key, right_index=True, how="left",
+    )
+    primary = (
+        by_class.sort_values("class_id")
+        .drop_duplicates(["kind", "id"])
+        [["kind", "id", "class_id", "class_mean", "class_median", "class_percentile"]]
+    )
+    frame = frame.drop(columns="class_id").merge(primary, on=["kind", "id"], how="left")
+
+    # 학생·과목별 이동 평균 (날짜순). groupby().rolling() 은 그룹이 많으면 느려서
+    # 누적합 차이로 최근 SCORE_TREND_WINDOW 회의 평균을 구한다. 백분율 없는 시험은
+    # 창에서 빼고 세며(그 행의 이동 평균도 비움), 창은 백분율 있는 시험만으로 채운다.
+    frame = frame.sort_values(["kind", "student_id", "subject", "date", "id"], ignore_index=True)
+    series = frame.groupby(["kind", "student_id", "subject"], sort=False).ngroup()
+    has_percent = frame["percent"].notna()
+    percent = frame.loc[has_percent, "percent"]
+    valid_series = series[has_percent]
+    total = percent.groupby(valid_series).cumsum()
+    window_total = total - total.groupby(valid_series).shift(SCORE_TREND_WINDOW, fill_value=0)
+    window_count = (percent.groupby(valid_series).cumcount() + 1).clip(upper=SCORE_TREND_WINDOW)
+    frame["moving_avg"] = window_total / window_count
+
+    return {
+        "scores": frame,
+        "exam_stats": exam_stats.reset_index(),
+        "class_stats": class_stats.reset_index(),
+        "class_scores": by_class[
+            class_key + ["id", "student_id", "score", "max_score", "percent", "class_percentile"]
+        ],
+    }
+
+
+def get_score_analytics():
+    return _score_analytics(get_table_versions(SCORE_ANALYTICS_TABLES))
+
+
+def student_score_analytics(student_id, table_name, subject=None):
+    """학생 한 명의 성적 + 분석 컬럼 (날짜순 DataFrame)"""
+    scores = get_score_analytics()["scores"]
+    mask = (scores["student_id"] == student_id) & (scores["kind"] == table_name)
+    if subject:
+        mask &= scores["subject"] == subject
+    return scores.loc[mask].sort_values(["date", "id"], ignore_index=True)
+
+
+def class_score_summary(table_name, class_id):
+    """반 하나의 시험별 평균/중앙값/표준편차/인원 (최근 시험 먼저)"""
+    stats = get_score_analytics()["class_stats"]
+    mask = (stats["kind"] == table_name) & (stats["class_id"] == class_id)
+    return stats.loc[mask].sort_values(["date", "subject"], ascending=False, ignore_index=True)
+
+
+def class_exam_ranking(table_name, class_id, exam_date, subject, exam_name):
+    """반 하나의 특정 시험 학생별 점수 / 백분율 / 반 내 백분위 (높은 순)"""
+    scores = get_score_analytics()["class_scores"]
+    mask = (
+        (scores["kind"] == table_name)
+        & (scores["class_id"] == class_id)
+        & (scores["date"] == exam_date)
+        & (scores["subject"] == subject)
+        & (scores["exam_name"] == exam_name)
+    )
+    return scores.loc[mask].sort_values("percent", ascending=False, ignore_index=True)
+
+
+# ============== 일괄 등록 (학생 / 반 배정 / 성적) ==============
+#
+# 엑셀/CSV 파일을 pandas 로 읽어 컬럼·학년 형식·중복·학생/반 존재 여부를 행 단위
+# 반복 없이 한 번에 검사하고, 오류 행을 미리 보여준 뒤 나머지를 한 트랜잭션으로 저장한다.
+
+# 종류별 컬럼: 내부 이름 → (화면/파일 헤더, 필수 여부). 파일 헤더는 한글 또는 내부 이름.
+BULK_IMPORT_KINDS = {
+    "students": (
+        "학생 명단",
+        {
+            "name": ("이름", True),
+            "school": ("학교", False),
+            "grade": ("학년", True),
+            "parent_phone": ("부모님 연락처", False),
+            "memo": ("비고", False),
+            "class_name": ("반", False),
+        },
+    ),
+    "roster": (
+        "반 배정",
+        {
+            "name": ("이름", True),
+            "grade": ("학년", False),
+            "class_name": ("반", True),
+        },
+    ),
+    "school_scores": (
+        "학교 성적",
+        {
+            "name": ("이름", True),
+            "grade": ("학년", False),
+            "date": ("날짜", True),
+            "subject": ("과목", True),
+            "exam_name": ("시험명", False),
+            "score": ("점수", True),
+            "max_score": ("만점", False),
+            "memo": ("메모", False),
+        },
+    ),
+    "academy_scores": (
+        "학원 성적",
+        {
+            "name": ("이름", True),
+            "grade": ("학년", False),
+            "class_name": ("반", False),
+            "date": ("날짜", True),
+            "subject": ("과목", True),
+            "exam_name": ("시험명", False),
+            "score": ("점수", True),
+            "max_score": ("만점", False),
+            "memo": ("메모", False),
+        },
+    ),
+}
+# _promote_grade_one_step 이 다루는 초/중/고 학년 (+ 졸업)
+GRADE_PATTERN = r"(?:초[1-6]|중[1-3]|고[1-3]|졸업)"
+
+
+def read_bulk_import_file(uploaded_file):
+    """업로드된 CSV/XLSX 를 모두 문자열 컬럼인 DataFrame 으로 읽음 (잘못된 형식이면 ValueError)"""
+    name = uploaded_file.name.lower()
+    data = uploaded_file.getvalue()
+    if name.endswith(".xlsx"):
+        try:
+            return pd.read_excel(io.BytesIO(data), dtype=str).fillna("")
+        except ImportError:
+            raise ValueError("엑셀 파일을 읽으려면 openpyxl 패키지가 필요합니다.")
+
+    for encoding in ("utf-8-sig", "cp949"):
+        try:
+            return pd.read_csv(
+                io.BytesIO(data), dtype=str, encoding=encoding, keep_default_na=False
+            )
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSV 인코딩을 알 수 없습니다 (UTF-8 또는 CP949로 저장해 주세요).")
+
+
+def normalize_grade(series):
+    """'중 2', '중2학년' 같은 표기를 '중2' 로 맞춤 (벡터 연산)"""
+    return (
+        series.fillna("").astype(str)
+        .str.replace(r"\s+", "", regex=True)
+        .str.replace(r"학년$", "", regex=True)
+    )
+
+
+def validate_bulk_import(kind, df):
+    """
+    일괄 등록 파일 검증.
+    반환: (저장할 DataFrame, 오류 DataFrame[행, 사유])
+    행 번호는 엑셀에서 보이는 번호 (헤더가 1행).
+    """
+    _, spec = BULK_IMPORT_KINDS[kind]
+    header_map = {}
+    for col, (header, _) in spec.items():
+        header_map[header] = col
+        header_map[col] = col
+    df = df.rename(columns=lambda c: header_map.get(str(c).strip(), str(c).strip()))
+
+    missing_cols = [spec[c][0] for c, (_, req) in spec.items() if req and c not in df.columns]
+    if missing_cols:
+        raise ValueError(f"필수 컬럼이 없습니다: {', '.join(missing_cols)}")
+
+    df = df.reindex(columns=list(spec)).fillna("").astype(str)
+    df = df.apply(lambda s: s.str.strip())
+    df.index = pd.RangeIndex(2, len(df) + 2, name="행")
+    df = df[(df != "").any(axis=1)]
+
+    errors = []
+
+    def _flag(mask, reason):
+        if mask.any():
+            errors.append(pd.DataFrame({"행": df.index[mask], "사유": reason}))
+
+    for col, (header, required) in spec.items():
+        if required:
+            _flag(df[col] == "", f"{header} 비어 있음")
+
+    if "grade" in df.columns:
+        df["grade"] = normalize_grade(df["grade"])
+        _flag(
+            (df["grade"] != "") & ~df["grade"].str.fullmatch(GRADE_PATTERN),
+            "학년 형식 오류 (초1~6 / 중1~3 / 고1~3 / 졸업)",
+        )
+
+    if "class_name" in df.columns:
+        class_ids = {name: cid for cid, name, level, memo in get_classes()}
+        df["class_id"] = df["class_name"].map(class_ids)
+        _flag((df["class_name"] != "") & df["class_id"].isna(), "없는 반 이름")
+
+    if "date" in df.columns:
+        parsed = pd.to_datetime(df["date"], errors="coerce", format="mixed")
+        _flag((df["date"] != "") & parsed.isna(), "날짜 형식 오류")
+        df["date"] = parsed.dt.strftime("%Y-%m-%d")
+
+    if "score" in df.columns:
+        score = pd.to_numeric(df["score"], errors="coerce")
+        max_score = pd.to_numeric(df["max_score"].replace("", "100"), errors="coerce")
+        _flag((df["score"] != "") & score.isna(), "점수가 숫자가 아님")
+        _flag(max_score.isna() | (max_score <= 0), "만점 오류")
+        _flag((score < 0) | (score > max_score), "점수가 0~만점 범위를 벗어남")
+        df["score"] = score
+        df["max_score"] = max_score
+
+    # DB 값도 파일 값과 같은 방식으로 맞춰야 비교된다 (NULL 학교 → "", '중2학년' → '중2')
+    existing = pd.DataFrame(
+        [row[:4] for row in get_students()], columns=["student_id", "name", "school", "grade"]
+    )
+    for col in ("name", "school"):
+        existing[col] = existing[col].fillna("").astype(str).str.strip()
+    existing["grade"] = normalize_grade(existing["grade"])
+    if kind == "students":
+        key = ["name", "school", "grade"]
+        _flag(df.duplicated(key, keep=False), "파일 안에서 중복된 학생")
+        already = df[key].merge(existing[key].drop_duplicates(), how="left", indicator=True)
+        _flag(already["_merge"].eq("both").to_numpy(), "이미 등록된 학생")
+    else:
+        df = _resolve_import_students(df, existing, _flag)
+        if kind == "roster":
+            _flag(df.duplicated(["student_id", "class_id"], keep=False), "파일 안에서 중복된 배정")
+            assigned = _existing_pairs(
+                "SELECT student_id, class_id FROM class_students", ["student_id", "class_id"]
+            )
+            dup = df[["student_id", "class_id"]].merge(assigned, how="left", indicator=True)
+            _flag(dup["_merge"].eq("both").to_numpy(), "이미 배정된 반")
+        else:
+            key = ["student_id", "date", "subject", "exam_name"]
+            _flag(df.duplicated(key, keep=False), "파일 안에서 중복된 성적")
+            name_col = "exam_name" if kind == "school_scores" else "test_name"
+            saved = _existing_pairs(
+                f"SELECT student_id, date, subject, COALESCE({name_col}, '') FROM {kind}",
+                key,
+            )
+            dup = df[key].merge(saved, how="left", indicator=True)
+            _flag(dup["_merge"].eq("both").to_numpy(), "이미 저장된 성적")
+
+    if errors:
+        error_df = pd.concat(errors).sort_values("행", kind="stable")
+        error_df = error_df.groupby("행", sort=True)["사유"].agg(", ".join).reset_index()
+        df = df[~df.index.isin(error_df["행"])]
+    else:
+        error_df = pd.DataFrame(columns=["행", "사유"])
+    return df, error_df
+
+
+def _resolve_import_students(df, existing, _flag):
+    """이름(+학년)으로 학생 id 찾기. 동명이인은 학년으로 구분되지 않으면 오류."""
+    by_name = existing.groupby("name")["student_id"].agg(["first", "count"])
+    by_name_grade = existing.groupby(["name", "grade"])["student_id"].agg(["first", "count"])
+
+    one = df[["name"]].join(by_name, on="name")
+    two = df[["name", "grade"]].join(by_name_grade, on=["name", "grade"])
+    use_grade = df["grade"] != ""
+    count = two["count"].where(use_grade, one["count"])
+    df["student_id"] = two["first"].where(use_grade, one["first"])
+
+    _flag(count.isna() & (df["name"] != ""), "등록되지 않은 학생")
+    _flag(count > 1, "동명이인 (학년으로 구분 불가)")
+    df.loc[count != 1, "student_id"] = None
+    return df
+
+
+def _existing_pairs(sql, columns):
+    """중복 검사용으로 DB의 기존 키 조합을 DataFrame 으로 읽음"""
+    conn = get_connection()
+    try:
+        return pd.read_sql_query(sql, conn).set_axis(columns, axis=1).drop_duplicates()
+    finally:
+        conn.close()
+
+
+def apply_bulk_import(kind, df, user_id=None):
+    """
+    validate_bulk_import 통과 행을 한 트랜잭션(executemany)으로 저장.
+    학생 명단에 반이 적혀 있으면 새 학생의 반 배정도 같은 트랜잭션에서 처리한다.
+    반환: 저장한 행 수
+    """
+    if df.empty:
+        return 0
+
+    def _opt(col):
+        return df[col].where(df[col] != "", None)
+
+    with db_transaction() as conn:
+        # 새 학생 id 를 순서대로 알아내기 위해 쓰기 잠금을 먼저 잡는다
+        conn.execute("BEGIN IMMEDIATE")
+        if kind == "students":
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM students").fetchone()[0]
+            conn.executemany(
+                """
+                INSERT INTO students (name, school, grade, parent_phone, memo)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                zip(
+                    df["name"], _opt("school"), df["grade"],
+                    _opt("parent_phone"), _opt("memo"),
+                ),
+            )
+            new_ids = [
+                r[0] for r in conn.execute(
+                    "SELECT id FROM students WHERE id > ? ORDER BY id", (last_id,)
+                )
+            ]
+            pairs = pd.DataFrame({"class_id": df["class_id"].to_numpy(), "student_id": new_ids})
+            pairs = pairs.dropna()
+            conn.executemany(
+                "INSERT INTO class_students (class_id, student_id) VALUES (?, ?)",
+                pairs.astype(int).itertuples(index=False, name=None),
+            )
+        elif kind == "roster":
+            conn.executemany(
+                "INSERT INTO class_students (class_id, student_id) VALUES (?, ?)",
+                df[["class_id", "student_id"]].astype(int).itertuples(index=False, name=None),
+            )
+        elif kind == "school_scores":
+            conn.executemany(
+                """
+                INSERT INTO school_scores
+                (student_id, date, subject, exam_name, score, max_score, memo, recorded_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                zip(
+                    df["student_id"].astype(int), df["date"], df["subject"],
+                    _opt("exam_name"), df["score"], df["max_score"], _opt("memo"),
+                    [user_id] * len(df),
+                ),
+            )
+        else:
+            conn.executemany(
+                """
+                INSERT INTO academy_scores
+                (student_id, class_id, date, subject, test_name, score, max_score,
+                 memo, recorded_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                zip(
+                    df["student_id"].astype(int),
+                    [None if pd.isna(v) else int(v) for v in df["class_id"]],
+                    df["date"], df["subject"], _opt("exam_name"),
+                    df["score"], df["max_score"], _opt("memo"),
+                    [user_id] * len(df),
+                ),
+            )
+    return len(df)
+
+
+# ============== 성적표 PDF (일괄 생성) ==============
+#
+# 반 전체/학원 전체를 한 번에 뽑으면 수백 장을 그려야 하므로 CPU 코어 수만큼의
+# 프로세스 풀에서 병렬로 만든다. 작업 프로세스에 넘기는 렌더링 함수는 report_cards.py 에
+# 두고(Streamlit 스크립트인 app.py 의 함수는 작업 프로세스에서 찾을 수 없다),
+# 서버 스레드가 많은 상태에서 fork 하지 않도록 spawn 방식을 쓴다.
+
+REPORT_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+REPORT_IN_CHUNK = 500           # IN (...) 한 번에 넣는 학생 수 (SQLite 변수 개수 제한)
+REPORT_PROGRESS_ROWS = 10       # 성적표에 넣는 최근 진도 개수
+REPORT_ACADEMY_NAME = "DH SCHOOL · Cognoscenti"
+
+
+@st.cache_resource(show_spinner=False)
+def _get_report_executor():
+    return ProcessPoolExecutor(
+        max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def collect_report_card_data(student_ids, start_date, end_date):
+    """
+    성적표용 데이터 수집. 학생 수와 관계없이 표마다 IN 조회 몇 번으로 끝낸다.
+    반환: report_cards.render_report_card 에 넘길 dict 리스트 (student_ids 순서)
+    """
+    data = {}
+    # 기간이 보관된 학년도에 걸치면 해당 보관 파일도 함께 읽는다
+    with history_connection(ARCHIVE_TABLES, start_date, end_date) as (conn, src):
+        cur = conn.cursor()
+        for i in range(0, len(student_ids), REPORT_IN_CHUNK):
+            chunk = list(student_ids[i:i + REPORT_IN_CHUNK])
+            ph = ",".join("?" * len(chunk))
+
+            cur.execute(
+                f"SELECT id, name, school, grade FROM students WHERE id IN ({ph})", chunk
+            )
+            for sid, name, school, grade in cur.fetchall():
+                data[sid] = {
+                    "student": {"id": sid, "name": name, "school": school, "grade": grade},
+                    "academy_name": REPORT_ACADEMY_NAME,
+                    "period": f"{start_date} ~ {end_date}",
+                    "issued_at": date.today().strftime("%Y-%m-%d"),
+                    "logo_path": os.path.abspath("logo.png"),
+                    "school_scores": [],
+                    "academy_scores": [],
+                    "attendance": {},
+                    "progress": [],
+                }
+
+            params = chunk + [start_date, end_date]
+            cur.execute(
+                f"""
+                SELECT student_id, date, subject, exam_name, score, max_score
+                FROM {src['school_scores']}
+                WHERE student_id IN ({ph}) AND date BETWEEN ? AND ?
+                ORDER BY student_id, date, id
+                """,
+                params,
+            )
+            for sid, *row in cur.fetchall():
+                data[sid]["school_scores"].append(tuple(row))
+
+            cur.execute(
+                f"""
+                SELECT student_id, date, subject, test_name, score, max_score
+                FROM {src['academy_scores']}
+                WHERE student_id IN ({ph}) AND date BETWEEN ? AND ?
+                ORDER BY student_id, date, id
+                """,
+                params,
+            )
+            for sid, *row in cur.fetchall():
+                data[sid]["academy_scores"].append(tuple(row))
+
+            cur.execute(
+                f"""
+                SELECT student_id, status, COUNT(*)
+                FROM {src['attendance']}
+                WHERE student_id IN ({ph}) AND date BETWEEN ? AND ?
+                GROUP BY student_id, status
+                """,
+                params,
+            )
+            for sid, status, cnt in cur.fetchall():
+                data[sid]["attendance"][status] = cnt
+
+            cur.execute(
+                f"""
+                SELECT student_id, date, subject, unit FROM (
+                    SELECT student_id, date, subject, unit,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY student_id ORDER BY date DESC, id DESC
+                           ) AS rn
+                    FROM {src['academy_progress']}
+                    WHERE student_id IN ({ph}) AND date BETWEEN ? AND ?
+                )
+                WHERE rn <= ?
+                ORDER BY student_id, date, rn DESC
+                """,
+                params + [REPORT_PROGRESS_ROWS],
+            )
+            for sid, *row in cur.fetchall():
+                data[sid]["progress"].append(tuple(row))
+    return [data[sid] for sid in student_ids if sid in data]
+
+
+def build_report_cards(student_ids, start_date, end_date, output="zip"):
+    """
+    성적표 일괄 생성 → (파일 bytes, 학생 수).
+    output="zip": 학생별 PDF 묶음 / output="pdf": 한 파일로 합친 PDF
+    학생이 한 명뿐이면 프로세스 풀을 거치지 않고 바로 그린다.
+    """
+    datas = collect_report_card_data(student_ids, start_date, end_date)
+    if not datas:
+        return None, 0
+    executor = _get_report_executor() if len(datas) > 1 else None
+    try:
+        payload = generate_report_cards(
+            datas, output=output, executor=executor, workers=REPORT_WORKERS
+        )
+    except BrokenProcessPool:
+        # 작업 프로세스가 죽으면 그 풀은 다시 쓸 수 없으므로 버리고(다음 생성 때 새로 만듦),
+        # 같은 데이터로 또 죽을 수 있으니 이번 생성은 이 프로세스에서 순서대로 그린다
+        executor.shutdown(wait=False, cancel_futures=True)
+        _get_report_executor.clear()
+        payload = generate_report_cards(datas, output=output)
+    return payload, len(datas)
+
+
+# ============== 단어장 DB 함수 ==============
+
+def create_vocab_set(name, description, level, created_by):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO vocab_sets
+        (name, description, level, created_by, created_at, is_active)
+        VALUES (?, ?, ?, ?, ?, 1)
+        """,
+        (name, description, level, created_by, datetime.now().isoformat()),
+    )
+    conn.commit()
+    conn.close()
+
+
+@cached_query("vocab_sets")
+def get_vocab_sets(active_only=True):
+    conn = get_connection()
+    cur = conn.cursor()
+    query = """
+        SELECT id, name, description, level, created_by, created_at, is_active
+        FROM vocab_sets
+    """
+    if active_only:
+        query += " WHERE is_active=1"
+    query += " ORDER BY created_at DESC"
+    cur.execute(query)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def add_vocab_item(set_id, word, meaning, part_of_speech,
+                   example_en, example_ko, tags, difficulty):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO vocab_items
+        (set_id, word, meaning, part_of_speech, example_en,
+         example_ko, tags, difficulty)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (set_id, word, meaning, part_of_speech,
+         example_en, example_ko, tags, difficulty),
+    )
+    conn.commit()
+    conn.close()
+
+
+# 단어 일괄 입력 컬럼 순서 (단어, 뜻은 필수)
+VOCAB_IMPORT_COLUMNS = [
+    "word", "meaning", "part_of_speech",
+    "example_en", "example_ko", "tags", "difficulty",
+]
+# 한 번에 검증/INSERT 하는 줄 수 (메모리 사용량 상한)
+VOCAB_IMPORT_CHUNK = 2000
+
+
+def _iter_vocab_lines(lines, delimiter=None):
+    """
+    입력 줄을 하나씩 읽어 (줄 번호, 컬럼 리스트 또는 None, 원문) 을 생성.
+    - delimiter=None: 붙여넣기 형식 (탭 우선, 없으면 '단어 / 뜻')
+    - delimiter=',' 또는 '\t': CSV/TSV 파일 (따옴표 처리 포함)
+    빈 줄은 건너뛰고, 인식할 수 없는 줄은 컬럼 None으로 돌려준다.
+    """
+    if delimiter is not None:
+        reader = csv.reader(lines, delimiter=delimiter)
+        for cols in reader:
+            raw = delimiter.join(cols)
+            if not raw.strip():
+                continue
+            yield reader.line_num, cols, raw
+        return
+
+    for line_no, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        # 1순위: 탭 구분 (엑셀)
+        if "\t" in line:
+            yield line_no, line.split("\t"), line
+        # 2순위: `/` 구분 백업
+        elif "/" in line:
+            w, m = line.split("/", 1)
+            yield line_no, [w, m], line
+        else:
+            yield line_no, None, line
+
+
+def _validate_vocab_chunk(chunk):
+    """
+    파싱된 줄 묶음을 pandas로 한 번에 검증.
+    반환: (저장할 DataFrame, 거절 목록[(줄, 사유, 원문)], 난이도 보정 줄 번호 목록)
+    """
+    df = pd.DataFrame(chunk, columns=["line_no", "raw"] + VOCAB_IMPORT_COLUMNS)
+    for col in VOCAB_IMPORT_COLUMNS:
+        df[col] = df[col].fillna("").astype(str).str.strip()
+
+    # 필수 컬럼: 단어 / 뜻
+    missing = (df["word"] == "") | (df["meaning"] == "")
+    rejected = [
+        (int(n), "단어 또는 뜻이 비어 있음", raw)
+        for n, raw in df.loc[missing, ["line_no", "raw"]].itertuples(index=False)
+    ]
+    df = df[~missing]
+
+    # 난이도: 1~5 정수만 허용, 나머지는 기본값 3
+    diff = pd.to_numeric(df["difficulty"], errors="coerce")
+    valid = diff.notna() & (diff >= 1) & (diff <= 5) & (diff == diff.round())
+    defaulted = df.loc[~valid & (df["difficulty"] != ""), "line_no"].astype(int).tolist()
+    df = df.assign(difficulty=diff.where(valid, 3).astype(int))
+
+    return df, rejected, defaulted
+
+
+def import_vocab_items(set_id, lines, delimiter=None, skip_header=False):
+    """
+    단어 대량 입력: 줄 단위로 읽어 VOCAB_IMPORT_CHUNK 개씩 검증한 뒤
+    세트 전체를 하나의 트랜잭션(executemany)으로 저장한다.
+
+    lines: 문자열 줄을 내주는 iterable (붙여넣은 텍스트, 업로드 파일 등)
+    반환: {"inserted": 저장 수, "rejected": [(줄, 사유, 원문)],
+           "difficulty_defaulted": [줄 번호], "preview": 앞부분 DataFrame}
+    """
+    report = {
+        "inserted": 0,
+        "rejected": [],
+        "difficulty_defaulted": [],
+        "preview": None,
+    }
+    n_cols = len(VOCAB_IMPORT_COLUMNS)
+
+    def _flush(conn, chunk):
+        df, rejected, defaulted = _validate_vocab_chunk(chunk)
+        report["rejected"].extend(rejected)
+        report["difficulty_defaulted"].extend(defaulted)
+        if df.empty:
+            return
+        conn.executemany(
+            """
+            INSERT INTO vocab_items
+            (set_id, word, meaning, part_of_speech, example_en,
+             example_ko, tags, difficulty)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (set_id, *row)
+                for row in df[VOCAB_IMPORT_COLUMNS].itertuples(index=False, name=None)
+            ),
+        )
+        report["inserted"] += len(df)
+        if report["preview"] is None:
+            report["preview"] = df[VOCAB_IMPORT_COLUMNS].head(50)
+
+    with db_transaction() as conn:
+        chunk = []
+        for i, (line_no, cols, raw) in enumerate(_iter_vocab_lines(lines, delimiter)):
+            if skip_header and i == 0:
+                continue
+            if cols is None:
+                report["rejected"].append(
+                    (line_no, "구분자(탭 또는 /)를 찾을 수 없음", raw)
+                )
+                continue
+            if len(cols) < 2:
+                report["rejected"].append((line_no, "컬럼이 2개 미만", raw))
+                continue
+            cols = (cols + [""] * n_cols)[:n_cols]
+            chunk.append([line_no, raw] + cols)
+            if len(chunk) >= VOCAB_IMPORT_CHUNK:
+                _flush(conn, chunk)
+                chunk = []
+        if chunk:
+            _flush(conn, chunk)
+
+    report["rejected"].sort(key=lambda r: r[0])
+    return report
+
+
+@cached_query("vocab_items")
+def get_vocab_items(set_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, word, meaning, part_of_speech,
+               example_en, example_ko, tags, difficulty
+        FROM vocab_items
+        WHERE set_id=?
+        ORDER BY id
+        """,
+        (set_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def assign_vocab_to_class(set_id, class_id, user_id):
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
@@ -1306,130 +3661,835 @@ def assign_vocab_to_student(set_id, student_id, user_id):
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO vocab_assignments
-        (set_id, class_id, student_id, assigned_by, assigned_at)
-        VALUES (?, NULL, ?, ?, ?)
+        INSERT INTO vocab_assignments
+        (set_id, class_id, student_id, assigned_by, assigned_at)
+        VALUES (?, NULL, ?, ?, ?)
+        """,
+        (set_id, student_id, user_id, datetime.now().isoformat()),
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_assigned_vocab_sets_for_student(student_id):
+    classes = get_classes_for_student(student_id)
+    class_ids = [cid for cid, cname, clevel in classes]
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    params = [student_id]
+    query = """
+        SELECT DISTINCT vs.id, vs.name, vs.description, vs.level
+        FROM vocab_assignments va
+        JOIN vocab_sets vs ON va.set_id = vs.id
+        LEFT JOIN class_students cs ON va.class_id = cs.class_id
+        WHERE vs.is_active=1 AND (
+            va.student_id = ?
+    """
+    if class_ids:
+        placeholders = ",".join(["?"] * len(class_ids))
+        query += f" OR va.class_id IN ({placeholders})"
+        params.extend(class_ids)
+    query += ")"
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def save_vocab_quiz_result(set_id, student_id, correct_count, total_count, mode="quiz"):
+    conn = get_connection()
+    cur = conn.cursor()
+    percent = (correct_count / total_count * 100.0) if total_count > 0 else 0.0
+    cur.execute(
+        """
+        INSERT INTO vocab_results
+        (set_id, student_id, taken_at, mode,
+         correct_count, total_count, percent)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (set_id, student_id, datetime.now().isoformat(),
+         mode, correct_count, total_count, percent),
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_vocab_assignments_for_set(set_id):
+    """세트 할당 현황 [(할당 id, 반 이름, 학생 이름, 할당 시각)] 최신순"""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT va.id, c.name, s.name, va.assigned_at
+        FROM vocab_assignments va
+        LEFT JOIN classes c ON va.class_id=c.id
+        LEFT JOIN students s ON va.student_id=s.id
+        WHERE va.set_id=?
+        ORDER BY va.assigned_at DESC
+        """,
+        (set_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_vocab_results_for_set(set_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT vr.student_id, s.name, vr.taken_at,
+               vr.correct_count, vr.total_count, vr.percent
+        FROM vocab_results vr
+        JOIN students s ON vr.student_id = s.id
+        WHERE vr.set_id=?
+        ORDER BY vr.taken_at DESC
+        """,
+        (set_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ============== 시험지 / 자료 파일 ==============
+
+# 업로드 파일은 내용 SHA-256 으로 이름을 붙여 BLOB_DIR/ab/cd/<해시><확장자> 에 한 번만 저장한다.
+# 같은 파일을 여러 학생에게 올려도 exam_documents 행만 늘어나고 파일은 공유된다.
+# 참조 수 = 같은 content_hash 를 가진 exam_documents 행 수.
+
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_stream(f):
+    """파일 객체를 청크 단위로 읽어 (sha256 hex, 크기) 반환"""
+    h = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _blob_path(content_hash, ext):
+    return os.path.join(BLOB_DIR, content_hash[:2], content_hash[2:4], content_hash + ext)
+
+
+def stage_uploaded_file(uploaded_file, student_id):
+    """
+    업로드 파일을 청크 단위로 임시 파일에 쓰면서 해시를 계산한다 (저장소에는 아직 넣지 않음).
+    반환: {"tmp_path", "name", "ext", "content_hash", "size"} → add_exam_document 에 넘긴다.
+    """
+    base, ext = os.path.splitext(uploaded_file.name)
+    safe_ext = ext.lower() if ext else ".dat"
+
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"stu{student_id}_{os.urandom(8).hex()}")
+
+    h = hashlib.sha256()
+    size = 0
+    uploaded_file.seek(0)
+    try:
+        with open(tmp_path, "wb") as out:
+            for chunk in iter(lambda: uploaded_file.read(BLOB_CHUNK_SIZE), b""):
+                h.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {
+        "tmp_path": tmp_path,
+        "name": uploaded_file.name,
+        "ext": safe_ext,
+        "content_hash": h.hexdigest(),
+        "size": size,
+    }
+
+
+# 목록 화면용 축소 이미지. 파일 해시 기준으로 한 번만 만든다 (THUMB_DIR/ab/<해시>_<크기>.jpg).
+THUMB_MAX_SIZE = 480
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+
+# 축소본을 만들다 실패하는 경우 (손상·지원하지 않는 파일, 너무 큰 이미지)
+THUMB_ERRORS = (OSError, UnidentifiedImageError, Image.DecompressionBombError) + (
+    (pdfium.PdfiumError,) if pdfium is not None else ()
+)
+
+
+def _thumbnail_path(content_hash):
+    return os.path.join(THUMB_DIR, content_hash[:2], f"{content_hash}_{THUMB_MAX_SIZE}.jpg")
+
+
+def _thumbnail_failed_path(content_hash):
+    """축소본 만들기에 실패한 파일 표시 (목록을 다시 그릴 때마다 또 열어 보지 않도록)"""
+    return _thumbnail_path(content_hash) + ".failed"
+
+
+def ensure_thumbnail(file_path, content_hash):
+    """
+    이미지 / PDF(첫 페이지) 축소본 경로를 반환. 없으면 만들어 두고,
+    만들 수 없는 형식이거나 실패하면 None (실패는 .failed 표시로 기억).
+    """
+    if not content_hash:
+        return None
+    thumb_path = _thumbnail_path(content_hash)
+    if os.path.exists(thumb_path):
+        return thumb_path
+    failed_path = _thumbnail_failed_path(content_hash)
+    if os.path.exists(failed_path):
+        return None
+
+    tmp_path = None
+    try:
+        if file_path.lower().endswith(IMAGE_EXTS):
+            with Image.open(file_path) as im:
+                im = ImageOps.exif_transpose(im)
+                im.thumbnail((THUMB_MAX_SIZE, THUMB_MAX_SIZE))
+                thumb = im.convert("RGB")
+        elif file_path.lower().endswith(".pdf") and pdfium is not None:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                page = pdf[0]
+                scale = THUMB_MAX_SIZE / max(page.get_size())
+                thumb = page.render(scale=scale).to_pil().convert("RGB")
+            finally:
+                pdf.close()
+        else:
+            return None
+
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.{os.urandom(4).hex()}.tmp"
+        thumb.save(tmp_path, "JPEG", quality=80)
+        os.replace(tmp_path, thumb_path)
+        return thumb_path
+    except THUMB_ERRORS:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.makedirs(os.path.dirname(failed_path), exist_ok=True)
+            open(failed_path, "w").close()
+        except OSError:
+            pass
+        return None
+
+
+def add_exam_document(student_id, subject, exam_type, exam_name,
+                      exam_date_str, tags, memo, staged, uploaded_by):
+    """
+    stage_uploaded_file() 결과를 저장소에 넣고 자료 행을 추가. 반환: 저장된 파일 경로.
+    파일 배치와 INSERT 를 한 쓰기 잠금(BEGIN IMMEDIATE) 안에서 해서 같은 파일을 지우는
+    delete_exam_document 와 엇갈리지 않게 하고, INSERT 가 실패하면 새로 놓은 파일을 치운다.
+    """
+    content_hash = staged["content_hash"]
+    conn = get_connection()
+    cur = conn.cursor()
+    placed = False
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            "SELECT file_path FROM exam_documents WHERE content_hash=? LIMIT 1",
+            (content_hash,),
+        )
+        row = cur.fetchone()
+        if row and os.path.exists(row[0]):
+            # 같은 내용이 이미 있으면 그 파일을 공유
+            file_path = row[0]
+        else:
+            file_path = _blob_path(content_hash, staged["ext"])
+            if not os.path.exists(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(staged["tmp_path"], file_path)
+                placed = True
+        cur.execute(
+            """
+            INSERT INTO exam_documents
+            (student_id, subject, exam_type, exam_name, exam_date,
+             tags, memo, file_path, original_name, uploaded_by, uploaded_at,
+             content_hash, file_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (student_id, subject, exam_type, exam_name, exam_date_str,
+             tags, memo, file_path, staged["name"], uploaded_by,
+             datetime.now().isoformat(), content_hash, staged["size"]),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        if placed and os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    finally:
+        conn.close()
+        if os.path.exists(staged["tmp_path"]):
+            os.remove(staged["tmp_path"])
+    return file_path
+
+
+def delete_exam_document(doc_id):
+    """
+    자료 행 삭제. 같은 파일을 참조하는 행이 더 없으면 파일도 삭제.
+    참조 수 확인과 파일 제거를 add_exam_document 와 같은 쓰기 잠금 안에서 하므로,
+    그 사이에 같은 내용이 다시 올라와 새 행이 그 파일을 가리키는 일이 없다.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    trash_path = None
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            "SELECT file_path, content_hash FROM exam_documents WHERE id=?",
+            (doc_id,),
+        )
+        row = cur.fetchone()
+        if not row:
+            conn.rollback()
+            return
+        file_path, content_hash = row
+        cur.execute("DELETE FROM exam_documents WHERE id=?", (doc_id,))
+        if content_hash:
+            cur.execute(
+                "SELECT COUNT(*) FROM exam_documents WHERE content_hash=? AND file_path=?",
+                (content_hash, file_path),
+            )
+        else:
+            cur.execute(
+                "SELECT COUNT(*) FROM exam_documents WHERE file_path=?",
+                (file_path,),
+            )
+        remaining = cur.fetchone()[0]
+
+        if remaining == 0 and os.path.exists(file_path):
+            # 커밋이 실패하면 되돌릴 수 있도록 지우기 전에 옆으로 치워 둔다
+            trash_path = f"{file_path}.{os.urandom(4).hex()}.deleted"
+            os.replace(file_path, trash_path)
+        try:
+            conn.commit()
+        except Exception:
+            if trash_path:
+                os.replace(trash_path, file_path)
+            raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if trash_path:
+        os.remove(trash_path)
+        if content_hash:
+            for path in (_thumbnail_path(content_hash), _thumbnail_failed_path(content_hash)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def get_exam_documents_for_student(student_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, subject, exam_type, exam_name, exam_date,
+               tags, memo, file_path, original_name, uploaded_at, content_hash
+        FROM exam_documents
+        WHERE student_id=?
+        ORDER BY exam_date DESC, uploaded_at DESC
         """,
-        (set_id, student_id, user_id, datetime.now().isoformat()),
+        (student_id,),
     )
-    conn.commit()
+    rows = cur.fetchall()
     conn.close()
+    return rows
 
 
-def get_assigned_vocab_sets_for_student(student_id):
-    classes = get_classes_for_student(student_id)
-    class_ids = [cid for cid, cname, clevel in classes]
-
+def _get_exam_document_student(doc_id):
     conn = get_connection()
     cur = conn.cursor()
+    cur.execute("SELECT student_id FROM exam_documents WHERE id=?", (doc_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
 
-    params = [student_id]
-    query = """
-        SELECT DISTINCT vs.id, vs.name, vs.description, vs.level
-        FROM vocab_assignments va
-        JOIN vocab_sets vs ON va.set_id = vs.id
-        LEFT JOIN class_students cs ON va.class_id = cs.class_id
-        WHERE vs.is_active=1 AND (
-            va.student_id = ?
+
+# ============== 통합 검색 (FTS5) ==============
+#
+# 여러 테이블을 search_index 하나에 색인한다. rowid = 원본 id * SEARCH_KIND_SLOTS + 종류 코드
+# 로 두어서 트리거가 원본 행 하나를 rowid 로 바로 지우고 다시 넣을 수 있게 했다.
+
+SEARCH_KIND_SLOTS = 8
+
+# 종류 코드 → (테이블, 표시 이름, 제목 컬럼, 본문 컬럼)
+SEARCH_SOURCES = {
+    1: ("students", "학생", ["name"], ["school", "grade", "memo"]),
+    2: ("notices", "공지", ["title"], ["content"]),
+    3: ("vocab_items", "단어", ["word"], ["meaning", "example_en", "example_ko", "tags"]),
+    4: ("exam_documents", "시험지", ["exam_name"], ["subject", "tags", "memo", "original_name"]),
+}
+
+
+def _search_text_sql(ref, cols):
+    """컬럼들을 공백으로 이어 붙이는 SQL 식 (NULL 은 빈 문자열)"""
+    return " || ' ' || ".join(f"COALESCE({ref}.{c}, '')" for c in cols)
+
+
+def _build_search_match(query: str) -> str:
+    """입력어를 FTS5 MATCH 식으로: 단어마다 접두어 검색, 모두 포함(AND)"""
+    terms = [t.replace('"', "") for t in query.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+def search_all(query: str, limit: int = 30, kinds=None):
     """
-    if class_ids:
-        placeholders = ",".join(["?"] * len(class_ids))
-        query += f" OR va.class_id IN ({placeholders})"
-        params.extend(class_ids)
-    query += ")"
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    통합 검색. 관련도 순으로
+    [{"kind": 종류 코드, "label": 표시 이름, "ref_id": 원본 id, "title": 제목, "snippet": 본문 일부}]
+    kinds 를 주면 해당 종류 코드만.
+    """
+    match = _build_search_match(query or "")
+    if not match:
+        return []
 
+    sql = """
+        SELECT rowid, title, snippet(search_index, 1, '**', '**', '…', 12)
+        FROM search_index
+        WHERE search_index MATCH ?
+    """
+    params = [match]
+    if kinds:
+        sql += f" AND rowid % {SEARCH_KIND_SLOTS} IN ({','.join('?' * len(kinds))})"
+        params.extend(kinds)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
 
-def save_vocab_quiz_result(set_id, student_id, correct_count, total_count, mode="quiz"):
     conn = get_connection()
     cur = conn.cursor()
-    percent = (correct_count / total_count * 100.0) if total_count > 0 else 0.0
-    cur.execute(
-        """
-        INSERT INTO vocab_results
-        (set_id, student_id, taken_at, mode,
-         correct_count, total_count, percent)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (set_id, student_id, datetime.now().isoformat(),
-         mode, correct_count, total_count, percent),
-    )
-    conn.commit()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    except sqlite3.OperationalError:
+        # FTS5 미지원 빌드이거나 검색식 오류
+        rows = []
+    finally:
+        conn.close()
+
+    results = []
+    for rowid, title, snippet in rows:
+        kind = rowid % SEARCH_KIND_SLOTS
+        if kind not in SEARCH_SOURCES:
+            continue
+        results.append(
+            {
+                "kind": kind,
+                "label": SEARCH_SOURCES[kind][1],
+                "ref_id": rowid // SEARCH_KIND_SLOTS,
+                "title": title,
+                "snippet": snippet,
+            }
+        )
+    return results
+
+
+# ============== 데이터 관리 (페이지 단위 조회) ==============
+
+# 데이터 종류별 (SELECT 컬럼, FROM 절, 별칭)
+# SELECT 의 첫 두 컬럼은 항상 id, date 여야 한다 (키셋 커서로 사용).
+DATA_BROWSER_SOURCES = {
+    "학교 성적": (
+        "sc.id, sc.date, sc.subject, sc.exam_name, sc.score, sc.max_score, sc.memo",
+        "school_scores sc",
+        "sc",
+    ),
+    "학원 성적": (
+        "ac.id, ac.date, ac.subject, ac.test_name, ac.score, ac.max_score, ac.memo",
+        "academy_scores ac",
+        "ac",
+    ),
+    "학원 진도": (
+        "p.id, p.date, s.name, c.name, p.subject, p.unit, p.memo",
+        """academy_progress p
+           JOIN students s ON p.student_id=s.id
+           LEFT JOIN classes c ON p.class_id=c.id""",
+        "p",
+    ),
+    "출석": (
+        """a.id, a.date, a.checkin_time, a.status, a.homework_status,
+           a.daily_test_status, a.via, s.name, s.school, s.grade, c.name""",
+        """attendance a
+           JOIN students s ON a.student_id = s.id
+           LEFT JOIN classes c ON a.class_id = c.id""",
+        "a",
+    ),
+}
+DATA_PAGE_SIZES = [10, 20, 50, 100]
+
+# 표(그리드) 일괄 수정용: 데이터 종류별 (테이블, 행 튜플 컬럼명, 수정 가능 컬럼)
+DATA_GRID_SPECS = {
+    "학교 성적": (
+        "school_scores",
+        ["id", "date", "subject", "exam_name", "score", "max_score", "memo"],
+        ["date", "subject", "exam_name", "score", "max_score", "memo"],
+    ),
+    "학원 성적": (
+        "academy_scores",
+        ["id", "date", "subject", "test_name", "score", "max_score", "memo"],
+        ["date", "subject", "test_name", "score", "max_score", "memo"],
+    ),
+    "학원 진도": (
+        "academy_progress",
+        ["id", "date", "student_name", "class_name", "subject", "unit", "memo"],
+        ["date", "subject", "unit", "memo"],
+    ),
+    "출석": (
+        "attendance",
+        ["id", "date", "checkin_time", "status", "homework_status",
+         "daily_test_status", "via", "student_name", "school", "grade", "class_name"],
+        ["status", "homework_status", "daily_test_status"],
+    ),
+}
+
+# 비워 둘 수 없는 컬럼 (NOT NULL) → 화면 이름
+DATA_GRID_REQUIRED = {"date": "날짜", "subject": "과목", "status": "출결 상태"}
+
+
+def _data_browser_where(filters):
+    """[(컬럼, 값), ...] → (' AND 컬럼=? ...', [값, ...])"""
+    sql = "".join(f" AND {col}=?" for col, _ in filters)
+    return sql, [val for _, val in filters]
+
+
+def count_data_records(source, filters):
+    """조건에 맞는 전체 건수 (페이지 조회와 같은 FROM/JOIN 이라 삭제된 학생 기록은 빠진다)"""
+    _, from_sql, _ = DATA_BROWSER_SOURCES[source]
+    where_sql, params = _data_browser_where(filters)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {from_sql} WHERE 1=1{where_sql}", params)
+    total = cur.fetchone()[0]
     conn.close()
+    return total
 
 
-def get_vocab_results_for_set(set_id):
+def fetch_data_records_page(source, filters, cursor=None, page_size=20):
+    """
+    date DESC, id DESC 순서의 키셋 페이지 조회.
+    cursor: 이전 페이지 마지막 행의 (date, id). None 이면 첫 페이지.
+    반환: (rows, 다음 페이지 cursor 또는 None)
+    """
+    select_sql, from_sql, alias = DATA_BROWSER_SOURCES[source]
+    where_sql, params = _data_browser_where(filters)
+    if cursor is not None:
+        where_sql += f" AND ({alias}.date, {alias}.id) < (?, ?)"
+        params.extend(cursor)
+    params.append(page_size + 1)
+
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
-        """
-        SELECT vr.student_id, s.name, vr.taken_at,
-               vr.correct_count, vr.total_count, vr.percent
-        FROM vocab_results vr
-        JOIN students s ON vr.student_id = s.id
-        WHERE vr.set_id=?
-        ORDER BY vr.taken_at DESC
+        f"""
+        SELECT {select_sql}
+        FROM {from_sql}
+        WHERE 1=1{where_sql}
+        ORDER BY {alias}.date DESC, {alias}.id DESC
+        LIMIT ?
         """,
-        (set_id,),
+        params,
     )
     rows = cur.fetchall()
     conn.close()
-    return rows
 
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, (last[1], last[0])
+    return rows, None
 
-# ============== 시험지 / 자료 파일 ==============
 
-def save_uploaded_file(uploaded_file, student_id):
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base, ext = os.path.splitext(uploaded_file.name)
-    safe_ext = ext if ext else ".dat"
-    filename = f"stu{student_id}_{timestamp}{safe_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return file_path, uploaded_file.name
+def _grid_value(v):
+    """data_editor 값(numpy/pandas/date) → sqlite에 넣을 파이썬 값"""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    if isinstance(v, (date, datetime, pd.Timestamp)):
+        return v.strftime("%Y-%m-%d")
+    if hasattr(v, "item"):
+        return v.item()
+    return v
 
 
-def add_exam_document(student_id, subject, exam_type, exam_name,
-                      exam_date_str, tags, memo, file_path,
-                      original_name, uploaded_by):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO exam_documents
-        (student_id, subject, exam_type, exam_name, exam_date,
-         tags, memo, file_path, original_name, uploaded_by, uploaded_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (student_id, subject, exam_type, exam_name, exam_date_str,
-         tags, memo, file_path, original_name, uploaded_by,
-         datetime.now().isoformat()),
-    )
-    conn.commit()
-    conn.close()
+def diff_data_grid(source, original, edited):
+    """
+    원본/수정본 DataFrame(id 컬럼 포함, 같은 행 순서)을 비교해 바뀐 것만 추린다.
+    반환: (updates[(id, {컬럼: 값})], deletes[id], errors[메시지])
+    삭제는 edited 의 "_delete" 체크 컬럼으로 표시한다.
+    행별 수정 폼과 같이 문자열은 앞뒤 공백을 지우고, 필수 컬럼이 비면 errors 에 담는다.
+    """
+    _, _, editable = DATA_GRID_SPECS[source]
+    orig = original.set_index("id")[editable]
+    edit = edited.set_index("id")
+
+    deletes = [int(i) for i in edit.index[edit["_delete"].fillna(False).astype(bool)]]
+    edit = edit.drop(index=deletes)[editable]
+    orig = orig.loc[edit.index]
+
+    changed = (orig != edit) & ~(orig.isna() & edit.isna())
+    updates, errors = [], []
+    for row_id, mask in changed[changed.any(axis=1)].iterrows():
+        values = {}
+        for c in mask.index[mask.to_numpy()]:
+            v = _grid_value(edit.at[row_id, c])
+            if isinstance(v, str):
+                v = v.strip()
+            if c in DATA_GRID_REQUIRED and v in (None, ""):
+                errors.append(f"ID {int(row_id)}: {DATA_GRID_REQUIRED[c]}은(는) 비워 둘 수 없습니다.")
+            values[c] = v
+        updates.append((int(row_id), values))
+    return updates, deletes, errors
+
+
+def apply_data_grid_changes(source, updates, deletes):
+    """diff_data_grid 결과를 한 트랜잭션으로 반영 (같은 컬럼 조합끼리 executemany)"""
+    table, _, _ = DATA_GRID_SPECS[source]
+    groups = {}
+    for row_id, values in updates:
+        cols = tuple(sorted(values))
+        groups.setdefault(cols, []).append(
+            tuple(values[c] for c in cols) + (row_id,)
+        )
 
+    with db_transaction() as conn:
+        for cols, params in groups.items():
+            set_sql = ", ".join(f"{c}=?" for c in cols)
+            conn.executemany(f"UPDATE {table} SET {set_sql} WHERE id=?", params)
+        if deletes:
+            conn.executemany(
+                f"DELETE FROM {table} WHERE id=?", [(i,) for i in deletes]
+            )
+    return len(updates), len(deletes)
+
+
+# ============== 데이터 내보내기 (스트리밍) ==============
+#
+# 몇 년 치 출석을 내보내도 메모리 사용량이 일정하도록, 커서에서 EXPORT_CHUNK_ROWS 행씩
+# 꺼내 zip 항목에 바로 써 내려간다. zip 은 디스크 임시 파일에 만들어진다.
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "academy_exports")
+EXPORT_KEEP_SECONDS = 3600      # 이보다 오래된 내보내기 파일은 다음 내보내기 때 삭제
+
+# 내보내기 항목: 파일 이름 → (화면 라벨, [(SELECT 식, 컬럼명)], FROM 절,
+#                              날짜 컬럼, 반 필터 조건)
+# 반 필터 조건은 class_id 하나를 ? 로 받는다. 날짜 컬럼이 None 이면 기간 필터 없음.
+# FROM 절의 {테이블} 은 보관된 학년도까지 합친 조회 대상으로 바뀐다 (history_connection).
+_IN_CLASS = "IN (SELECT student_id FROM class_students WHERE class_id=?)"
+EXPORT_SOURCES = {
+    "attendance": (
+        "출석",
+        [
+            ("a.id", "id"), ("a.date", "date"), ("a.checkin_time", "checkin_time"),
+            ("s.id", "student_id"), ("s.name", "student_name"),
+            ("s.school", "school"), ("s.grade", "grade"),
+            ("c.id", "class_id"), ("c.name", "class_name"),
+            ("a.status", "status"), ("a.homework_status", "homework_status"),
+            ("a.daily_test_status", "daily_test_status"), ("a.via", "via"),
+        ],
+        """{attendance} a
+           JOIN students s ON a.student_id=s.id
+           LEFT JOIN classes c ON a.class_id=c.id""",
+        "a.date",
+        "a.class_id=?",
+    ),
+    "academy_scores": (
+        "학원 성적",
+        [
+            ("ac.id", "id"), ("ac.date", "date"),
+            ("s.id", "student_id"), ("s.name", "student_name"), ("s.grade", "grade"),
+            ("c.id", "class_id"), ("c.name", "class_name"),
+            ("ac.subject", "subject"), ("ac.test_name", "test_name"),
+            ("ac.score", "score"), ("ac.max_score", "max_score"), ("ac.memo", "memo"),
+        ],
+        """{academy_scores} ac
+           JOIN students s ON ac.student_id=s.id
+           LEFT JOIN classes c ON ac.class_id=c.id""",
+        "ac.date",
+        "ac.class_id=?",
+    ),
+    "school_scores": (
+        "학교 성적",
+        [
+            ("sc.id", "id"), ("sc.date", "date"),
+            ("s.id", "student_id"), ("s.name", "student_name"),
+            ("s.school", "school"), ("s.grade", "grade"),
+            ("sc.subject", "subject"), ("sc.exam_name", "exam_name"),
+            ("sc.score", "score"), ("sc.max_score", "max_score"), ("sc.memo", "memo"),
+        ],
+        "{school_scores} sc JOIN students s ON sc.student_id=s.id",
+        "sc.date",
+        f"sc.student_id {_IN_CLASS}",
+    ),
+    "academy_progress": (
+        "학원 진도",
+        [
+            ("p.id", "id"), ("p.date", "date"),
+            ("s.id", "student_id"), ("s.name", "student_name"), ("s.grade", "grade"),
+            ("c.id", "class_id"), ("c.name", "class_name"),
+            ("p.subject", "subject"), ("p.unit", "unit"), ("p.memo", "memo"),
+        ],
+        """{academy_progress} p
+           JOIN students s ON p.student_id=s.id
+           LEFT JOIN classes c ON p.class_id=c.id""",
+        "p.date",
+        "p.class_id=?",
+    ),
+    "vocab_results": (
+        "단어 시험 결과",
+        [
+            ("vr.id", "id"), ("vr.taken_at", "taken_at"),
+            ("s.id", "student_id"), ("s.name", "student_name"), ("s.grade", "grade"),
+            ("vs.name", "set_name"), ("vr.mode", "mode"),
+            ("vr.correct_count", "correct_count"), ("vr.total_count", "total_count"),
+            ("vr.percent", "percent"),
+        ],
+        """vocab_results vr
+           JOIN students s ON vr.student_id=s.id
+           LEFT JOIN vocab_sets vs ON vr.set_id=vs.id""",
+        "vr.taken_at",
+        f"vr.student_id {_IN_CLASS}",
+    ),
+    "students": (
+        "학생 명단",
+        [
+            ("s.id", "id"), ("s.name", "name"), ("s.school", "school"),
+            ("s.grade", "grade"), ("s.parent_phone", "parent_phone"), ("s.memo", "memo"),
+        ],
+        "students s",
+        None,
+        f"s.id {_IN_CLASS}",
+    ),
+    "class_students": (
+        "반 배정",
+        [
+            ("c.id", "class_id"), ("c.name", "class_name"), ("c.level", "level"),
+            ("s.id", "student_id"), ("s.name", "student_name"), ("s.grade", "grade"),
+        ],
+        """class_students cs
+           JOIN classes c ON cs.class_id=c.id
+           JOIN students s ON cs.student_id=s.id""",
+        None,
+        "cs.class_id=?",
+    ),
+}
+
+
+def _export_query(source, start_date=None, end_date=None, class_id=None, src=None):
+    """
+    내보내기 SELECT 문과 파라미터. 기간은 [start_date, end_date] (YYYY-MM-DD, 양끝 포함)
+    src: history_connection 이 준 {테이블: 조회 대상} (없으면 운영 DB 테이블)
+    """
+    _, columns, from_sql, date_col, class_cond = EXPORT_SOURCES[source]
+    from_sql = from_sql.format_map(src or {t: t for t in ARCHIVE_TABLES})
+    select_sql = ", ".join(f"{expr} AS {name}" for expr, name in columns)
+    where, params = [], []
+    if date_col and start_date:
+        where.append(f"{date_col} >= ?")
+        params.append(start_date)
+    if date_col and end_date:
+        # taken_at 처럼 시각이 붙은 값도 포함되도록 다음 날 미만으로 비교
+        next_day = datetime.strptime(end_date, "%Y-%m-%d").date() + timedelta(days=1)
+        where.append(f"{date_col} < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    if class_id is not None:
+        where.append(class_cond)
+        params.append(class_id)
+
+    sql = f"SELECT {select_sql} FROM {from_sql}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    order = f"{date_col}, {columns[0][0]}" if date_col else columns[0][0]
+    return sql + f" ORDER BY {order}", params
+
+
+def iter_export_chunks(source, start_date=None, end_date=None, class_id=None,
+                       chunk_rows=EXPORT_CHUNK_ROWS):
+    """내보내기 행을 chunk_rows 개씩 리스트로 내어줌 (전체를 메모리에 올리지 않음)"""
+    with history_connection(ARCHIVE_TABLES, start_date, end_date) as (conn, src):
+        sql, params = _export_query(source, start_date, end_date, class_id, src)
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # 중간에 그만둬도 읽던 문장을 끝내야 보관 DB 를 DETACH 할 수 있다
+            cur.close()
 
-def get_exam_documents_for_student(student_id):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, subject, exam_type, exam_name, exam_date,
-               tags, memo, file_path, original_name, uploaded_at
-        FROM exam_documents
-        WHERE student_id=?
-        ORDER BY exam_date DESC, uploaded_at DESC
-        """,
-        (student_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+
+def write_export_zip(fileobj, sources, fmt="csv", start_date=None, end_date=None,
+                     class_id=None):
+    """
+    sources 의 각 항목을 {이름}.csv / {이름}.jsonl 로 zip 에 스트리밍으로 기록.
+    CSV 는 엑셀에서 한글이 깨지지 않도록 BOM 포함 UTF-8.
+    반환: {이름: 행 수}
+    """
+    counts = {}
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+        for source in sources:
+            columns = [name for _, name in EXPORT_SOURCES[source][1]]
+            raw = zf.open(f"{source}.{fmt}", "w", force_zip64=True)
+            encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+            with io.TextIOWrapper(raw, encoding=encoding, newline="") as out:
+                writer = csv.writer(out) if fmt == "csv" else None
+                if writer:
+                    writer.writerow(columns)
+                n = 0
+                for rows in iter_export_chunks(source, start_date, end_date, class_id):
+                    if writer:
+                        writer.writerows(rows)
+                    else:
+                        out.writelines(
+                            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+                            for row in rows
+                        )
+                    n += len(rows)
+            counts[source] = n
+    return counts
+
+
+def create_export_file(sources, fmt="csv", start_date=None, end_date=None, class_id=None):
+    """EXPORT_DIR 에 내보내기 zip 을 만들고 (경로, 항목별 행 수) 반환. 오래된 파일은 정리."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cutoff = datetime.now().timestamp() - EXPORT_KEEP_SECONDS
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+    fd, path = tempfile.mkstemp(suffix=".zip", dir=EXPORT_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            counts = write_export_zip(f, sources, fmt, start_date, end_date, class_id)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, counts
+
+
+def read_export_file(path):
+    """다운로드 버튼을 눌렀을 때 내보내기 zip 내용을 읽음 (그새 정리됐으면 빈 내용)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
 
 
 # ============== 테마 ==============
@@ -1578,16 +4638,39 @@ def login_page():
                 )
 
                 if st.button("로그인", use_container_width=True):
-                    user = login_user(username, password)
-                    if not user:
-                        st.error("아이디 또는 비밀번호가 올바르지 않습니다.")
+                    # 세션 구분용 임의 ID (로그인 시도 제한 키)
+                    client_id = st.session_state.setdefault(
+                        "login_client_id", os.urandom(8).hex()
+                    )
+                    ip_address = st.context.ip_address
+                    allowed, retry_after = check_login_allowed(
+                        username, client_id, ip_address
+                    )
+                    if not allowed:
+                        st.error(
+                            f"로그인 시도가 너무 많습니다. {retry_after}초 후 다시 시도하세요."
+                        )
+                        user = None
                     else:
+                        try:
+                            user = login_user(username, password)
+                        except HashServiceBusy:
+                            st.warning("로그인 요청이 몰려 있습니다. 잠시 후 다시 시도하세요.")
+                            user = None
+                        else:
+                            record_login_result(
+                                username, client_id, bool(user), ip_address
+                            )
+                            if not user:
+                                st.error("아이디 또는 비밀번호가 올바르지 않습니다.")
+                    if user:
                         if not user.get("is_active", True):
                             st.error("사용이 중지된 계정입니다.")
                         elif user["role"] in ("admin", "student") and not user["is_approved"]:
                             st.warning("승인 대기 중입니다. 마스터 승인 후 로그인 가능합니다.")
                         else:
                             st.session_state["user"] = user
+                            set_session_cookie(issue_session_token(user["id"]))
                             st.rerun()
 
                 st.markdown(
@@ -1644,14 +4727,18 @@ def login_page():
                         elif new_password != new_password2:
                             st.warning("비밀번호가 일치하지 않습니다.")
                         else:
-                            ok = create_admin(new_username, new_password)
+                            try:
+                                ok = create_admin(new_username, new_password)
+                            except HashServiceBusy:
+                                ok = None
+                                st.warning("요청이 몰려 있습니다. 잠시 후 다시 시도하세요.")
                             if ok:
                                 st.success(
                                     "관리자 신청 완료! 마스터 승인 후 사용 가능합니다."
                                 )
                                 st.session_state["login_view"] = "login"
                                 st.rerun()
-                            else:
+                            elif ok is False:
                                 st.error("이미 존재하는 아이디입니다.")
 
                 with c2:
@@ -1673,16 +4760,10 @@ def login_page():
                 if not students:
                     st.info("먼저 학원에서 학생 등록 후, 계정 신청이 가능합니다.")
                 else:
-                    s_opts = {
-                        f"{name} ({grade}, {school}) [ID:{sid}]": sid
-                        for sid, name, school, grade, phone, memo in students
-                    }
-                    s_label = st.selectbox(
+                    student_id = student_picker(
                         "본인 이름 선택 (학원에 등록된 정보와 일치해야 합니다.)",
-                        list(s_opts.keys()),
                         key="stu_signup_student",
                     )
-                    student_id = s_opts[s_label]
 
                     new_username = st.text_input("학생 아이디", key="stu_signup_username")
                     new_password = st.text_input(
@@ -1695,21 +4776,27 @@ def login_page():
                     c1, c2 = st.columns(2)
                     with c1:
                         if st.button("신청하기", use_container_width=True):
-                            if not new_username or not new_password:
+                            if student_id is None:
+                                st.warning("본인 이름을 선택하세요.")
+                            elif not new_username or not new_password:
                                 st.warning("아이디와 비밀번호를 입력하세요.")
                             elif new_password != new_password2:
                                 st.warning("비밀번호가 일치하지 않습니다.")
                             else:
-                                ok = create_student_user(
-                                    student_id, new_username, new_password
-                                )
+                                try:
+                                    ok = create_student_user(
+                                        student_id, new_username, new_password
+                                    )
+                                except HashServiceBusy:
+                                    ok = None
+                                    st.warning("요청이 몰려 있습니다. 잠시 후 다시 시도하세요.")
                                 if ok:
                                     st.success(
                                         "학생 계정 신청 완료! 마스터 승인 후 로그인 가능합니다."
                                     )
                                     st.session_state["login_view"] = "login"
                                     st.rerun()
-                                else:
+                                elif ok is False:
                                     st.error("이미 사용 중인 아이디입니다.")
                     with c2:
                         if st.button("← 로그인으로 돌아가기", use_container_width=True):
@@ -1733,6 +4820,9 @@ def render_sidebar():
             st.markdown(f"**로그인:** `{user['username']}` ({user['role']})")
             if st.button("로그아웃", key="sidebar_logout_button"):
                 st.session_state["user"] = None
+                # 쿠키가 복사돼 있어도 다시 로그인되지 않도록 토큰 자체를 폐기
+                revoke_session_tokens(user["id"])
+                set_session_cookie(None)
                 st.rerun()
 
             st.markdown("---")
@@ -1777,6 +4867,13 @@ def render_sidebar():
                     key="admin_menu",
                 )
 
+                st.markdown("---")
+                st.text_input(
+                    "🔎 통합 검색",
+                    key="global_search",
+                    placeholder="학생 / 공지 / 단어 / 시험지",
+                )
+
             st.markdown("---")
             st.markdown(
                 "<div style='font-size:11px; opacity:0.8;'>테마 선택</div>",
@@ -1795,9 +4892,408 @@ def render_sidebar():
         else:
             st.info("로그인 후 메뉴를 사용할 수 있습니다.")
 
-        return menu_value
+        return menu_value
+
+# ============== 섹션 전환 (지연 렌더링) ==============
+
+def lazy_sections(labels, key):
+    """st.tabs 대신 쓰는 섹션 선택기. 현재 선택된 섹션 라벨을 반환한다.
+
+    st.tabs는 숨겨진 탭 내용까지 매 rerun마다 전부 실행하므로,
+    조회가 무거운 화면은 이걸로 선택된 섹션 하나만 실행/렌더링한다.
+    다른 곳에서 섹션을 바꾸려면 open_section(key, label) 후 st.rerun().
+    """
+    pending = st.session_state.pop(f"{key}__pending", None)
+    if pending in labels:
+        st.session_state[key] = pending
+    return st.radio(
+        "섹션 선택",
+        labels,
+        horizontal=True,
+        key=key,
+        label_visibility="collapsed",
+    )
+
+
+def open_section(key, label):
+    """다음 rerun에서 lazy_sections(key)가 label 섹션을 보여주도록 예약"""
+    st.session_state[f"{key}__pending"] = label
+
+
+def paged_data_records(source, filters, key):
+    """
+    fetch_data_records_page 결과를 이전/다음 버튼과 함께 보여주고 현재 페이지 행만 반환.
+    페이지별 시작 커서를 session_state[f"{key}_cursors"] 스택에 쌓고,
+    조건(filters)이나 페이지 크기가 바뀌면 첫 페이지로 돌아간다.
+    """
+    import math
+
+    page_size = st.selectbox(
+        "페이지당 개수",
+        DATA_PAGE_SIZES,
+        index=1,
+        key=f"{key}_page_size",
+    )
+    sig = (source, tuple(filters), page_size)
+    if st.session_state.get(f"{key}_sig") != sig:
+        st.session_state[f"{key}_sig"] = sig
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    rows, next_cursor = fetch_data_records_page(source, filters, cursors[-1], page_size)
+    # 마지막 페이지의 항목을 모두 삭제한 경우 → 한 페이지 앞으로
+    if not rows and len(cursors) > 1:
+        cursors.pop()
+        st.rerun()
+
+    total = count_data_records(source, filters)
+    page_no = len(cursors)
+    c1, c2, c3 = st.columns([1, 3, 1])
+    with c1:
+        if st.button("◀ 이전", key=f"{key}_prev", disabled=page_no == 1):
+            cursors.pop()
+            st.rerun()
+    with c2:
+        st.caption(
+            f"총 {total}건 · {page_no} / {max(1, math.ceil(total / page_size))} 페이지"
+        )
+    with c3:
+        if st.button("다음 ▶", key=f"{key}_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    return rows
+
+
+def data_grid_editor(source, rows, key):
+    """현재 페이지 행을 st.data_editor 로 보여주고, 저장 시 바뀐 행만 한 번에 반영."""
+    _, columns, editable = DATA_GRID_SPECS[source]
+    original = pd.DataFrame(rows, columns=columns)
+    if "date" in editable:
+        original["date"] = pd.to_datetime(original["date"], errors="coerce").dt.date
+    grid = original.assign(_delete=False)
+
+    mark_options = ["○", "△", "X"]
+    column_config = {
+        "id": st.column_config.NumberColumn("ID"),
+        "date": st.column_config.DateColumn("날짜", format="YYYY-MM-DD"),
+        "score": st.column_config.NumberColumn("점수", min_value=0.0, max_value=200.0),
+        "max_score": st.column_config.NumberColumn("만점", min_value=0.0, max_value=200.0),
+        "status": st.column_config.SelectboxColumn(
+            "출결 상태", options=["정상출석", "지각", "미인정결석"], required=True
+        ),
+        "homework_status": st.column_config.SelectboxColumn("과제", options=mark_options),
+        "daily_test_status": st.column_config.SelectboxColumn("일일 테스트", options=mark_options),
+        "_delete": st.column_config.CheckboxColumn("삭제"),
+    }
+
+    # 저장 후나 페이지가 바뀌면 키를 바꿔서 편집 내역(델타)이 다른 데이터에 다시 적용되지 않게 한다
+    nonce = st.session_state.get(f"{key}_nonce", 0)
+    editor_key = f"{key}_{nonce}_{rows[0][0]}_{len(rows)}"
+    edited = st.data_editor(
+        grid,
+        column_config=column_config,
+        disabled=[c for c in columns if c not in editable],
+        hide_index=True,
+        num_rows="fixed",
+        use_container_width=True,
+        key=editor_key,
+    )
+
+    if st.button("💾 변경 내용 한 번에 저장", key=f"{key}_save"):
+        updates, deletes, errors = diff_data_grid(source, original, edited)
+        if errors:
+            for msg in errors:
+                st.error(msg)
+            return
+        if not updates and not deletes:
+            st.info("변경된 내용이 없습니다.")
+            return
+        try:
+            n_upd, n_del = apply_data_grid_changes(source, updates, deletes)
+        except sqlite3.IntegrityError as e:
+            st.error(f"저장하지 못했습니다 (변경 내용은 반영되지 않았습니다): {e}")
+            return
+        st.session_state[f"{key}_nonce"] = nonce + 1
+        st.session_state[f"{key}_result"] = f"수정 {n_upd}건, 삭제 {n_del}건 반영 완료"
+        st.rerun()
+
+    result = st.session_state.pop(f"{key}_result", None)
+    if result:
+        st.success(result)
+
+
+# ============== 학생 선택기 (초성 / 접두어 검색) ==============
+
+HANGUL_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+STUDENT_PICKER_TOP_N = 20
+
+
+def _choseong(ch: str) -> str:
+    """한글 음절이면 초성, 아니면 소문자 그대로 ('홍' → 'ㅎ')"""
+    code = ord(ch) - 0xAC00
+    if 0 <= code < 11172:
+        return HANGUL_CHOSEONG[code // 588]
+    return ch.lower()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _student_name_index(students_version):
+    """
+    학생 이름 접두어 트라이 + 학교/학년 필터 (students 테이블 버전별로 한 번만 생성).
+    성 다음 글자부터(이름만)도 넣어서 '길동'으로도 '홍길동'을 찾을 수 있게 한다.
+    노드: {"ids": [(시작 위치, 학생 id), ...], "next": {글자: 노드}}
+    """
+    students = get_students()
+    root = {"ids": [], "next": {}}
+    by_id, schools, grades = {}, {}, {}
+    for sid, name, school, grade, phone, memo in students:
+        by_id[sid] = (name, school, grade)
+        schools.setdefault(school or "", set()).add(sid)
+        grades.setdefault(grade or "", set()).add(sid)
+
+        key = (name or "").strip().lower()
+        for start in range(min(2, len(key))):
+            node = root
+            for ch in key[start:]:
+                node = node["next"].setdefault(ch, {"ids": [], "next": {}})
+                node["ids"].append((start, sid))
+    return {"root": root, "by_id": by_id, "schools": schools, "grades": grades}
+
+
+def search_students_by_name(query: str, school=None, grade=None, top_n=STUDENT_PICKER_TOP_N):
+    """
+    이름 접두어 / 초성(혼용 가능: '홍ㄱ', 'ㅎㄱㄷ') 검색.
+    반환: 학생 id 목록 (성부터 일치 → 이름만 일치 순, 그다음 이름순), 최대 top_n 개
+    """
+    index = _student_name_index(get_table_versions(("students",)))
+    by_id = index["by_id"]
+
+    allowed = None
+    if school:
+        allowed = set(index["schools"].get(school, set()))
+    if grade:
+        g_ids = index["grades"].get(grade, set())
+        allowed = g_ids if allowed is None else allowed & g_ids
+
+    q = (query or "").strip().lower()
+    if not q:
+        candidates = {sid: 0 for sid in (allowed if allowed is not None else by_id)}
+    else:
+        frontier = [index["root"]]
+        for ch in q:
+            is_jamo = ch in HANGUL_CHOSEONG
+            nxt = []
+            for node in frontier:
+                if is_jamo:
+                    nxt.extend(
+                        child for k, child in node["next"].items()
+                        if k == ch or _choseong(k) == ch
+                    )
+                elif ch in node["next"]:
+                    nxt.append(node["next"][ch])
+            frontier = nxt
+            if not frontier:
+                return []
+
+        candidates = {}
+        for node in frontier:
+            for start, sid in node["ids"]:
+                if allowed is not None and sid not in allowed:
+                    continue
+                if start < candidates.get(sid, 99):
+                    candidates[sid] = start
+
+    ranked = sorted(candidates, key=lambda sid: (candidates[sid], by_id[sid][0], sid))
+    return ranked[:top_n]
+
+
+def student_picker(label, key, default_id=None, top_n=STUDENT_PICKER_TOP_N):
+    """
+    전체 학생 selectbox 대신 쓰는 검색형 선택기.
+    선택된 학생 id 반환 (학생이 없거나 검색 결과가 없으면 None).
+    이름/초성 입력 + 학교/학년 필터로 상위 top_n 명만 옵션으로 보낸다.
+    default_id: 이 학생을 선택된 상태로 보여줌 (다른 화면에서 넘어온 경우 등)
+    """
+    index = _student_name_index(get_table_versions(("students",)))
+    by_id = index["by_id"]
+    if not by_id:
+        return None
+
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1:
+        query = st.text_input(
+            f"{label} - 이름/초성 검색",
+            key=f"{key}__q",
+            placeholder="예: 홍길동, 홍ㄱ, ㅎㄱㄷ",
+        )
+    with c2:
+        school = st.selectbox(
+            "학교",
+            [""] + sorted(s for s in index["schools"] if s),
+            format_func=lambda v: v or "(전체 학교)",
+            key=f"{key}__school",
+        )
+    with c3:
+        grade = st.selectbox(
+            "학년",
+            [""] + sorted(g for g in index["grades"] if g),
+            format_func=lambda v: v or "(전체 학년)",
+            key=f"{key}__grade",
+        )
+
+    ids = search_students_by_name(query, school, grade, top_n)
+    if not ids:
+        # 엉뚱한 학생이 자동 선택돼 성적/반 배정이 잘못 저장되지 않도록 아무도 고르지 않는다
+        st.info("검색 결과 없음")
+        return None
+
+    if default_id in by_id:
+        if default_id not in ids:
+            ids = [default_id] + ids
+        # default_id 가 바뀐 경우에만 반영 (사용자가 직접 고른 값은 덮어쓰지 않음)
+        if st.session_state.get(f"{key}__default") != default_id:
+            st.session_state[f"{key}__default"] = default_id
+            st.session_state[key] = default_id
+
+    return st.selectbox(
+        label,
+        ids,
+        format_func=lambda sid: f"{by_id[sid][0]} ({by_id[sid][2]}, {by_id[sid][1]})",
+        key=key,
+    )
+
+
+def render_exam_document_file(doc_id, fpath, oname, content_hash, key):
+    """
+    시험지 / 자료 한 건 표시: 평소에는 축소 이미지만 보여주고,
+    '원본 열기'를 켰을 때만 원본 파일을 읽어 이미지 / 다운로드 버튼을 만든다.
+    """
+    if not os.path.exists(fpath):
+        st.error(f"파일을 찾을 수 없습니다. (경로: {fpath})")
+        return
+
+    thumb_path = ensure_thumbnail(fpath, content_hash)
+    if thumb_path:
+        st.image(thumb_path, caption=oname)
+    else:
+        st.caption(f"📎 {oname}")
+
+    if not st.toggle("원본 열기", key=f"{key}_open_{doc_id}"):
+        return
+
+    with open(fpath, "rb") as f:
+        file_bytes = f.read()
+    if fpath.lower().endswith(IMAGE_EXTS):
+        st.image(file_bytes, caption=oname, use_container_width=True)
+    mime, _ = mimetypes.guess_type(fpath)
+    st.download_button(
+        label="📎 파일 다운로드",
+        data=file_bytes,
+        file_name=oname,
+        mime=mime or "application/octet-stream",
+        key=f"{key}_download_{doc_id}",
+    )
+
+
+def _open_search_result(kind, ref_id):
+    """검색 결과의 '열기' 버튼 콜백 (위젯 값 변경이라 콜백에서 처리)"""
+    st.session_state["global_search"] = ""
+    if kind == 1:
+        st.session_state["admin_menu"] = "학생 관리"
+        st.session_state["selected_student_id"] = ref_id
+        open_section("student_mgmt_section", "학생 조회")
+    elif kind == 2:
+        st.session_state["admin_menu"] = "공지 관리"
+    elif kind == 3:
+        st.session_state["admin_menu"] = "단어장 관리"
+    elif kind == 4:
+        st.session_state["admin_menu"] = "학생 관리"
+        st.session_state["selected_student_id"] = _get_exam_document_student(ref_id)
+        open_section("student_mgmt_section", "학생 조회")
+
+
+def render_global_search_results(query):
+    results = search_all(query)
+    with st.container(border=True):
+        st.markdown(f"#### 🔎 '{query}' 검색 결과 ({len(results)}건)")
+        if not results:
+            st.info("검색 결과가 없습니다.")
+            return
+        for i, r in enumerate(results):
+            c1, c2 = st.columns([6, 1])
+            c1.markdown(f"`{r['label']}` **{r['title']}**  \n{r['snippet'].strip()}")
+            c2.button(
+                "열기",
+                key=f"search_open_{i}",
+                on_click=_open_search_result,
+                args=(r["kind"], r["ref_id"]),
+            )
+
+
+# ============== 관리자 화면 ==============
+
+def admin_bulk_import():
+    """학생 명단 / 반 배정 / 성적을 CSV·엑셀 파일로 일괄 등록 (검증 → 미리보기 → 저장)"""
+    kind = st.radio(
+        "등록할 자료",
+        list(BULK_IMPORT_KINDS.keys()),
+        format_func=lambda k: BULK_IMPORT_KINDS[k][0],
+        horizontal=True,
+        key="bulk_import_kind",
+    )
+    label, spec = BULK_IMPORT_KINDS[kind]
+    headers = [header for header, _ in spec.values()]
+    st.caption(
+        "컬럼: " + ", ".join(f"{h}{' *' if req else ''}" for h, req in spec.values())
+        + "  (* 필수 · 학년은 초1~6 / 중1~3 / 고1~3 / 졸업)"
+    )
+    st.download_button(
+        "📄 양식 내려받기 (CSV)",
+        data=("\ufeff" + ",".join(headers) + "\n").encode("utf-8"),
+        file_name=f"{kind}_template.csv",
+        mime="text/csv",
+        key=f"bulk_import_template_{kind}",
+    )
+
+    nonce = st.session_state.get("bulk_import_nonce", 0)
+    uploaded = st.file_uploader(
+        "CSV 또는 엑셀 파일",
+        type=["csv", "xlsx"],
+        key=f"bulk_import_file_{kind}_{nonce}",
+    )
+    if uploaded is None:
+        return
+
+    try:
+        valid, errors = validate_bulk_import(kind, read_bulk_import_file(uploaded))
+    except ValueError as e:
+        st.error(str(e))
+        return
 
-# ============== 관리자 화면 ==============
+    st.write(f"정상 **{len(valid)}**행 · 오류 **{len(errors)}**행")
+    if len(errors):
+        st.markdown("##### ⚠️ 오류 행 (저장되지 않음)")
+        st.dataframe(errors, use_container_width=True, hide_index=True)
+    if valid.empty:
+        st.info("저장할 수 있는 행이 없습니다.")
+        return
+
+    st.markdown("##### 미리보기")
+    preview = valid[list(spec)].head(50).rename(
+        columns={col: header for col, (header, _) in spec.items()}
+    )
+    st.dataframe(preview, use_container_width=True)
+
+    if st.button(f"정상 {len(valid)}행 {label} 저장", key="bulk_import_apply"):
+        user = st.session_state["user"]
+        try:
+            saved = apply_bulk_import(kind, valid, user["id"])
+        except sqlite3.Error as e:
+            st.error(f"저장 중 오류가 발생해 아무것도 저장하지 않았습니다: {e}")
+        else:
+            st.session_state["bulk_import_nonce"] = nonce + 1
+            st.success(f"{label} {saved}행을 저장했습니다.")
+            st.rerun()
 
 def admin_student_management():
     st.markdown("### 👦 학생 관리")
@@ -1808,15 +5304,17 @@ def admin_student_management():
     if "selected_student_id" not in st.session_state:
         st.session_state["selected_student_id"] = students[0][0] if students else None
 
-    # 탭 순서: 학생 조회 -> 학생 목록 -> 등록 -> 자료 업로드
-    tab_view, tab_list, tab_add, tab_docs = st.tabs(
-        ["학생 조회", "학생 목록", "학생 등록", "자료 업로드"]
+    # 섹션 순서: 학생 조회 -> 학생 목록 -> 등록 -> 일괄 등록 -> 자료 업로드
+    # (선택된 섹션만 실행 → 숨은 탭의 조회가 매번 돌지 않음)
+    section = lazy_sections(
+        ["학생 조회", "학생 목록", "학생 등록", "일괄 등록", "자료 업로드"],
+        key="student_mgmt_section",
     )
 
     # ------------------------------------------------------------------
     # 탭 1. 학생 조회
     # ------------------------------------------------------------------
-    with tab_view:
+    if section == "학생 조회":
         if not students:
             st.info("등록된 학생이 없습니다.")
         else:
@@ -1825,32 +5323,18 @@ def admin_student_management():
                 sid: (sid, name, school, grade, phone, memo)
                 for sid, name, school, grade, phone, memo in students
             }
-            # 학생 선택 드롭다운
-            options = {
-                f"{name} ({grade}, {school}) [ID:{sid}]": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-
-            # 기본값: 세션에 저장된 학생
+            # 학생 선택 (기본값: 세션에 저장된 학생)
             default_sid = st.session_state.get("selected_student_id")
             if default_sid not in id_to_student and students:
                 default_sid = students[0][0]
 
-            if default_sid in id_to_student:
-                default_label = [
-                    k for k, v in options.items() if v == default_sid
-                ][0]
-                idx = list(options.keys()).index(default_label)
-            else:
-                idx = 0
-
-            sel_label = st.selectbox(
+            student_id = student_picker(
                 "조회할 학생을 선택하세요",
-                list(options.keys()),
-                index=idx,
                 key="student_view_select",
+                default_id=default_sid,
             )
-            student_id = options[sel_label]
+            if student_id is None:
+                return
             st.session_state["selected_student_id"] = student_id
 
             sid, name, school, grade, phone, memo = id_to_student[student_id]
@@ -2023,34 +5507,10 @@ def admin_student_management():
             first_day = date(year, month, 1)
             last_day_num = calendar.monthrange(year, month)[1]
 
-            # 날짜별 출결 요약 (학생 한 명 기준이므로 출결 종류 카운트)
-            daily_status = {}
-            conn = get_connection()
-            cur = conn.cursor()
-            for d in range(1, last_day_num + 1):
-                dt_obj = date(year, month, d)
-                d_str = dt_obj.strftime("%Y-%m-%d")
-                cur.execute(
-                    """
-                    SELECT status
-                    FROM attendance
-                    WHERE student_id=? AND date=?
-                    """,
-                    (sid, d_str),
-                )
-                rows = cur.fetchall()
-                if not rows:
-                    daily_status[d] = ""
-                else:
-                    # 가장 나쁜 상태 우선으로 표기 (결석 > 지각 > 정상)
-                    statuses = [r[0] for r in rows]
-                    if "미인정결석" in statuses:
-                        daily_status[d] = "결석"
-                    elif "지각" in statuses:
-                        daily_status[d] = "지각"
-                    else:
-                        daily_status[d] = "출석"
-            conn.close()
+            # 날짜별 출결 요약 (가장 나쁜 상태 우선: 결석 > 지각 > 출석)
+            daily_status = get_attendance_worst_status_for_student_month(
+                sid, year, month
+            )
 
             # 6x7 캘린더 매트릭스 생성
             weekdays = ["월", "화", "수", "목", "금", "토", "일"]
@@ -2079,7 +5539,7 @@ def admin_student_management():
     # ------------------------------------------------------------------
     # 탭 2. 학생 목록  (검색 + 클릭 → 조회용 학생 세션에 반영)
     # ------------------------------------------------------------------
-    with tab_list:
+    elif section == "학생 목록":
         if not students:
             st.info("등록된 학생이 없습니다.")
         else:
@@ -2107,7 +5567,7 @@ def admin_student_management():
             else:
                 st.markdown("#### 학생 목록")
                 st.caption(
-                    "이름을 클릭하면 상단 '학생 조회' 탭에서 해당 학생의 상세 정보를 바로 볼 수 있습니다."
+                    "이름을 클릭하면 '학생 조회' 화면으로 이동해 해당 학생의 상세 정보를 볼 수 있습니다."
                 )
                 st.markdown("---")
 
@@ -2126,10 +5586,7 @@ def admin_student_management():
                             key=f"student_name_btn_{sid}",
                         ):
                             st.session_state["selected_student_id"] = sid
-                            st.success(
-                                f"'{name}' 학생이 조회 대상으로 설정되었습니다. "
-                                "상단의 '학생 조회' 탭에서 확인하세요."
-                            )
+                            open_section("student_mgmt_section", "학생 조회")
                             st.rerun()
 
                     with c2:
@@ -2152,7 +5609,7 @@ def admin_student_management():
     # ------------------------------------------------------------------
     # 탭 3. 학생 등록  (기존 등록 기능)
     # ------------------------------------------------------------------
-    with tab_add:
+    elif section == "학생 등록":
         with st.form("add_student_form"):
             name = st.text_input("이름 *")
             school = st.text_input("학교")
@@ -2175,24 +5632,20 @@ def admin_student_management():
                     st.rerun()
 
     # ------------------------------------------------------------------
-    # 탭 4. 자료 업로드 (기존 시험지 / 자료 업로드)
+    # 탭 4. 일괄 등록 (CSV / 엑셀)
+    # ------------------------------------------------------------------
+    elif section == "일괄 등록":
+        admin_bulk_import()
+
+    # ------------------------------------------------------------------
+    # 탭 5. 자료 업로드 (기존 시험지 / 자료 업로드)
     # ------------------------------------------------------------------
-    with tab_docs:
+    else:  # section == "자료 업로드"
         user = st.session_state["user"]
-        students = get_students()
         if not students:
             st.info("먼저 학생을 등록해주세요.")
         else:
-            opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            label = st.selectbox(
-                "학생 선택",
-                list(opts.keys()),
-                key="examdoc_student",
-            )
-            student_id = opts[label]
+            student_id = student_picker("학생 선택", key="examdoc_student")
 
             subject = st.text_input("과목", key="examdoc_subject")
             exam_type = st.selectbox(
@@ -2219,13 +5672,13 @@ def admin_student_management():
             )
 
             if st.button("자료 저장", key="examdoc_save"):
-                if not uploaded:
+                if student_id is None:
+                    st.warning("학생을 선택하세요.")
+                elif not uploaded:
                     st.warning("파일을 업로드해주세요.")
                 else:
-                    file_path, original_name = save_uploaded_file(
-                        uploaded, student_id
-                    )
-                    add_exam_document(
+                    staged = stage_uploaded_file(uploaded, student_id)
+                    file_path = add_exam_document(
                         student_id,
                         subject.strip(),
                         exam_type.strip(),
@@ -2233,10 +5686,10 @@ def admin_student_management():
                         d.strftime("%Y-%m-%d"),
                         tags.strip(),
                         memo.strip(),
-                        file_path,
-                        original_name,
+                        staged,
                         user["id"],
                     )
+                    ensure_thumbnail(file_path, staged["content_hash"])
                     st.success("시험지 / 자료가 저장되었습니다.")
 
             st.markdown("#### 📄 해당 학생의 시험지 / 자료 목록")
@@ -2255,6 +5708,7 @@ def admin_student_management():
                     fpath,
                     oname,
                     uploaded_at,
+                    content_hash,
                 ) in docs:
                     title = f"{edate} • {subj} • {ename}"
                     with st.expander(title):
@@ -2262,26 +5716,14 @@ def admin_student_management():
                         st.write(f"태그: {dtags}")
                         st.write(f"메모: {dmemo}")
                         st.write(f"업로드 시간: {uploaded_at}")
-                        try:
-                            with open(fpath, "rb") as f:
-                                file_bytes = f.read()
-                            if fpath.lower().endswith(
-                                (".png", ".jpg", ".jpeg")
-                            ):
-                                st.image(
-                                    file_bytes,
-                                    caption=oname,
-                                    use_container_width=True,
-                                )
-                            else:
-                                st.download_button(
-                                    label="📎 파일 다운로드",
-                                    data=file_bytes,
-                                    file_name=oname,
-                                    mime="application/pdf",
-                                )
-                        except FileNotFoundError:
-                            st.error(f"파일을 찾을 수 없습니다. (경로: {fpath})")
+                        render_exam_document_file(
+                            doc_id, fpath, oname, content_hash, key="examdoc"
+                        )
+
+                        if st.button("🗑 자료 삭제", key=f"examdoc_del_{doc_id}"):
+                            delete_exam_document(doc_id)
+                            st.warning("삭제 완료")
+                            st.rerun()
 
 
 def admin_class_management():
@@ -2325,28 +5767,22 @@ def admin_class_management():
                 f"{name} ({level})": cid
                 for cid, name, level, memo in classes
             }
-            s_opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
 
             c_label = st.selectbox(
                 "반 선택",
                 list(c_opts.keys()),
                 key="class_assign_class",
             )
-            s_label = st.selectbox(
-                "학생 선택",
-                list(s_opts.keys()),
-                key="class_assign_student",
-            )
+            student_id = student_picker("학생 선택", key="class_assign_student")
 
             class_id = c_opts[c_label]
-            student_id = s_opts[s_label]
 
             if st.button("학생을 반에 배치", key="btn_assign_student_to_class"):
-                assign_student_to_class(student_id, class_id)
-                st.success("학생이 반에 배치되었습니다.")
+                if student_id is None:
+                    st.warning("학생을 선택하세요.")
+                else:
+                    assign_student_to_class(student_id, class_id)
+                    st.success("학생이 반에 배치되었습니다.")
 
     # ------------------------------------------------------------------
     # 탭 3. 반 생성 및 수정/삭제
@@ -2545,16 +5981,7 @@ def admin_school_scores():
         if not students:
             st.info("학생이 없습니다.")
         else:
-            opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            label = st.selectbox(
-                "학생 선택",
-                list(opts.keys()),
-                key="school_score_student_select",
-            )
-            student_id = opts[label]
+            student_id = student_picker("학생 선택", key="school_score_student_select")
 
             # 실제 시험 날짜(성적 입력일과는 별개로 보관)
             d = st.date_input(
@@ -2639,7 +6066,9 @@ def admin_school_scores():
             )
 
             if st.button("학교 성적 저장", key="school_score_save_btn"):
-                if not subject.strip():
+                if student_id is None:
+                    st.warning("학생을 선택하세요.")
+                elif not subject.strip():
                     st.warning("과목은 필수입니다.")
                 else:
                     add_school_score(
@@ -2661,16 +6090,7 @@ def admin_school_scores():
         if not students:
             st.info("학생이 없습니다.")
         else:
-            opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            label = st.selectbox(
-                "조회할 학생",
-                list(opts.keys()),
-                key="view_school_student",
-            )
-            student_id = opts[label]
+            student_id = student_picker("조회할 학생", key="view_school_student")
 
             # 과목 필터
             subject = st.text_input(
@@ -2824,16 +6244,15 @@ def admin_academy_progress():
                     if not subject.strip():
                         st.warning("과목은 필수입니다.")
                     else:
-                        for sid, name, school, grade in class_students:
-                            add_academy_progress(
-                                sid,
-                                class_id,
-                                d.strftime("%Y-%m-%d"),
-                                subject.strip(),
-                                unit.strip(),
-                                memo.strip(),
-                                user["id"],
-                            )
+                        add_academy_progress_bulk(
+                            [sid for sid, name, school, grade in class_students],
+                            class_id,
+                            d.strftime("%Y-%m-%d"),
+                            subject.strip(),
+                            unit.strip(),
+                            memo.strip(),
+                            user["id"],
+                        )
                         st.success("반 전체 진도가 저장되었습니다.")
 
     # =========================
@@ -2843,16 +6262,7 @@ def admin_academy_progress():
         if not students:
             st.info("학생이 없습니다.")
         else:
-            s_opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            s_label = st.selectbox(
-                "학생 선택",
-                list(s_opts.keys()),
-                key="ap_student_select",
-            )
-            student_id = s_opts[s_label]
+            student_id = student_picker("학생 선택", key="ap_student_select")
 
             c_id = None
             if classes:
@@ -2895,7 +6305,9 @@ def admin_academy_progress():
             memo = st.text_area("메모", key="ap_memo")
 
             if st.button("진도 저장(개인)", key="ap_save_person"):
-                if not subject.strip():
+                if student_id is None:
+                    st.warning("학생을 선택하세요.")
+                elif not subject.strip():
                     st.warning("과목은 필수입니다.")
                 else:
                     add_academy_progress(
@@ -3020,20 +6432,7 @@ def admin_lesson_management():
         class_id = c_opts[class_label]
 
         # ===== 1) 이전 진도 / 이전 숙제 =====
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT date, subject, unit, memo
-            FROM academy_progress
-            WHERE class_id=?
-            ORDER BY date DESC, id DESC
-            LIMIT 1
-            """,
-            (class_id,),
-        )
-        last_row = cur.fetchone()
-        conn.close()
+        last_row = get_last_class_progress(class_id)
 
         st.markdown("#### 이전 진도 / 이전 숙제")
 
@@ -3134,17 +6533,15 @@ def admin_lesson_management():
                 if not class_students:
                     st.warning("해당 반에 학생이 없습니다.")
                 else:
-                    date_str = d.strftime("%Y-%m-%d")
-                    for sid, name, school, grade in class_students:
-                        add_academy_progress(
-                            student_id=sid,
-                            class_id=class_id,
-                            date_str=date_str,
-                            subject=subject_today.strip(),
-                            unit=unit_today.strip(),
-                            memo=homework_next.strip(),
-                            recorded_by=user["id"],
-                        )
+                    add_academy_progress_bulk(
+                        student_ids=[sid for sid, name, school, grade in class_students],
+                        class_id=class_id,
+                        date_str=d.strftime("%Y-%m-%d"),
+                        subject=subject_today.strip(),
+                        unit=unit_today.strip(),
+                        memo=homework_next.strip(),
+                        recorded_by=user["id"],
+                    )
                     st.success(
                         f"{class_label} 반 전체에 오늘 진도와 다음 숙제가 저장되었습니다."
                     )
@@ -3212,7 +6609,7 @@ def admin_lesson_management():
                 "오늘 수업 출석/과제/일일테스트 저장",
                 key="lesson_save_attendance",
             ):
-                saved_count = 0
+                att_rows = []
                 for sid, name, school, grade in class_students:
                     status = st.session_state.get(
                         f"lesson_status_{class_id}_{sid}", "정상출석"
@@ -3223,17 +6620,15 @@ def admin_lesson_management():
                     test = st.session_state.get(
                         f"lesson_test_{class_id}_{sid}", "○"
                     )
-                    add_attendance(
-                        student_id=sid,
-                        class_id=class_id,
-                        status=status,
-                        homework_status=hw,
-                        daily_test_status=test,
-                        via="수업관리",
-                        recorded_by=user["id"],
-                        date_str=att_date_str,   # ← 날짜 반영
-                    )
-                    saved_count += 1
+                    att_rows.append((sid, class_id, status, hw, test))
+
+                # 반 전체를 한 트랜잭션으로 저장
+                saved_count = add_attendance_bulk(
+                    att_rows,
+                    via="수업관리",
+                    recorded_by=user["id"],
+                    date_str=att_date_str,   # ← 날짜 반영
+                )
 
                 st.success(
                     f"{class_label} 반 학생 {saved_count}명의 출석/과제/일일테스트가 저장되었습니다."
@@ -3247,15 +6642,167 @@ def admin_lesson_management():
 
 
 def admin_score_management():
-    """성적 관리 메인: 탭으로 학원/학교 나누기"""
-    tab_academy, tab_school = st.tabs(["학원 성적", "학교 성적"])
+    """성적 관리 메인: 섹션으로 학원/학교 나누기 (선택된 쪽만 실행)"""
+    section = lazy_sections(
+        ["학원 성적", "학교 성적", "성적 분석", "성적표 PDF"], key="score_mgmt_section"
+    )
 
     # 기존 함수 재사용 (내부에서 또 탭으로 입력/조회 나뉘는 구조 그대로 유지)
-    with tab_academy:
+    if section == "학원 성적":
         admin_academy_scores()
-
-    with tab_school:
+    elif section == "학교 성적":
         admin_school_scores()
+    elif section == "성적 분석":
+        admin_score_analytics()
+    else:
+        admin_report_cards()
+
+
+def admin_score_analytics():
+    """반별 시험 통계 (평균/중앙값/표준편차) + 시험별 반 내 백분위"""
+    st.markdown("#### 📈 성적 분석")
+    classes = get_classes()
+    if not classes:
+        st.info("반이 없습니다. 먼저 반을 생성하세요.")
+        return
+
+    c1, c2 = st.columns(2)
+    with c1:
+        kind_label = st.radio("구분", ["학원 성적", "학교 성적"], horizontal=True, key="sa_kind")
+    table_name = "academy_scores" if kind_label == "학원 성적" else "school_scores"
+    with c2:
+        class_map = {f"{name} (ID:{cid})": cid for cid, name, level, memo in classes}
+        class_label = st.selectbox("반", list(class_map.keys()), key="sa_class")
+    class_id = class_map[class_label]
+
+    summary = class_score_summary(table_name, class_id)
+    if summary.empty:
+        st.info("이 반의 성적 기록이 없습니다.")
+        return
+
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "날짜": summary["date"],
+                "과목": summary["subject"],
+                "시험명": summary["exam_name"],
+                "인원": summary["count"],
+                "평균(%)": summary["mean"].round(1),
+                "중앙값(%)": summary["median"].round(1),
+                "표준편차": summary["std"].round(1),
+            }
+        ),
+        use_container_width=True,
+    )
+
+    # 과목별 반 평균 추이
+    trend = summary.pivot_table(index="date", columns="subject", values="mean")
+    trend.index = pd.to_datetime(trend.index)
+    st.line_chart(trend)
+
+    exam_labels = [
+        f"{d} / {subj} / {name or '-'}"
+        for d, subj, name in zip(summary["date"], summary["subject"], summary["exam_name"])
+    ]
+    idx = st.selectbox(
+        "시험 선택 (학생별 백분위)",
+        range(len(exam_labels)),
+        format_func=lambda i: exam_labels[i],
+        key="sa_exam",
+    )
+    exam = summary.iloc[idx]
+    ranking = class_exam_ranking(
+        table_name, class_id, exam["date"], exam["subject"], exam["exam_name"]
+    )
+    names = {sid: name for sid, name, *_ in get_students()}
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "학생": ranking["student_id"].map(names),
+                "점수": ranking["score"],
+                "만점": ranking["max_score"],
+                "백분율(%)": ranking["percent"].round(1),
+                "반 내 백분위": ranking["class_percentile"].round(0),
+            }
+        ),
+        use_container_width=True,
+    )
+
+
+def admin_report_cards():
+    """학생 / 반 / 전체 성적표 PDF 일괄 생성"""
+    st.markdown("#### 📄 성적표 PDF 일괄 생성")
+
+    target = st.radio(
+        "대상", ["학생 한 명", "반 전체", "전체 학생"], horizontal=True, key="rc_target"
+    )
+    student_ids = []
+    label = "전체"
+    if target == "학생 한 명":
+        sid = student_picker("학생 선택", key="rc_student")
+        if sid is not None:
+            student_ids = [sid]
+            label = f"student{sid}"
+    elif target == "반 전체":
+        classes = get_classes()
+        if not classes:
+            st.info("등록된 반이 없습니다.")
+            return
+        class_map = {f"{name} (ID:{cid})": cid for cid, name, level, memo in classes}
+        class_label = st.selectbox("반 선택", list(class_map.keys()), key="rc_class")
+        class_id = class_map[class_label]
+        student_ids = [sid for sid, name, school, grade in get_class_students(class_id)]
+        label = f"class{class_id}"
+    else:
+        student_ids = [row[0] for row in get_students()]
+
+    today = date.today()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_d = st.date_input("시작일", value=date(today.year, 1, 1), key="rc_start")
+    with col2:
+        end_d = st.date_input("종료일", value=today, key="rc_end")
+    output = st.radio(
+        "출력 형식",
+        ["zip", "pdf"],
+        format_func=lambda v: "학생별 PDF 묶음 (ZIP)" if v == "zip" else "한 파일로 합친 PDF",
+        horizontal=True,
+        key="rc_output",
+    )
+    st.caption(f"대상 학생 수: {len(student_ids)}명 · 작업 프로세스 {REPORT_WORKERS}개")
+
+    if st.button("성적표 생성", key="rc_generate", disabled=not student_ids):
+        if start_d > end_d:
+            st.warning("시작일이 종료일보다 늦습니다.")
+        else:
+            start = perf_counter()
+            with st.spinner("성적표를 만드는 중입니다..."):
+                payload, count = build_report_cards(
+                    student_ids,
+                    start_d.strftime("%Y-%m-%d"),
+                    end_d.strftime("%Y-%m-%d"),
+                    output=output,
+                )
+            st.session_state["rc_result"] = {
+                "payload": payload,
+                "count": count,
+                "file_name": f"report_cards_{label}_{end_d.strftime('%Y%m%d')}.{output}",
+                "mime": "application/zip" if output == "zip" else "application/pdf",
+                "elapsed": perf_counter() - start,
+            }
+
+    result = st.session_state.get("rc_result")
+    if result and result["payload"]:
+        st.success(f"{result['count']}명 성적표 생성 완료 ({result['elapsed']:.1f}초)")
+        st.download_button(
+            "⬇️ 다운로드",
+            data=result["payload"],
+            file_name=result["file_name"],
+            mime=result["mime"],
+            key="rc_download",
+        )
+    elif result:
+        st.info("성적표를 만들 학생이 없습니다.")
 
 
 def admin_scores_management():
@@ -3275,12 +6822,7 @@ def admin_scores_management():
             if not students:
                 st.info("학생이 없습니다.")
             else:
-                opts = {
-                    f"{name} ({grade}, {school})": sid
-                    for sid, name, school, grade, phone, memo in students
-                }
-                label = st.selectbox("학생 선택", list(opts.keys()))
-                student_id = opts[label]
+                student_id = student_picker("학생 선택", key="ms_school_score_student")
                 d = st.date_input("일자", value=date.today())
                 subject = st.text_input("과목 (예: 수학)")
                 exam_name = st.text_input("시험명 (예: 중간고사)")
@@ -3292,7 +6834,9 @@ def admin_scores_management():
                 )
                 memo = st.text_area("메모")
                 if st.button("학교 성적 저장"):
-                    if not subject.strip():
+                    if student_id is None:
+                        st.warning("학생을 선택하세요.")
+                    elif not subject.strip():
                         st.warning("과목은 필수입니다.")
                     else:
                         add_school_score(
@@ -3311,16 +6855,7 @@ def admin_scores_management():
             if not students:
                 st.info("학생이 없습니다.")
             else:
-                opts = {
-                    f"{name} ({grade}, {school})": sid
-                    for sid, name, school, grade, phone, memo in students
-                }
-                label = st.selectbox(
-                    "조회할 학생",
-                    list(opts.keys()),
-                    key="view_school_student",
-                )
-                student_id = opts[label]
+                student_id = student_picker("조회할 학생", key="view_school_student")
                 subject = st.text_input(
                     "과목 필터 (비우면 전체)",
                     key="view_school_subject",
@@ -3361,14 +6896,7 @@ def admin_scores_management():
             if not students:
                 st.info("학생이 없습니다.")
             else:
-                s_opts = {
-                    f"{name} ({grade}, {school})": sid
-                    for sid, name, school, grade, phone, memo in students
-                }
-                s_label = st.selectbox(
-                    "학생 선택", list(s_opts.keys()), key="as_student"
-                )
-                student_id = s_opts[s_label]
+                student_id = student_picker("학생 선택", key="as_student")
 
                 c_id = None
                 if classes:
@@ -3402,7 +6930,9 @@ def admin_scores_management():
                 memo = st.text_area("메모", key="as_memo")
 
                 if st.button("학원 성적 저장"):
-                    if not subject.strip():
+                    if student_id is None:
+                        st.warning("학생을 선택하세요.")
+                    elif not subject.strip():
                         st.warning("과목은 필수입니다.")
                     else:
                         add_academy_score(
@@ -3422,16 +6952,7 @@ def admin_scores_management():
             if not students:
                 st.info("학생이 없습니다.")
             else:
-                s_opts = {
-                    f"{name} ({grade}, {school})": sid
-                    for sid, name, school, grade, phone, memo in students
-                }
-                s_label = st.selectbox(
-                    "조회할 학생",
-                    list(s_opts.keys()),
-                    key="asv_student",
-                )
-                student_id = s_opts[s_label]
+                student_id = student_picker("조회할 학생", key="asv_student")
                 subject = st.text_input(
                     "과목 필터 (비우면 전체)",
                     key="asv_subject",
@@ -3476,14 +6997,7 @@ def admin_academy_scores():
         if not students:
             st.info("학생이 없습니다.")
         else:
-            s_opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            s_label = st.selectbox(
-                "학생 선택", list(s_opts.keys()), key="as_student"
-            )
-            student_id = s_opts[s_label]
+            student_id = student_picker("학생 선택", key="as_student")
 
             c_id = None
             if classes:
@@ -3532,7 +7046,9 @@ def admin_academy_scores():
             memo = st.text_area("메모", key="as_memo")
 
             if st.button("학원 성적 저장"):
-                if not subject.strip():
+                if student_id is None:
+                    st.warning("학생을 선택하세요.")
+                elif not subject.strip():
                     st.warning("과목은 필수입니다.")
                 else:
                     add_academy_score(
@@ -3552,16 +7068,7 @@ def admin_academy_scores():
         if not students:
             st.info("학생이 없습니다.")
         else:
-            s_opts = {
-                f"{name} ({grade}, {school})": sid
-                for sid, name, school, grade, phone, memo in students
-            }
-            s_label = st.selectbox(
-                "조회할 학생",
-                list(s_opts.keys()),
-                key="asv_student",
-            )
-            student_id = s_opts[s_label]
+            student_id = student_picker("조회할 학생", key="asv_student")
             subject = st.text_input(
                 "과목 필터 (비우면 전체)",
                 key="asv_subject",
@@ -3693,12 +7200,13 @@ def admin_attendance_management():
     students = get_students()
     classes = get_classes()
 
-    tab1, tab2, tab3 = st.tabs(
-        ["출석/과제/테스트 입력 (QR/수동)", "일별 현황 한눈에 보기", "월별 캘린더 보기"]
+    section = lazy_sections(
+        ["출석/과제/테스트 입력 (QR/수동)", "일별 현황 한눈에 보기", "월별 캘린더 보기"],
+        key="att_mgmt_section",
     )
 
-    # ----------------- 탭1: 입력 -----------------
-    with tab1:
+    # ----------------- 섹션1: 입력 -----------------
+    if section == "출석/과제/테스트 입력 (QR/수동)":
         # 출석 입력 날짜
         att_date = st.date_input(
             "출석 기록 날짜",
@@ -3873,25 +7381,23 @@ def admin_attendance_management():
                     if not class_students:
                         st.warning("해당 반에 학생이 없습니다.")
                     else:
-                        for sid, name, school, grade in class_students:
-                            add_attendance(
-                                student_id=sid,
-                                class_id=bulk_class_id,
-                                status=bulk_status,
-                                homework_status=bulk_hw,
-                                daily_test_status=bulk_test,
-                                via="반일괄",
-                                recorded_by=user["id"],
-                                date_str=att_date_str,
-                            )
+                        add_attendance_bulk(
+                            [
+                                (sid, bulk_class_id, bulk_status, bulk_hw, bulk_test)
+                                for sid, name, school, grade in class_students
+                            ],
+                            via="반일괄",
+                            recorded_by=user["id"],
+                            date_str=att_date_str,
+                        )
                         st.success(
                             f"{bulk_class_label} 학생 전원에게 "
                             f"[출결:{bulk_status}] [과제:{bulk_hw}] "
                             f"[테스트:{bulk_test}]로 저장되었습니다."
                         )
 
-    # ----------------- 탭2: 일별 현황 -----------------
-    with tab2:
+    # ----------------- 섹션2: 일별 현황 -----------------
+    elif section == "일별 현황 한눈에 보기":
         st.markdown("#### 일별 출결/과제/일일테스트 현황")
 
         date_value = st.date_input("조회 날짜", value=date.today())
@@ -3983,8 +7489,8 @@ def admin_attendance_management():
             with u3:
                 st.metric("테스트 X (미응시)", int(test_counts.get("X", 0)))
 
-    # ----------------- 탭3: 월별 캘린더 -----------------
-    with tab3:
+    # ----------------- 섹션3: 월별 캘린더 -----------------
+    else:
         st.markdown("#### 월별 출석 캘린더")
 
         base_date = st.date_input(
@@ -4016,19 +7522,8 @@ def admin_attendance_management():
         first_day = date(year, month, 1)
         last_day_num = calendar.monthrange(year, month)[1]
 
-        # 날짜별 출석 요약 계산
-        daily_summary = {}
-        for day in range(1, last_day_num + 1):
-            d = date(year, month, day)
-            d_str = d.strftime("%Y-%m-%d")
-            recs = get_attendance_records(d_str, class_id_filter)
-            if not recs:
-                daily_summary[day] = None
-            else:
-                normal = sum(1 for r in recs if r[3] == "정상출석")
-                late = sum(1 for r in recs if r[3] == "지각")
-                absent = sum(1 for r in recs if r[3] == "미인정결석")
-                daily_summary[day] = (normal, late, absent)
+        # 날짜별 출석 요약 (월 전체를 한 번에 집계)
+        daily_summary = get_attendance_month_summary(year, month, class_id_filter)
 
         # 캘린더 테이블 구성 (6주 * 7일)
         weekdays = ["월", "화", "수", "목", "금", "토", "일"]
@@ -4039,7 +7534,7 @@ def admin_attendance_management():
         col_idx = first_wday
 
         for day in range(1, last_day_num + 1):
-            summary = daily_summary[day]
+            summary = daily_summary.get(day)
             if summary is None:
                 cell = f"{day}"
             else:
@@ -4061,15 +7556,14 @@ def admin_vocab_management():
     st.markdown("### 📘 단어장 관리")
     user = st.session_state["user"]
     vocab_sets = get_vocab_sets(active_only=False)
-    classes = get_classes()
-    students = get_students()
 
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["세트 관리", "단어 일괄 입력(엑셀/한글)", "배포(할당)", "결과 요약"]
+    section = lazy_sections(
+        ["세트 관리", "단어 일괄 입력(엑셀/한글)", "배포(할당)", "결과 요약"],
+        key="vocab_mgmt_section",
     )
 
     # ================== 세트 관리 ==================
-    with tab1:
+    if section == "세트 관리":
         with st.form("vs_create"):
             name = st.text_input("단어장 이름 (예: 중2A 3월 단어)")
             desc = st.text_area("설명")
@@ -4106,8 +7600,8 @@ def admin_vocab_management():
             st.dataframe(pd.DataFrame(data), use_container_width=True)
 
     # ================== 단어 일괄 입력(엑셀/한글) ==================
-    with tab2:
-        active_sets = get_vocab_sets(active_only=False)
+    elif section == "단어 일괄 입력(엑셀/한글)":
+        active_sets = vocab_sets
         if not active_sets:
             st.info("먼저 단어장 세트를 생성하세요.")
         else:
@@ -4142,83 +7636,82 @@ def admin_vocab_management():
                 key="vocab_bulk_text",
             )
 
+            st.markdown("#### 또는 CSV / TSV 파일 업로드")
+            up_col1, up_col2 = st.columns(2)
+            with up_col1:
+                vocab_file = st.file_uploader(
+                    "단어 파일 (열 순서는 위 형식과 동일)",
+                    type=["csv", "tsv", "txt"],
+                    key="vocab_bulk_file",
+                )
+            with up_col2:
+                file_encoding = st.selectbox(
+                    "파일 인코딩",
+                    ["utf-8", "cp949"],
+                    key="vocab_bulk_encoding",
+                )
+                skip_header = st.checkbox(
+                    "첫 줄은 머리글(건너뛰기)",
+                    key="vocab_bulk_skip_header",
+                )
+
             if st.button("단어 대량 추가 (Parse & Save)"):
-                lines = [l.rstrip() for l in raw_text.split("\n") if l.strip()]
-                if not lines:
+                if vocab_file is not None:
+                    name_lower = vocab_file.name.lower()
+                    delimiter = "," if name_lower.endswith(".csv") else "\t"
+                    lines = io.TextIOWrapper(
+                        vocab_file,
+                        encoding="utf-8-sig" if file_encoding == "utf-8" else file_encoding,
+                        errors="replace",
+                        newline="",
+                    )
+                else:
+                    delimiter = None
+                    lines = io.StringIO(raw_text)
+
+                report = import_vocab_items(
+                    set_id, lines, delimiter=delimiter, skip_header=skip_header
+                )
+
+                if report["inserted"] == 0 and not report["rejected"]:
                     st.warning("유효한 줄이 없습니다.")
+                elif report["inserted"] == 0:
+                    st.error("파싱에 성공한 라인이 없습니다. 탭 또는 ' / ' 구분을 확인하세요.")
                 else:
-                    parsed_rows = []
-                    for line in lines:
-                        # 1순위: 탭 구분 (엑셀)
-                        if "\t" in line:
-                            cols = [c.strip() for c in line.split("\t")]
-                        # 2순위: `/` 구분 백업
-                        elif "/" in line:
-                            w, m = line.split("/", 1)
-                            cols = [w.strip(), m.strip()]
-                        else:
-                            # 인식 불가 → 스킵
-                            continue
-
-                        if len(cols) < 2:
-                            continue
-
-                        word = cols[0]
-                        meaning = cols[1]
-                        pos = cols[2] if len(cols) >= 3 else ""
-                        ex_en = cols[3] if len(cols) >= 4 else ""
-                        ex_ko = cols[4] if len(cols) >= 5 else ""
-                        tags = cols[5] if len(cols) >= 6 else ""
-                        # 난이도
-                        if len(cols) >= 7:
-                            try:
-                                diff = int(cols[6])
-                                if diff < 1 or diff > 5:
-                                    diff = 3
-                            except ValueError:
-                                diff = 3
-                        else:
-                            diff = 3
+                    st.success(f"{report['inserted']}개 단어가 추가되었습니다.")
 
-                        if word and meaning:
-                            parsed_rows.append(
-                                (word, meaning, pos, ex_en, ex_ko, tags, diff)
-                            )
+                if report["difficulty_defaulted"]:
+                    st.caption(
+                        "난이도가 1~5 정수가 아니어서 3으로 저장한 줄: "
+                        + ", ".join(str(n) for n in report["difficulty_defaulted"][:100])
+                    )
 
-                    if not parsed_rows:
-                        st.error("파싱에 성공한 라인이 없습니다. 탭 또는 ' / ' 구분을 확인하세요.")
-                    else:
-                        # DB 저장
-                        for (w, m, pos, ex_en, ex_ko, tags, diff) in parsed_rows:
-                            add_vocab_item(
-                                set_id,
-                                w,
-                                m,
-                                pos,
-                                ex_en,
-                                ex_ko,
-                                tags,
-                                diff,
-                            )
+                if report["rejected"]:
+                    st.markdown(f"#### 제외된 줄 ({len(report['rejected'])}개)")
+                    st.dataframe(
+                        pd.DataFrame(
+                            report["rejected"], columns=["줄 번호", "사유", "원문"]
+                        ),
+                        use_container_width=True,
+                    )
 
-                        st.success(f"{len(parsed_rows)}개 단어가 추가되었습니다.")
-
-                        # 미리보기
-                        st.markdown("#### 추가된 데이터 미리보기")
-                        preview_data = []
-                        for (w, m, pos, ex_en, ex_ko, tags, diff) in parsed_rows[:50]:
-                            preview_data.append(
-                                {
-                                    "단어": w,
-                                    "뜻": m,
-                                    "품사": pos,
-                                    "예문(영)": ex_en,
-                                    "예문(한)": ex_ko,
-                                    "태그": tags,
-                                    "난이도": diff,
-                                }
-                            )
-                        st.dataframe(pd.DataFrame(preview_data), use_container_width=True)
+                if report["preview"] is not None:
+                    # 미리보기
+                    st.markdown("#### 추가된 데이터 미리보기")
+                    st.dataframe(
+                        report["preview"].rename(
+                            columns={
+                                "word": "단어",
+                                "meaning": "뜻",
+                                "part_of_speech": "품사",
+                                "example_en": "예문(영)",
+                                "example_ko": "예문(한)",
+                                "tags": "태그",
+                                "difficulty": "난이도",
+                            }
+                        ),
+                        use_container_width=True,
+                    )
 
             st.markdown("#### 현재 세트 단어 목록")
             items = get_vocab_items(set_id)
@@ -4240,7 +7733,9 @@ def admin_vocab_management():
                 st.dataframe(pd.DataFrame(data), use_container_width=True)
 
     # ================== 배포(할당) ==================
-    with tab3:
+    elif section == "배포(할당)":
+        classes = get_classes()
+        students = get_students()
         if not vocab_sets:
             st.info("단어장 세트가 없습니다.")
         else:
@@ -4282,37 +7777,17 @@ def admin_vocab_management():
                 if not students:
                     st.info("학생이 없습니다.")
                 else:
-                    s_opts = {
-                        f"{name} ({grade}, {school})": sid
-                        for sid, name, school, grade, phone, memo in students
-                    }
-                    s_label = st.selectbox(
-                        "학생 선택",
-                        list(s_opts.keys()),
-                        key="va_student",
-                    )
-                    student_id = s_opts[s_label]
+                    student_id = student_picker("학생 선택", key="va_student")
                     if st.button("해당 학생에게만 할당"):
-                        assign_vocab_to_student(
-                            set_id, student_id, user["id"]
-                        )
-                        st.success("해당 학생에게 단어장이 할당되었습니다.")
+                        if student_id is None:
+                            st.warning("학생을 선택하세요.")
+                        else:
+                            assign_vocab_to_student(
+                                set_id, student_id, user["id"]
+                            )
+                            st.success("해당 학생에게 단어장이 할당되었습니다.")
 
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT va.id, c.name, s.name, va.assigned_at
-                FROM vocab_assignments va
-                LEFT JOIN classes c ON va.class_id=c.id
-                LEFT JOIN students s ON va.student_id=s.id
-                WHERE va.set_id=?
-                ORDER BY va.assigned_at DESC
-                """,
-                (set_id,),
-            )
-            rows = cur.fetchall()
-            conn.close()
+            rows = get_vocab_assignments_for_set(set_id)
 
             st.markdown("#### 현재 세트 할당 현황")
             if not rows:
@@ -4333,7 +7808,7 @@ def admin_vocab_management():
                 st.dataframe(pd.DataFrame(data), use_container_width=True)
 
     # ================== 결과 요약 ==================
-    with tab4:
+    else:
         if not vocab_sets:
             st.info("단어장 세트가 없습니다.")
         else:
@@ -4375,22 +7850,11 @@ def admin_dashboard():
     today_str = today.strftime("%Y-%m-%d")
 
     # ===== 상단 요약 지표 =====
-    conn = get_connection()
-    cur = conn.cursor()
-
     total_students = len(students)
     total_classes = len(classes)
 
-    cur.execute("SELECT COUNT(*) FROM attendance WHERE date=?", (today_str,))
-    today_att = cur.fetchone()[0] or 0
-
     cutoff_30 = (today - pd.Timedelta(days=30)).strftime("%Y-%m-%d")
-    cur.execute("SELECT COUNT(*) FROM school_scores WHERE date>=?", (cutoff_30,))
-    sc_30 = cur.fetchone()[0] or 0
-    cur.execute("SELECT COUNT(*) FROM academy_scores WHERE date>=?", (cutoff_30,))
-    ac_30 = cur.fetchone()[0] or 0
-
-    conn.close()
+    today_att, sc_30, ac_30 = get_dashboard_counts(today_str, cutoff_30)
 
     c1, c2, c3, c4 = st.columns(4)
     with c1:
@@ -4429,25 +7893,14 @@ def admin_dashboard():
         year = base_date.year
         month = base_date.month
 
-        import calendar
-        first_day = date(year, month, 1)
-        last_day_num = calendar.monthrange(year, month)[1]
-
-        start_str = f"{year:04d}-{month:02d}-01"
-        end_str = f"{year:04d}-{month:02d}-{last_day_num:02d}"
-
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT date, status, homework_status, daily_test_status
-            FROM attendance
-            WHERE class_id=? AND date BETWEEN ? AND ?
-            """,
-            (sel_class_id, start_str, end_str),
-        )
-        rows = cur.fetchall()
-        conn.close()
+        import calendar
+        first_day = date(year, month, 1)
+        last_day_num = calendar.monthrange(year, month)[1]
+
+        start_str = f"{year:04d}-{month:02d}-01"
+        end_str = f"{year:04d}-{month:02d}-{last_day_num:02d}"
+
+        rows = get_class_attendance_month(sel_class_id, start_str, end_str)
 
         # 일자별 요약 상태 집계
         daily_status = {d: [] for d in range(1, last_day_num + 1)}
@@ -5038,6 +8491,282 @@ def master_admin_approval():
                 st.warning(f"{username} 계정을 정지했습니다.")
                 st.rerun()
 
+    st.markdown("---")
+
+    # -------- 4) 조회 캐시 상태 --------
+    stats = get_query_cache_stats()
+    st.caption(
+        f"조회 캐시: {stats['entries']}/{QUERY_CACHE_SIZE}개 항목 · "
+        f"적중 {stats['hits']}회 · 조회 {stats['misses']}회"
+    )
+    lstats = get_login_limiter_stats()
+    st.caption(
+        f"로그인 시도: 허용 {lstats['allowed']}회 · 실패 {lstats['failures']}회 · "
+        f"속도 제한 거절 {lstats['rejected_rate']}회 · 잠금 거절 {lstats['rejected_backoff']}회 · "
+        f"추적 중인 키 {lstats['tracked_keys']}개"
+    )
+    if lstats["blocked"]:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    ("아이디@접속지" if kind == "user" else "세션", value, remain, failures)
+                    for (kind, value), remain, failures in lstats["blocked"][:50]
+                ],
+                columns=["구분", "키", "남은 잠금(초)", "연속 실패"],
+            ),
+            use_container_width=True,
+        )
+    hstats = get_hash_service_stats()
+    if hstats["count"]:
+        st.caption(
+            f"비밀번호 해시: 최근 {hstats['count']}건 · "
+            f"p50 {hstats['p50_ms']:.0f}ms · p99 {hstats['p99_ms']:.0f}ms · "
+            f"대기열 초과 거절 {hstats['rejected']}회"
+        )
+
+    st.markdown("---")
+
+    # -------- 5) DB 백업 / 복원 --------
+    master_db_backup()
+
+    st.markdown("---")
+
+    # -------- 6) 학년도별 보관 --------
+    master_archive()
+
+
+def master_archive():
+    """지난 학년도 출석/성적/진도를 보관 DB 파일로 옮기기"""
+    st.markdown("#### 🗄 학년도별 보관")
+    db_size = os.path.getsize(DB_NAME) / 1024 / 1024 if os.path.exists(DB_NAME) else 0
+    st.caption(
+        f"운영 DB {db_size:,.1f}MB · 학년도는 {ACADEMIC_YEAR_START_MONTH}월 시작 · "
+        f"보관된 기록도 학생 이력/성적표/내보내기에서 함께 조회됩니다."
+    )
+
+    archived = get_archive_years()
+    if archived:
+        missing = [
+            (year, path) for year, path, _, _ in archived if not os.path.exists(path)
+        ]
+        for year, path in missing:
+            backup = db_backup.archive_backup_path(path, db_backup.BACKUP_DIR)
+            if os.path.exists(backup):
+                st.error(
+                    f"{year}학년도 보관 파일 `{path}` 이 없습니다. "
+                    f"백업 사본 `{backup}` 을 그 위치로 복사하면 복구됩니다."
+                )
+            else:
+                st.error(f"{year}학년도 보관 파일 `{path}` 이 없고 백업 사본도 없습니다.")
+        unbacked = [
+            path for _, path, _, _ in archived
+            if os.path.exists(path)
+            and not os.path.exists(db_backup.archive_backup_path(path, db_backup.BACKUP_DIR))
+        ]
+        if unbacked:
+            st.warning(f"백업 사본이 없는 보관 파일이 {len(unbacked)}개 있습니다.")
+            if st.button("보관 파일 백업", key="archive_backup_run"):
+                try:
+                    for path in unbacked:
+                        db_backup.backup_archive(path, db_backup.BACKUP_DIR)
+                except (db_backup.BackupError, sqlite3.Error, OSError) as e:
+                    st.error(f"보관 파일 백업 실패: {e}")
+                else:
+                    st.success(f"보관 파일 {len(unbacked)}개를 백업했습니다.")
+        rows = []
+        for year, path, counts_json, archived_at in archived:
+            counts = json.loads(counts_json or "{}")
+            size = os.path.getsize(path) / 1024 / 1024 if os.path.exists(path) else None
+            rows.append(
+                (f"{year}학년도", os.path.basename(path), sum(counts.values()), size, archived_at)
+            )
+        st.dataframe(
+            pd.DataFrame(rows, columns=["학년도", "파일", "행 수", "크기(MB)", "보관 시각"]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    candidates = get_archivable_years()
+    if not candidates:
+        st.info("운영 DB에 보관할 지난 학년도 기록이 없습니다.")
+        return
+
+    year = st.selectbox(
+        "보관할 학년도",
+        list(candidates.keys()),
+        format_func=lambda y: f"{y}학년도 ({sum(candidates[y].values()):,}건)",
+        key="archive_year",
+    )
+    vacuum = st.checkbox(
+        "보관 후 운영 DB 파일 크기 줄이기 (VACUUM, 잠시 저장이 멈춤)", key="archive_vacuum"
+    )
+    if st.button(f"{year}학년도 보관 실행", key="archive_run"):
+        try:
+            with st.spinner("보관 전 백업 후 옮기는 중입니다..."):
+                backup_now()
+                counts = archive_academic_year(year, vacuum=vacuum)
+        except (ValueError, db_backup.BackupError, sqlite3.Error, OSError) as e:
+            st.error(f"보관 실패 (운영 DB는 그대로입니다): {e}")
+        else:
+            st.success(f"{year}학년도 {sum(counts.values()):,}건을 보관했습니다.")
+
+
+def master_db_backup():
+    """스냅샷 목록 / 수동 백업 / 무결성 검사 / 복원 (마스터 화면 하단)"""
+    st.markdown("#### 💾 DB 백업 / 복원")
+    state = start_backup_scheduler()
+    policy = ", ".join(f"{k} {v}개" for k, v in db_backup.RETENTION.items())
+    last_check = state["last_check"].strftime("%H:%M:%S") if state["last_check"] else "-"
+    st.caption(
+        f"자동 백업: {db_backup.BACKUP_INTERVAL // 60}분마다 · 보관 {policy} · "
+        f"마지막 확인 {last_check} · 폴더 `{db_backup.BACKUP_DIR}`"
+    )
+    if state["last_error"]:
+        st.error(f"최근 자동 백업 실패: {state['last_error']}")
+
+    if st.button("지금 백업", key="backup_now"):
+        try:
+            with st.spinner("백업 중입니다..."):
+                path = backup_now()
+        except (db_backup.BackupError, sqlite3.Error, OSError) as e:
+            st.error(f"백업 실패: {e}")
+        else:
+            st.success(f"스냅샷을 만들었습니다: {os.path.basename(path)}")
+
+    # 복원 직전 스냅샷(pre-restore-*)은 보관 정책으로 정리되지 않으므로 함께 보여준다
+    snapshots = sorted(
+        db_backup.list_snapshots(db_backup.BACKUP_DIR)
+        + db_backup.list_snapshots(db_backup.BACKUP_DIR, db_backup.PRE_RESTORE_PREFIX),
+        key=lambda s: s["created"],
+        reverse=True,
+    )
+    if not snapshots:
+        st.info("아직 스냅샷이 없습니다.")
+        return
+
+    st.dataframe(
+        pd.DataFrame(
+            [
+                (s["name"], s["created"].strftime("%Y-%m-%d %H:%M:%S"), s["size"] / 1024 / 1024)
+                for s in snapshots
+            ],
+            columns=["파일", "시각", "크기(MB)"],
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    name = st.selectbox(
+        "스냅샷 선택", [s["name"] for s in snapshots], key="backup_snapshot"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("무결성 검사", key="backup_verify"):
+            ok, message = db_backup.verify_snapshot(
+                os.path.join(db_backup.BACKUP_DIR, name)
+            )
+            if ok:
+                st.success("정상 (integrity_check: ok)")
+            else:
+                st.error(f"손상됨: {message}")
+    with col2:
+        confirm = st.checkbox(
+            "현재 데이터를 이 스냅샷으로 덮어씁니다", key="backup_restore_confirm"
+        )
+        if st.button("복원", key="backup_restore", disabled=not confirm):
+            try:
+                with st.spinner("복원 중입니다..."):
+                    before = restore_database(name)
+            except (db_backup.BackupError, sqlite3.Error, OSError) as e:
+                st.error(f"복원 실패: {e}")
+            else:
+                st.success(
+                    f"{name} 으로 복원했습니다. "
+                    f"복원 직전 상태는 {os.path.basename(before)} 에 남아 있습니다."
+                )
+
+
+def admin_data_export():
+    """여러 표를 기간/반 조건으로 골라 zip 하나로 내보내기"""
+    st.markdown("#### 📦 데이터 내보내기")
+
+    sources = st.multiselect(
+        "내보낼 항목",
+        list(EXPORT_SOURCES.keys()),
+        default=["attendance", "academy_scores", "school_scores", "academy_progress"],
+        format_func=lambda s: EXPORT_SOURCES[s][0],
+        key="export_sources",
+    )
+    fmt = st.radio(
+        "형식",
+        ["csv", "jsonl"],
+        format_func=lambda f: "CSV (엑셀)" if f == "csv" else "JSONL",
+        horizontal=True,
+        key="export_format",
+    )
+
+    all_dates = st.checkbox("기간 전체", value=False, key="export_all_dates")
+    start_str = end_str = None
+    if not all_dates:
+        today = date.today()
+        col1, col2 = st.columns(2)
+        with col1:
+            start_d = st.date_input(
+                "시작일", value=date(today.year, 1, 1), key="export_start"
+            )
+        with col2:
+            end_d = st.date_input("종료일", value=today, key="export_end")
+        start_str = start_d.strftime("%Y-%m-%d")
+        end_str = end_d.strftime("%Y-%m-%d")
+
+    classes = get_classes()
+    class_options = [None] + [cid for cid, name, level, memo in classes]
+    class_names = {cid: name for cid, name, level, memo in classes}
+    class_id = st.selectbox(
+        "반",
+        class_options,
+        format_func=lambda c: "전체" if c is None else f"{class_names[c]} (ID:{c})",
+        key="export_class",
+    )
+    st.caption("기간 필터는 날짜가 있는 항목(출석·성적·진도·단어 시험)에만 적용됩니다.")
+
+    if st.button("내보내기 파일 만들기", key="export_run", disabled=not sources):
+        if start_str and end_str and start_str > end_str:
+            st.warning("시작일이 종료일보다 늦습니다.")
+        else:
+            started = perf_counter()
+            with st.spinner("내보내는 중입니다..."):
+                path, counts = create_export_file(
+                    sources, fmt, start_str, end_str, class_id
+                )
+            old = st.session_state.get("export_result")
+            if old and os.path.exists(old["path"]):
+                os.remove(old["path"])
+            st.session_state["export_result"] = {
+                "path": path,
+                "counts": counts,
+                "file_name": f"academy_export_{datetime.now():%Y%m%d_%H%M}.zip",
+                "elapsed": perf_counter() - started,
+            }
+
+    result = st.session_state.get("export_result")
+    if result and os.path.exists(result["path"]):
+        summary = ", ".join(
+            f"{EXPORT_SOURCES[s][0]} {n:,}행" for s, n in result["counts"].items()
+        )
+        size_kb = os.path.getsize(result["path"]) / 1024
+        st.success(f"{summary} ({size_kb:,.0f} KB, {result['elapsed']:.1f}초)")
+        # 재실행마다 zip 전체를 읽지 않도록 내용은 버튼을 누를 때만 읽는다
+        st.download_button(
+            "⬇️ zip 다운로드",
+            data=functools.partial(read_export_file, result["path"]),
+            file_name=result["file_name"],
+            mime="application/zip",
+            on_click="ignore",
+            key="export_download",
+        )
+
+
 def admin_data_management():
     st.markdown("### 🗂 데이터 관리 (마스터 전용)")
 
@@ -5048,9 +8777,19 @@ def admin_data_management():
 
     mode = st.selectbox(
         "데이터 종류 선택",
-        ["학교 성적", "학원 성적", "학원 진도", "출석"],
+        ["학교 성적", "학원 성적", "학원 진도", "출석", "내보내기 (CSV/JSONL)"],
         key="data_manage_mode",
     )
+    if mode == "내보내기 (CSV/JSONL)":
+        admin_data_export()
+        return
+
+    edit_mode = st.radio(
+        "수정 방식",
+        ["개별 폼", "표로 일괄 수정"],
+        horizontal=True,
+        key="data_manage_edit_mode",
+    )
 
     # =============== 학교 성적 관리 ===============
     if mode == "학교 성적":
@@ -5059,16 +8798,9 @@ def admin_data_management():
             st.info("학생이 없습니다.")
             return
 
-        s_opts = {
-            f"{name} ({grade}, {school})": sid
-            for sid, name, school, grade, phone, memo in students
-        }
-        s_label = st.selectbox(
-            "학생 선택",
-            list(s_opts.keys()),
-            key="dm_school_student",
-        )
-        student_id = s_opts[s_label]
+        student_id = student_picker("학생 선택", key="dm_school_student")
+        if student_id is None:
+            return
 
         subject = st.text_input(
             "과목 필터 (비우면 전체)",
@@ -5076,80 +8808,71 @@ def admin_data_management():
         ).strip()
         subject_filter = subject if subject else None
 
-        # id까지 포함해서 직접 조회
-        conn = get_connection()
-        cur = conn.cursor()
-        query = """
-            SELECT sc.id, sc.date, sc.subject, sc.exam_name,
-                   sc.score, sc.max_score, sc.memo
-            FROM school_scores sc
-            WHERE sc.student_id=?
-        """
-        params = [student_id]
+        # id까지 포함해서 현재 페이지만 조회
+        filters = [("sc.student_id", student_id)]
         if subject_filter:
-            query += " AND sc.subject=?"
-            params.append(subject_filter)
-        query += " ORDER BY sc.date DESC, sc.id DESC"
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        conn.close()
+            filters.append(("sc.subject", subject_filter))
+        rows = paged_data_records("학교 성적", filters, "dm_school")
 
         if not rows:
             st.info("해당 조건의 학교 성적이 없습니다.")
             return
 
-        for sid, dt, subj, exam_name, score, max_score, memo in rows:
-            with st.expander(f"{dt} • {subj} • {exam_name} • {score}/{max_score}"):
-                # 날짜 문자열 -> date 객체
-                try:
-                    d_val = datetime.strptime(dt, "%Y-%m-%d").date()
-                except Exception:
-                    d_val = date.today()
-
-                with st.form(f"dm_school_form_{sid}"):
-                    d_input = st.date_input("날짜", value=d_val, key=f"dm_school_date_{sid}")
-                    subj_input = st.text_input("과목", value=subj, key=f"dm_school_subj_{sid}")
-                    exam_input = st.text_input("시험명", value=exam_name, key=f"dm_school_exam_{sid}")
-                    score_input = st.number_input(
-                        "점수",
-                        min_value=0.0, max_value=200.0,
-                        value=float(score) if score is not None else 0.0,
-                        key=f"dm_school_score_{sid}",
-                    )
-                    max_input = st.number_input(
-                        "만점",
-                        min_value=0.0, max_value=200.0,
-                        value=float(max_score) if max_score is not None else 100.0,
-                        key=f"dm_school_max_{sid}",
-                    )
-                    memo_input = st.text_area(
-                        "메모",
-                        value=memo or "",
-                        key=f"dm_school_memo_{sid}",
-                    )
-
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        save_btn = st.form_submit_button("💾 수정 저장")
-                    with c2:
-                        del_btn = st.form_submit_button("🗑 삭제")
-
-                    if save_btn:
-                        update_school_score(
-                            sid,
-                            d_input.strftime("%Y-%m-%d"),
-                            subj_input.strip(),
-                            exam_input.strip(),
-                            score_input,
-                            max_input,
-                            memo_input.strip(),
+        if edit_mode == "표로 일괄 수정":
+            data_grid_editor("학교 성적", rows, "dm_school_grid")
+        else:
+            for sid, dt, subj, exam_name, score, max_score, memo in rows:
+                with st.expander(f"{dt} • {subj} • {exam_name} • {score}/{max_score}"):
+                    # 날짜 문자열 -> date 객체
+                    try:
+                        d_val = datetime.strptime(dt, "%Y-%m-%d").date()
+                    except Exception:
+                        d_val = date.today()
+
+                    with st.form(f"dm_school_form_{sid}"):
+                        d_input = st.date_input("날짜", value=d_val, key=f"dm_school_date_{sid}")
+                        subj_input = st.text_input("과목", value=subj, key=f"dm_school_subj_{sid}")
+                        exam_input = st.text_input("시험명", value=exam_name, key=f"dm_school_exam_{sid}")
+                        score_input = st.number_input(
+                            "점수",
+                            min_value=0.0, max_value=200.0,
+                            value=float(score) if score is not None else 0.0,
+                            key=f"dm_school_score_{sid}",
+                        )
+                        max_input = st.number_input(
+                            "만점",
+                            min_value=0.0, max_value=200.0,
+                            value=float(max_score) if max_score is not None else 100.0,
+                            key=f"dm_school_max_{sid}",
+                        )
+                        memo_input = st.text_area(
+                            "메모",
+                            value=memo or "",
+                            key=f"dm_school_memo_{sid}",
                         )
-                        st.success("수정 완료")
-                        st.rerun()
-                    if del_btn:
-                        delete_school_score(sid)
-                        st.warning("삭제 완료")
-                        st.rerun()
+
+                        c1, c2 = st.columns(2)
+                        with c1:
+                            save_btn = st.form_submit_button("💾 수정 저장")
+                        with c2:
+                            del_btn = st.form_submit_button("🗑 삭제")
+
+                        if save_btn:
+                            update_school_score(
+                                sid,
+                                d_input.strftime("%Y-%m-%d"),
+                                subj_input.strip(),
+                                exam_input.strip(),
+                                score_input,
+                                max_input,
+                                memo_input.strip(),
+                            )
+                            st.success("수정 완료")
+                            st.rerun()
+                        if del_btn:
+                            delete_school_score(sid)
+                            st.warning("삭제 완료")
+                            st.rerun()
 
     # =============== 학원 성적 관리 ===============
     elif mode == "학원 성적":
@@ -5158,16 +8881,9 @@ def admin_data_management():
             st.info("학생이 없습니다.")
             return
 
-        s_opts = {
-            f"{name} ({grade}, {school})": sid
-            for sid, name, school, grade, phone, memo in students
-        }
-        s_label = st.selectbox(
-            "학생 선택",
-            list(s_opts.keys()),
-            key="dm_academy_score_student",
-        )
-        student_id = s_opts[s_label]
+        student_id = student_picker("학생 선택", key="dm_academy_score_student")
+        if student_id is None:
+            return
 
         subject = st.text_input(
             "과목 필터 (비우면 전체)",
@@ -5175,78 +8891,69 @@ def admin_data_management():
         ).strip()
         subject_filter = subject if subject else None
 
-        conn = get_connection()
-        cur = conn.cursor()
-        query = """
-            SELECT ac.id, ac.date, ac.subject, ac.test_name,
-                   ac.score, ac.max_score, ac.memo
-            FROM academy_scores ac
-            WHERE ac.student_id=?
-        """
-        params = [student_id]
+        filters = [("ac.student_id", student_id)]
         if subject_filter:
-            query += " AND ac.subject=?"
-            params.append(subject_filter)
-        query += " ORDER BY ac.date DESC, ac.id DESC"
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        conn.close()
+            filters.append(("ac.subject", subject_filter))
+        rows = paged_data_records("학원 성적", filters, "dm_academy_score")
 
         if not rows:
             st.info("해당 조건의 학원 성적이 없습니다.")
             return
 
-        for sid, dt, subj, test_name, score, max_score, memo in rows:
-            with st.expander(f"{dt} • {subj} • {test_name} • {score}/{max_score}"):
-                try:
-                    d_val = datetime.strptime(dt, "%Y-%m-%d").date()
-                except Exception:
-                    d_val = date.today()
-
-                with st.form(f"dm_academy_score_form_{sid}"):
-                    d_input = st.date_input("날짜", value=d_val, key=f"dm_academy_date_{sid}")
-                    subj_input = st.text_input("과목", value=subj, key=f"dm_academy_subj_{sid}")
-                    test_input = st.text_input("시험명", value=test_name, key=f"dm_academy_test_{sid}")
-                    score_input = st.number_input(
-                        "점수",
-                        min_value=0.0, max_value=200.0,
-                        value=float(score) if score is not None else 0.0,
-                        key=f"dm_academy_score_{sid}",
-                    )
-                    max_input = st.number_input(
-                        "만점",
-                        min_value=0.0, max_value=200.0,
-                        value=float(max_score) if max_score is not None else 100.0,
-                        key=f"dm_academy_max_{sid}",
-                    )
-                    memo_input = st.text_area(
-                        "메모",
-                        value=memo or "",
-                        key=f"dm_academy_memo_{sid}",
-                    )
-
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        save_btn = st.form_submit_button("💾 수정 저장")
-                    with c2:
-                        del_btn = st.form_submit_button("🗑 삭제")
-
-                    if save_btn:
-                        update_academy_score(
-                            sid,
-                            d_input.strftime("%Y-%m-%d"),
-                            subj_input.strip(),
-                            test_input.strip(),
-                            score_input,
-                            max_input,
-                            memo_input.strip(),
+        if edit_mode == "표로 일괄 수정":
+            data_grid_editor("학원 성적", rows, "dm_academy_score_grid")
+        else:
+            for sid, dt, subj, test_name, score, max_score, memo in rows:
+                with st.expander(f"{dt} • {subj} • {test_name} • {score}/{max_score}"):
+                    try:
+                        d_val = datetime.strptime(dt, "%Y-%m-%d").date()
+                    except Exception:
+                        d_val = date.today()
+
+                    with st.form(f"dm_academy_score_form_{sid}"):
+                        d_input = st.date_input("날짜", value=d_val, key=f"dm_academy_date_{sid}")
+                        subj_input = st.text_input("과목", value=subj, key=f"dm_academy_subj_{sid}")
+                        test_input = st.text_input("시험명", value=test_name, key=f"dm_academy_test_{sid}")
+                        score_input = st.number_input(
+                            "점수",
+                            min_value=0.0, max_value=200.0,
+                            value=float(score) if score is not None else 0.0,
+                            key=f"dm_academy_score_{sid}",
                         )
-                        st.success("수정 완료")
-                        st.rerun()
-                    if del_btn:
-                        delete_academy_score(sid)
-                        st.warning("삭제 완료")
-                        st.rerun()
+                        max_input = st.number_input(
+                            "만점",
+                            min_value=0.0, max_value=200.0,
+                            value=float(max_score) if max_score is not None else 100.0,
+                            key=f"dm_academy_max_{sid}",
+                        )
+                        memo_input = st.text_area(
+                            "메모",
+                            value=memo or "",
+                            key=f"dm_academy_memo_{sid}",
+                        )
+
+                        c1, c2 = st.columns(2)
+                        with c1:
+                            save_btn = st.form_submit_button("💾 수정 저장")
+                        with c2:
+                            del_btn = st.form_submit_button("🗑 삭제")
+
+                        if save_btn:
+                            update_academy_score(
+                                sid,
+                                d_input.strftime("%Y-%m-%d"),
+                                subj_input.strip(),
+                                test_input.strip(),
+                                score_input,
+                                max_input,
+                                memo_input.strip(),
+                            )
+                            st.success("수정 완료")
+                            st.rerun()
+                        if del_btn:
+                            delete_academy_score(sid)
+                            st.warning("삭제 완료")
+                            st.rerun()
 
     # =============== 학원 진도 관리 ===============
     elif mode == "학원 진도":
@@ -5255,16 +8962,9 @@ def admin_data_management():
             st.info("학생이 없습니다.")
             return
 
-        s_opts = {
-            f"{name} ({grade}, {school})": sid
-            for sid, name, school, grade, phone, memo in students
-        }
-        s_label = st.selectbox(
-            "학생 선택",
-            list(s_opts.keys()),
-            key="dm_progress_student",
-        )
-        student_id = s_opts[s_label]
+        student_id = student_picker("학생 선택", key="dm_progress_student")
+        if student_id is None:
+            return
 
         subject = st.text_input(
             "과목 필터 (비우면 전체)",
@@ -5272,63 +8972,52 @@ def admin_data_management():
         ).strip()
         subject_filter = subject if subject else None
 
-        conn = get_connection()
-        cur = conn.cursor()
-        query = """
-            SELECT p.id, p.date, s.name, c.name,
-                   p.subject, p.unit, p.memo
-            FROM academy_progress p
-            JOIN students s ON p.student_id=s.id
-            LEFT JOIN classes c ON p.class_id=c.id
-            WHERE p.student_id=?
-        """
-        params = [student_id]
+        filters = [("p.student_id", student_id)]
         if subject_filter:
-            query += " AND p.subject=?"
-            params.append(subject_filter)
-        query += " ORDER BY p.date DESC, p.id DESC"
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        conn.close()
+            filters.append(("p.subject", subject_filter))
+        rows = paged_data_records("학원 진도", filters, "dm_progress")
 
         if not rows:
             st.info("해당 조건의 진도 기록이 없습니다.")
             return
 
-        for pid, dt, sname, cname, subj, unit, memo in rows:
-            title = f"{dt} • {cname or '-'} • {subj} • {unit}"
-            with st.expander(title):
-                try:
-                    d_val = datetime.strptime(dt, "%Y-%m-%d").date()
-                except Exception:
-                    d_val = date.today()
-
-                with st.form(f"dm_progress_form_{pid}"):
-                    d_input = st.date_input("날짜", value=d_val, key=f"dm_prog_date_{pid}")
-                    subj_input = st.text_input("과목", value=subj, key=f"dm_prog_subj_{pid}")
-                    unit_input = st.text_input("단원/교재/페이지", value=unit or "", key=f"dm_prog_unit_{pid}")
-                    memo_input = st.text_area("메모", value=memo or "", key=f"dm_prog_memo_{pid}")
-
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        save_btn = st.form_submit_button("💾 수정 저장")
-                    with c2:
-                        del_btn = st.form_submit_button("🗑 삭제")
-
-                    if save_btn:
-                        update_academy_progress_record(
-                            pid,
-                            d_input.strftime("%Y-%m-%d"),
-                            subj_input.strip(),
-                            unit_input.strip(),
-                            memo_input.strip(),
-                        )
-                        st.success("수정 완료")
-                        st.rerun()
-                    if del_btn:
-                        delete_academy_progress_record(pid)
-                        st.warning("삭제 완료")
-                        st.rerun()
+        if edit_mode == "표로 일괄 수정":
+            data_grid_editor("학원 진도", rows, "dm_progress_grid")
+        else:
+            for pid, dt, sname, cname, subj, unit, memo in rows:
+                title = f"{dt} • {cname or '-'} • {subj} • {unit}"
+                with st.expander(title):
+                    try:
+                        d_val = datetime.strptime(dt, "%Y-%m-%d").date()
+                    except Exception:
+                        d_val = date.today()
+
+                    with st.form(f"dm_progress_form_{pid}"):
+                        d_input = st.date_input("날짜", value=d_val, key=f"dm_prog_date_{pid}")
+                        subj_input = st.text_input("과목", value=subj, key=f"dm_prog_subj_{pid}")
+                        unit_input = st.text_input("단원/교재/페이지", value=unit or "", key=f"dm_prog_unit_{pid}")
+                        memo_input = st.text_area("메모", value=memo or "", key=f"dm_prog_memo_{pid}")
+
+                        c1, c2 = st.columns(2)
+                        with c1:
+                            save_btn = st.form_submit_button("💾 수정 저장")
+                        with c2:
+                            del_btn = st.form_submit_button("🗑 삭제")
+
+                        if save_btn:
+                            update_academy_progress_record(
+                                pid,
+                                d_input.strftime("%Y-%m-%d"),
+                                subj_input.strip(),
+                                unit_input.strip(),
+                                memo_input.strip(),
+                            )
+                            st.success("수정 완료")
+                            st.rerun()
+                        if del_btn:
+                            delete_academy_progress_record(pid)
+                            st.warning("삭제 완료")
+                            st.rerun()
 
     # =============== 출석 관리 ===============
     else:  # mode == "출석"
@@ -5349,61 +9038,67 @@ def admin_data_management():
             if class_label != "(전체)":
                 class_id_filter = class_map[class_label]
 
-        records = get_attendance_records(date_str, class_id_filter)
+        filters = [("a.date", date_str)]
+        if class_id_filter:
+            filters.append(("a.class_id", class_id_filter))
+        records = paged_data_records("출석", filters, "dm_att")
         if not records:
             st.info("해당 날짜에 출결 기록이 없습니다.")
             return
 
-        st.caption("각 기록을 펼쳐서 출결/과제/테스트 상태를 수정하거나 삭제할 수 있습니다.")
-
-        for (aid, dt, time_str, status, hw, test, via,
-             s_name, school, grade, class_name) in records:
-            title = f"{time_str} • {s_name} • {class_name or '-'} • {status}"
-            with st.expander(title):
-                with st.form(f"dm_att_form_{aid}"):
-                    st.markdown(f"- 날짜: **{dt}**")
-                    st.markdown(f"- 학생: **{s_name} ({school}, {grade})**")
-                    st.markdown(f"- 반: **{class_name or '-'}**")
-                    st.markdown(f"- 입력 경로: **{via}**")
-
-                    status_input = st.selectbox(
-                        "출결 상태",
-                        ["정상출석", "지각", "미인정결석"],
-                        index=["정상출석", "지각", "미인정결석"].index(status),
-                        key=f"dm_att_status_{aid}",
-                    )
-                    hw_input = st.selectbox(
-                        "과제",
-                        ["○", "△", "X"],
-                        index=["○", "△", "X"].index(hw or "○"),
-                        key=f"dm_att_hw_{aid}",
-                    )
-                    test_input = st.selectbox(
-                        "일일 테스트",
-                        ["○", "△", "X"],
-                        index=["○", "△", "X"].index(test or "○"),
-                        key=f"dm_att_test_{aid}",
-                    )
+        if edit_mode == "표로 일괄 수정":
+            data_grid_editor("출석", records, "dm_att_grid")
+        else:
+            st.caption("각 기록을 펼쳐서 출결/과제/테스트 상태를 수정하거나 삭제할 수 있습니다.")
 
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        save_btn = st.form_submit_button("💾 수정 저장")
-                    with c2:
-                        del_btn = st.form_submit_button("🗑 삭제")
-
-                    if save_btn:
-                        update_attendance_record(
-                            aid,
-                            status_input,
-                            hw_input,
-                            test_input,
+            for (aid, dt, time_str, status, hw, test, via,
+                 s_name, school, grade, class_name) in records:
+                title = f"{time_str} • {s_name} • {class_name or '-'} • {status}"
+                with st.expander(title):
+                    with st.form(f"dm_att_form_{aid}"):
+                        st.markdown(f"- 날짜: **{dt}**")
+                        st.markdown(f"- 학생: **{s_name} ({school}, {grade})**")
+                        st.markdown(f"- 반: **{class_name or '-'}**")
+                        st.markdown(f"- 입력 경로: **{via}**")
+
+                        status_input = st.selectbox(
+                            "출결 상태",
+                            ["정상출석", "지각", "미인정결석"],
+                            index=["정상출석", "지각", "미인정결석"].index(status),
+                            key=f"dm_att_status_{aid}",
                         )
-                        st.success("수정 완료")
-                        st.rerun()
-                    if del_btn:
-                        delete_attendance_record(aid)
-                        st.warning("삭제 완료")
-                        st.rerun()
+                        hw_input = st.selectbox(
+                            "과제",
+                            ["○", "△", "X"],
+                            index=["○", "△", "X"].index(hw or "○"),
+                            key=f"dm_att_hw_{aid}",
+                        )
+                        test_input = st.selectbox(
+                            "일일 테스트",
+                            ["○", "△", "X"],
+                            index=["○", "△", "X"].index(test or "○"),
+                            key=f"dm_att_test_{aid}",
+                        )
+
+                        c1, c2 = st.columns(2)
+                        with c1:
+                            save_btn = st.form_submit_button("💾 수정 저장")
+                        with c2:
+                            del_btn = st.form_submit_button("🗑 삭제")
+
+                        if save_btn:
+                            update_attendance_record(
+                                aid,
+                                status_input,
+                                hw_input,
+                                test_input,
+                            )
+                            st.success("수정 완료")
+                            st.rerun()
+                        if del_btn:
+                            delete_attendance_record(aid)
+                            st.warning("삭제 완료")
+                            st.rerun()
 
 
     # 관리자 승인 대기
@@ -5464,45 +9159,47 @@ def student_dashboard():
     user = st.session_state["user"]
     student_id = user["student_id"]
 
-    school_rows = get_scores_for_student("school_scores", student_id)
-    academy_rows = get_scores_for_student("academy_scores", student_id)
-
     col1, col2 = st.columns(2)
-    with col1:
-        st.markdown("#### 🏫 최근 학교 성적")
-        if not school_rows:
-            st.info("학교 성적 기록이 아직 없습니다.")
-        else:
-            last = school_rows[-3:]
-            data = [
-                {
-                    "날짜": r[0],
-                    "과목": r[1],
-                    "시험명": r[2],
-                    "점수": r[3],
-                    "만점": r[4],
-                }
-                for r in last
-            ]
-            st.table(pd.DataFrame(data))
+    for col, table_name, title, empty_msg in (
+        (col1, "school_scores", "#### 🏫 최근 학교 성적", "학교 성적 기록이 아직 없습니다."),
+        (col2, "academy_scores", "#### 📊 최근 학원 성적", "학원 성적 기록이 아직 없습니다."),
+    ):
+        with col:
+            st.markdown(title)
+            scores = student_score_analytics(student_id, table_name)
+            if scores.empty:
+                st.info(empty_msg)
+                continue
+            last = scores.tail(3)
+            st.table(
+                pd.DataFrame(
+                    {
+                        "날짜": last["date"],
+                        "과목": last["subject"],
+                        "시험명": last["exam_name"],
+                        "점수": last["score"],
+                        "만점": last["max_score"],
+                    }
+                ).reset_index(drop=True)
+            )
+            student_score_metrics(scores)
 
-    with col2:
-        st.markdown("#### 📊 최근 학원 성적")
-        if not academy_rows:
-            st.info("학원 성적 기록이 아직 없습니다.")
-        else:
-            last = academy_rows[-3:]
-            data = [
-                {
-                    "날짜": r[0],
-                    "과목": r[1],
-                    "시험명": r[2],
-                    "점수": r[3],
-                    "만점": r[4],
-                }
-                for r in last
-            ]
-            st.table(pd.DataFrame(data))
+
+def student_score_metrics(scores):
+    """최근 시험 기준 요약 지표 (최근 N회 평균 / 반 내 백분위)"""
+    recent = scores.dropna(subset=["percent"]).tail(SCORE_TREND_WINDOW)
+    if recent.empty:
+        return
+    prev = scores.dropna(subset=["percent"]).iloc[:-SCORE_TREND_WINDOW].tail(SCORE_TREND_WINDOW)
+    m1, m2 = st.columns(2)
+    avg = recent["percent"].mean()
+    m1.metric(
+        f"최근 {len(recent)}회 평균",
+        f"{avg:.1f}%",
+        delta=None if prev.empty else f"{avg - prev['percent'].mean():+.1f}%p",
+    )
+    percentile = recent["class_percentile"].mean()
+    m2.metric("반 내 백분위 (평균)", "-" if pd.isna(percentile) else f"{percentile:.0f}")
 
 
 def student_notice_view():
@@ -5526,22 +9223,7 @@ def student_progress_view():
     subject = st.text_input("과목 필터 (비우면 전체)").strip()
     subject_filter = subject if subject else None
 
-    conn = get_connection()
-    cur = conn.cursor()
-    query = """
-        SELECT p.date, p.subject, p.unit, p.memo, c.name
-        FROM academy_progress p
-        LEFT JOIN classes c ON p.class_id=c.id
-        WHERE p.student_id=?
-    """
-    params = [student_id]
-    if subject_filter:
-        query += " AND p.subject=?"
-        params.append(subject_filter)
-    query += " ORDER BY p.date DESC"
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
+    rows = get_progress_for_student(student_id, subject_filter)
 
     if not rows:
         st.info("진도 기록이 없습니다.")
@@ -5568,29 +9250,37 @@ def student_score_view_common(table_name, title):
     subject = st.text_input("과목 필터 (비우면 전체)").strip()
     subject_filter = subject if subject else None
 
-    rows = get_scores_for_student(table_name, student_id, subject_filter)
-    if not rows:
+    scores = student_score_analytics(student_id, table_name, subject_filter)
+    if scores.empty:
         st.info("성적 기록이 없습니다.")
         return
 
-    data = []
-    for dt, subj, exam_nm, score, max_score in rows:
-        data.append(
-            {
-                "날짜": dt,
-                "과목": subj,
-                "시험명": exam_nm,
-                "점수": score,
-                "만점": max_score,
-            }
-        )
-    df = pd.DataFrame(data)
+    student_score_metrics(scores)
+    df = pd.DataFrame(
+        {
+            "날짜": scores["date"],
+            "과목": scores["subject"],
+            "시험명": scores["exam_name"],
+            "점수": scores["score"],
+            "만점": scores["max_score"],
+            "백분율(%)": scores["percent"].round(1),
+            "반 평균(%)": scores["class_mean"].round(1),
+            "반 내 백분위": scores["class_percentile"].round(0),
+            "전체 평균(%)": scores["exam_mean"].round(1),
+        }
+    )
     st.dataframe(df, use_container_width=True)
 
-    df_plot = df.copy()
-    df_plot["날짜"] = pd.to_datetime(df_plot["날짜"])
-    df_plot.set_index("날짜", inplace=True)
-    st.line_chart(df_plot["점수"])
+    # 만점 대비 % 로 그려서 만점이 다른 시험끼리도 비교되게
+    df_plot = pd.DataFrame(
+        {
+            "내 점수(%)": scores["percent"],
+            f"최근 {SCORE_TREND_WINDOW}회 평균(%)": scores["moving_avg"],
+            "반 평균(%)": scores["class_mean"],
+        }
+    )
+    df_plot.index = pd.to_datetime(scores["date"])
+    st.line_chart(df_plot)
 
     with st.expander("📄 인쇄용 성적표 보기"):
         st.image("logo.png", width=120)
@@ -5829,31 +9519,16 @@ def student_exam_documents_view():
             filtered.append(row)
 
     for (doc_id, subj, etype, ename, edate, tags,
-         memo, fpath, oname, uploaded_at) in filtered:
+         memo, fpath, oname, uploaded_at, content_hash) in filtered:
         title = f"{edate} • {subj} • {ename}"
         with st.expander(title):
             st.write(f"유형: {etype}")
             st.write(f"태그: {tags}")
             st.write(f"메모: {memo}")
             st.write(f"업로드 시간: {uploaded_at}")
-            try:
-                with open(fpath, "rb") as f:
-                    file_bytes = f.read()
-                if fpath.lower().endswith((".png", ".jpg", ".jpeg")):
-                    st.image(
-                        file_bytes,
-                        caption=oname,
-                        use_container_width=True,
-                    )
-                else:
-                    st.download_button(
-                        label="📎 파일 다운로드",
-                        data=file_bytes,
-                        file_name=oname,
-                        mime="application/pdf",
-                    )
-            except FileNotFoundError:
-                st.error(f"파일을 찾을 수 없습니다. (경로: {fpath})")
+            render_exam_document_file(
+                doc_id, fpath, oname, content_hash, key="my_examdoc"
+            )
 
 
 # ============== 메인 ==============
@@ -5900,29 +9575,45 @@ def student_password_change():
     cur = conn.cursor()
     cur.execute("SELECT password_hash FROM users WHERE id=?", (user["id"],))
     row = cur.fetchone()
+    conn.close()
     if not row:
-        conn.close()
         st.error("사용자 정보를 찾을 수 없습니다.")
         return
 
+    # 해시 계산 중에는 DB 연결을 잡고 있지 않는다
     stored_hash = row[0]
-    if not verify_password(current_pw, stored_hash):
-        conn.close()
-        st.error("현재 비밀번호가 올바르지 않습니다.")
+    try:
+        if not verify_password(current_pw, stored_hash):
+            st.error("현재 비밀번호가 올바르지 않습니다.")
+            return
+        new_hash = hash_password(new_pw)
+    except HashServiceBusy:
+        st.warning("요청이 몰려 있습니다. 잠시 후 다시 시도하세요.")
         return
 
-    cur.execute("UPDATE users SET password_hash=? WHERE id=?", (hash_password(new_pw), user["id"]))
+    conn = get_connection()
+    cur = conn.cursor()
+    # 비밀번호가 바뀌면 다른 기기의 로그인 유지 토큰은 폐기하고, 현재 세션만 새로 발급
+    cur.execute(
+        """
+        UPDATE users
+        SET password_hash=?, token_version=token_version + 1
+        WHERE id=?
+        """,
+        (new_hash, user["id"]),
+    )
     conn.commit()
     conn.close()
+    set_session_cookie(issue_session_token(user["id"]))
 
     st.success("비밀번호가 변경되었습니다. 다음 로그인부터 적용됩니다.")
 
 
 def main():
     st.set_page_config(page_title="학원 관리 시스템", layout="wide")
-    init_db()
-    # 구버전 DB 호환(출결 컬럼 누락 등)
-    ensure_attendance_schema()
+    # 테이블 생성 + 구버전 DB 보정 (프로세스당 한 번만 실행)
+    ensure_schema()
+    start_backup_scheduler()
     promote_all_students_if_needed()
 
     # ===== 상단 여백 제거 CSS =====
@@ -5945,6 +9636,11 @@ def main():
     if "user" not in st.session_state:
         st.session_state["user"] = None
 
+    # 새로고침/재접속: 로그인 유지 쿠키로 복원 (PBKDF2 없이)
+    if not st.session_state["user"]:
+        restore_session_from_cookie()
+    flush_session_cookie()
+
     # 로그인 안 되어 있으면 로그인 화면만
     if not st.session_state["user"]:
         apply_theme()
@@ -5990,6 +9686,10 @@ def main():
         is_master = (user["role"] == "master")
         menu = menu_value or "대시보드"
 
+        search_query = (st.session_state.get("global_search") or "").strip()
+        if search_query:
+            render_global_search_results(search_query)
+
         if menu == "대시보드":
             admin_dashboard()
         elif menu == "공지 관리":
@@ -0,0 +1,338 @@
+"""
+academy.db 온라인 백업 / 스냅샷 / 복원.
+
+sqlite3 온라인 백업 API 로 몇 페이지씩 나눠 복사하므로, 앱이 쓰는 중에도
+파일이 찢어지지 않은 스냅샷을 만들고 쓰기 작업을 오래 막지 않는다.
+스냅샷은 BACKUP_DIR 에 academy-YYYYMMDD-HHMMSS.db 이름으로 쌓이고
+시간별/일별/주별 보관 개수(RETENTION)를 넘는 것은 정리된다.
+복원 직전 상태는 pre-restore-YYYYMMDD-HHMMSS.db 로 따로 남기며 자동 정리하지 않는다
+(같은 시간대에 "지금 백업" 을 한 번 더 하면 정리돼 버리면 안 되므로).
+학년도 보관 파일(archive/*.db)은 보관할 때 한 번 BACKUP_DIR/archive 에 복사해 둔다
+(보관 파일은 그 뒤로 바뀌지 않으므로 스냅샷마다 다시 복사하지 않는다).
+
+app.py (마스터 화면) 에서 import 해서 쓰고, Streamlit 없이 명령줄에서도 실행할 수 있다.
+
+    python db_backup.py backup            # 스냅샷 만들기 + 오래된 스냅샷 정리
+    python db_backup.py list              # 스냅샷 목록
+    python db_backup.py verify [이름]     # 무결성 검사 (이름 없으면 전체)
+    python db_backup.py restore 이름      # 스냅샷으로 복원 (복원 직전 상태도 스냅샷으로 남김)
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+DB_NAME = "academy.db"
+BACKUP_DIR = "backups"
+BACKUP_PAGES_PER_STEP = 256     # 한 단계에 복사하는 페이지 수 (4KB 페이지 기준 약 1MB)
+BACKUP_STEP_SLEEP = 0.005       # 단계 사이에 쉬는 시간(초) → 그 사이 다른 연결이 쓸 수 있음
+BACKUP_INTERVAL = 3600          # 자동 백업 간격(초)
+ARCHIVE_BACKUP_SUBDIR = "archive"   # 학년도 보관 파일 사본 폴더 (BACKUP_DIR 아래)
+
+# 보관 정책: 최근 N개의 시간/일/주 구간마다 가장 최신 스냅샷 하나씩 남긴다
+RETENTION = {"hourly": 24, "daily": 7, "weekly": 8}
+
+SNAPSHOT_PREFIX = "academy-"
+PRE_RESTORE_PREFIX = "pre-restore-"     # 복원 직전 스냅샷 (보관 정책 대상 아님)
+SNAPSHOT_SUFFIX = ".db"
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupError(RuntimeError):
+    """스냅샷 생성/검사/복원 실패"""
+
+
+def _snapshot_time(name, prefix=SNAPSHOT_PREFIX):
+    """스냅샷 파일 이름 → 생성 시각 (형식이 다르면 None)"""
+    if not (name.startswith(prefix) and name.endswith(SNAPSHOT_SUFFIX)):
+        return None
+    stamp = name[len(prefix):-len(SNAPSHOT_SUFFIX)]
+    try:
+        return datetime.strptime(stamp, SNAPSHOT_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def list_snapshots(backup_dir=BACKUP_DIR, prefix=SNAPSHOT_PREFIX):
+    """
+    스냅샷 목록 (최신순): [{"name", "path", "created", "size"}]
+    prefix=PRE_RESTORE_PREFIX 면 복원 직전 스냅샷 목록.
+    """
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backup_dir):
+        created = _snapshot_time(name, prefix)
+        if created is None:
+            continue
+        path = os.path.join(backup_dir, name)
+        snapshots.append(
+            {"name": name, "path": path, "created": created, "size": os.path.getsize(path)}
+        )
+    snapshots.sort(key=lambda s: s["created"], reverse=True)
+    return snapshots
+
+
+def verify_snapshot(path):
+    """PRAGMA integrity_check 결과 → (정상 여부, 메시지)"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("PRAGMA integrity_check").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return False, str(e)
+    messages = [r[0] for r in rows]
+    return messages == ["ok"], ", ".join(messages[:5])
+
+
+def _copy_database(src_path, dst_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """
+    온라인 백업 API 로 src → dst 를 pages 페이지씩 복사.
+
+    단계 사이에 다른 연결이 원본에 쓰면 SQLite 는 백업을 처음부터 다시 시작하므로,
+    쓰기가 계속되면 끝나지 않을 수 있다. WAL 모드에서는 원본 연결에 읽기 트랜잭션을
+    열어 둔 채 복사해서 한 시점의 스냅샷을 끝까지 읽는다 (WAL 에서는 읽기가 쓰기를 막지 않음).
+    """
+    src = sqlite3.connect(src_path, timeout=30)
+    try:
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if wal:
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        dst = sqlite3.connect(dst_path, timeout=30)
+        try:
+            src.backup(dst, pages=pages, sleep=sleep)
+            # 원본이 WAL 이어도 스냅샷은 -wal/-shm 없이 파일 하나로 완결되게
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dst.close()
+        if wal:
+            src.rollback()
+    finally:
+        src.close()
+
+
+def create_snapshot(db_path=DB_NAME, backup_dir=BACKUP_DIR, now=None, prefix=SNAPSHOT_PREFIX):
+    """
+    db_path 의 스냅샷을 backup_dir 에 만들고 무결성 검사까지 마친 경로를 반환.
+    검사에 실패하면 파일을 지우고 BackupError.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    now = now or datetime.now()
+    while True:
+        name = f"{prefix}{now.strftime(SNAPSHOT_TIME_FORMAT)}{SNAPSHOT_SUFFIX}"
+        path = os.path.join(backup_dir, name)
+        if not os.path.exists(path):
+            break
+        # 같은 초에 만든 스냅샷을 덮어쓰지 않도록 1초 뒤 이름 사용
+        now += timedelta(seconds=1)
+    tmp_path = path + ".part"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        _copy_database(db_path, tmp_path)
+        ok, message = verify_snapshot(tmp_path)
+        if not ok:
+            raise BackupError(f"스냅샷 무결성 검사 실패: {message}")
+    except (sqlite3.Error, BackupError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # 완성된 스냅샷만 정식 이름으로 보이도록 마지막에 바꾼다
+    os.replace(tmp_path, path)
+    return path
+
+
+def archive_backup_path(archive_path, backup_dir=BACKUP_DIR):
+    """학년도 보관 파일의 사본 경로"""
+    return os.path.join(backup_dir, ARCHIVE_BACKUP_SUBDIR, os.path.basename(archive_path))
+
+
+def backup_archive(archive_path, backup_dir=BACKUP_DIR):
+    """
+    학년도 보관 파일을 backup_dir/archive 에 복사하고 무결성 검사까지 마친 경로를 반환.
+    같은 학년도를 다시 보관하면 사본도 새 내용으로 바뀐다. 검사에 실패하면 BackupError.
+    """
+    path = archive_backup_path(archive_path, backup_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".part"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        _copy_database(archive_path, tmp_path)
+        ok, message = verify_snapshot(tmp_path)
+        if not ok:
+            raise BackupError(f"보관 파일 사본 무결성 검사 실패: {message}")
+    except (sqlite3.Error, BackupError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path
+
+
+def prune_snapshots(backup_dir=BACKUP_DIR, retention=RETENTION):
+    """보관 정책에 들지 않는 스냅샷 삭제 → 삭제한 파일 이름 목록"""
+    bucket_keys = {
+        "hourly": lambda t: t.strftime("%Y%m%d%H"),
+        "daily": lambda t: t.strftime("%Y%m%d"),
+        "weekly": lambda t: t.isocalendar()[:2],
+    }
+    snapshots = list_snapshots(backup_dir)
+    keep = set()
+    for tier, count in retention.items():
+        seen = set()
+        for snap in snapshots:          # 최신순
+            bucket = bucket_keys[tier](snap["created"])
+            if bucket in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(bucket)
+            keep.add(snap["name"])
+
+    removed = []
+    for snap in snapshots:
+        if snap["name"] not in keep:
+            os.remove(snap["path"])
+            removed.append(snap["name"])
+    return removed
+
+
+def run_scheduled_backup(db_path=DB_NAME, backup_dir=BACKUP_DIR, interval=BACKUP_INTERVAL):
+    """마지막 스냅샷이 interval 초보다 오래됐으면 새로 만들고 정리. 만든 경로(없으면 None)."""
+    snapshots = list_snapshots(backup_dir)
+    if snapshots and (datetime.now() - snapshots[0]["created"]).total_seconds() < interval:
+        return None
+    path = create_snapshot(db_path, backup_dir)
+    prune_snapshots(backup_dir)
+    return path
+
+
+def _read_table_versions(conn):
+    try:
+        return dict(conn.execute("SELECT table_name, version FROM table_versions"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def _read_token_versions(conn):
+    try:
+        return dict(conn.execute("SELECT id, token_version FROM users"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def restore_snapshot(snapshot_path, db_path=DB_NAME, backup_dir=BACKUP_DIR):
+    """
+    스냅샷 내용으로 db_path 를 덮어쓴다 (실행 중인 앱의 연결은 그대로 둔 채 백업 API 로 복사).
+    복원 전에 스냅샷을 검사하고, 현재 DB 상태도 pre-restore 스냅샷으로 남겨 되돌릴 수 있게 한다.
+    반환: 복원 직전 상태 스냅샷 경로
+    """
+    ok, message = verify_snapshot(snapshot_path)
+    if not ok:
+        raise BackupError(f"복원할 스냅샷이 손상되었습니다: {message}")
+    before = create_snapshot(db_path, backup_dir, prefix=PRE_RESTORE_PREFIX)
+
+    live = sqlite3.connect(db_path, timeout=30)
+    try:
+        old_versions = _read_table_versions(live)
+        old_tokens = _read_token_versions(live)
+        src = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        try:
+            src.backup(live)
+        finally:
+            src.close()
+        # users.token_version 도 예전 값으로 돌아가 로그아웃 등으로 폐기한 로그인 유지 토큰이
+        # 다시 유효해지므로, 복원 전후 중 큰 값보다 올려 복원 전에 발급된 토큰을 모두 끊는다.
+        restored_tokens = _read_token_versions(live)
+        if restored_tokens:
+            live.executemany(
+                "UPDATE users SET token_version=? WHERE id=?",
+                [
+                    (max(version, old_tokens.get(user_id, 0)) + 1, user_id)
+                    for user_id, version in restored_tokens.items()
+                ],
+            )
+        # 앱의 조회 캐시는 table_versions 로 무효화되므로, 복원 후 버전이 예전 값으로
+        # 돌아가 옛 캐시와 겹치지 않도록 복원 전보다 큰 값으로 올린다.
+        restored = _read_table_versions(live)
+        if restored:
+            live.executemany(
+                "UPDATE table_versions SET version=? WHERE table_name=?",
+                [
+                    (max(version, old_versions.get(table, 0)) + 1, table)
+                    for table, version in restored.items()
+                ],
+            )
+        live.commit()
+    finally:
+        live.close()
+    return before
+
+
+def _find_snapshot(backup_dir, name):
+    name = os.path.basename(name)
+    path = os.path.join(backup_dir, name)
+    known = any(
+        _snapshot_time(name, prefix) for prefix in (SNAPSHOT_PREFIX, PRE_RESTORE_PREFIX)
+    )
+    if not known or not os.path.exists(path):
+        raise BackupError(f"스냅샷을 찾을 수 없습니다: {name}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="academy.db 백업 / 복원")
+    parser.add_argument("--db", default=DB_NAME, help="DB 파일 경로")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="스냅샷 폴더")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backup", help="스냅샷 만들기 + 보관 정책 적용")
+    sub.add_parser("list", help="스냅샷 목록")
+    p_verify = sub.add_parser("verify", help="스냅샷 무결성 검사")
+    p_verify.add_argument("name", nargs="?")
+    p_restore = sub.add_parser("restore", help="스냅샷으로 복원")
+    p_restore.add_argument("name")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "backup":
+            path = create_snapshot(args.db, args.dir)
+            removed = prune_snapshots(args.dir)
+            print(f"created {path} (pruned {len(removed)})")
+        elif args.command == "list":
+            for prefix in (SNAPSHOT_PREFIX, PRE_RESTORE_PREFIX):
+                for snap in list_snapshots(args.dir, prefix):
+                    print(f"{snap['name']}\t{snap['size']:>12,d}")
+        elif args.command == "verify":
+            if args.name:
+                targets = [_find_snapshot(args.dir, args.name)]
+            else:
+                targets = [
+                    s["path"]
+                    for prefix in (SNAPSHOT_PREFIX, PRE_RESTORE_PREFIX)
+                    for s in list_snapshots(args.dir, prefix)
+                ]
+            failed = 0
+            for path in targets:
+                ok, message = verify_snapshot(path)
+                failed += not ok
+                print(f"{os.path.basename(path)}\t{'ok' if ok else 'FAILED: ' + message}")
+            return 1 if failed else 0
+        elif args.command == "restore":
+            before = restore_snapshot(_find_snapshot(args.dir, args.name), args.db, args.dir)
+            print(f"restored {args.name} (previous state saved as {before})")
+            print("실행 중인 앱이 있으면 재시작해 주세요 (스키마 마이그레이션 재확인).")
+    except (BackupError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
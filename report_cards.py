@@ -0,0 +1,239 @@
+"""
+학생 성적표 PDF 생성 (reportlab).
+
+app.py 와 분리한 이유: 여러 학생의 성적표를 ProcessPoolExecutor 로 병렬 생성할 때
+작업 프로세스가 import 해서 부를 수 있는 함수가 필요하기 때문이다 (app.py 는
+Streamlit 스크립트로 실행된다). DB 조회는 app.py 에서 하고, 여기에는 아래 형태의
+dict 만 넘긴다.
+
+    {
+        "student": {"id", "name", "school", "grade"},
+        "academy_name": 학원 이름,
+        "period": "YYYY-MM-DD ~ YYYY-MM-DD",
+        "issued_at": "YYYY-MM-DD",
+        "logo_path": 로고 이미지 경로 (없으면 None),
+        "school_scores": [(date, subject, exam_name, score, max_score), ...],
+        "academy_scores": [(date, subject, test_name, score, max_score), ...],
+        "attendance": {"정상출석": n, "지각": n, "미인정결석": n},
+        "progress": [(date, subject, unit), ...],
+    }
+"""
+import io
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import (
+    Image,
+    PageBreak,
+    Paragraph,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle,
+)
+
+try:
+    # 병렬로 만든 PDF 조각을 하나로 합칠 때 사용 (없으면 한 프로세스에서 통째로 생성)
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+# 한글 TTF 글꼴 경로 (없으면 reportlab 내장 한글 CID 글꼴 사용)
+REPORT_FONT_PATH = os.environ.get("REPORT_FONT_PATH", "fonts/NanumGothic.ttf")
+REPORT_FONT_NAME = "ReportKorean"
+REPORT_CID_FONT = "HYGothic-Medium"
+
+_font_name = None
+
+
+def _report_font():
+    """한글 글꼴을 한 번만 등록하고 이름을 반환"""
+    global _font_name
+    if _font_name is None:
+        if os.path.exists(REPORT_FONT_PATH):
+            pdfmetrics.registerFont(TTFont(REPORT_FONT_NAME, REPORT_FONT_PATH))
+            _font_name = REPORT_FONT_NAME
+        else:
+            pdfmetrics.registerFont(UnicodeCIDFont(REPORT_CID_FONT))
+            _font_name = REPORT_CID_FONT
+    return _font_name
+
+
+def _styles():
+    font = _report_font()
+    return {
+        "title": ParagraphStyle("title", fontName=font, fontSize=18, leading=24),
+        "h2": ParagraphStyle("h2", fontName=font, fontSize=12, leading=18, spaceBefore=8),
+        "body": ParagraphStyle("body", fontName=font, fontSize=9, leading=13),
+        "small": ParagraphStyle("small", fontName=font, fontSize=8, leading=11,
+                                textColor=colors.grey),
+    }
+
+
+def _fmt_score(score, max_score):
+    if score is None:
+        return "-"
+    if max_score:
+        return f"{score:g} / {max_score:g} ({score / max_score * 100:.0f}%)"
+    return f"{score:g}"
+
+
+def _table(header, rows, col_widths):
+    font = _report_font()
+    table = Table([header] + rows, colWidths=col_widths, repeatRows=1)
+    table.setStyle(
+        TableStyle(
+            [
+                ("FONTNAME", (0, 0), (-1, -1), font),
+                ("FONTSIZE", (0, 0), (-1, -1), 8.5),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E8EEF7")),
+                ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#B0B8C4")),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F7F9FC")]),
+            ]
+        )
+    )
+    return table
+
+
+def _score_section(title, rows, name_header, styles):
+    story = [Paragraph(title, styles["h2"])]
+    if not rows:
+        story.append(Paragraph("기간 내 기록이 없습니다.", styles["small"]))
+        return story
+    body = [
+        [d, subj, name or "", _fmt_score(score, max_score)]
+        for d, subj, name, score, max_score in rows
+    ]
+    story.append(
+        _table(["날짜", "과목", name_header, "점수"], body, [25 * mm, 30 * mm, 65 * mm, 50 * mm])
+    )
+    return story
+
+
+def _report_story(data, styles):
+    """학생 한 명 분량의 flowable 목록"""
+    student = data["student"]
+    story = []
+
+    logo_path = data.get("logo_path")
+    if logo_path and os.path.exists(logo_path):
+        story.append(Image(logo_path, width=30 * mm, height=30 * mm, kind="proportional"))
+
+    # Paragraph 는 <b> 같은 마크업을 해석하므로 DB 에서 온 값은 이스케이프한다
+    # (이름에 '<' 가 하나만 있어도 학원 전체 일괄 생성이 실패함)
+    story.append(
+        Paragraph(f"{escape(data.get('academy_name') or '')} 성적표", styles["title"])
+    )
+    story.append(
+        Paragraph(
+            f"{escape(student['name'])} ({escape(student.get('grade') or '-')}, "
+            f"{escape(student.get('school') or '-')})"
+            f" · 기간 {data['period']} · 발행일 {data['issued_at']}",
+            styles["body"],
+        )
+    )
+    story.append(Spacer(1, 4 * mm))
+
+    att = data.get("attendance") or {}
+    total = sum(att.values())
+    story.append(Paragraph("출결 요약", styles["h2"]))
+    story.append(
+        _table(
+            ["정상출석", "지각", "미인정결석", "합계"],
+            [[att.get("정상출석", 0), att.get("지각", 0), att.get("미인정결석", 0), total]],
+            [42 * mm] * 4,
+        )
+    )
+
+    story += _score_section("학원 성적", data.get("academy_scores") or [], "시험명", styles)
+    story += _score_section("학교 성적", data.get("school_scores") or [], "시험명", styles)
+
+    story.append(Paragraph("최근 학원 진도", styles["h2"]))
+    progress = data.get("progress") or []
+    if progress:
+        story.append(
+            _table(
+                ["날짜", "과목", "단원/교재/페이지"],
+                [[d, subj, unit or ""] for d, subj, unit in progress],
+                [25 * mm, 30 * mm, 115 * mm],
+            )
+        )
+    else:
+        story.append(Paragraph("기간 내 기록이 없습니다.", styles["small"]))
+    return story
+
+
+def _build(story):
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buf, pagesize=A4,
+        leftMargin=18 * mm, rightMargin=18 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+    doc.build(story)
+    return buf.getvalue()
+
+
+def render_report_card(data):
+    """학생 한 명의 성적표 PDF (bytes)"""
+    return _build(_report_story(data, _styles()))
+
+
+def render_report_cards_merged(datas):
+    """여러 학생의 성적표를 학생마다 새 페이지로 이어 붙인 PDF 하나 (bytes)"""
+    styles = _styles()
+    story = []
+    for i, data in enumerate(datas):
+        if i:
+            story.append(PageBreak())
+        story += _report_story(data, styles)
+    return _build(story)
+
+
+def report_file_name(data):
+    student = data["student"]
+    return f"{student.get('grade') or '-'}_{student['name']}_{student['id']}.pdf"
+
+
+def _chunks(items, n):
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def generate_report_cards(datas, output="zip", executor=None, workers=1):
+    """
+    성적표 일괄 생성.
+    output="zip": 학생별 PDF 를 zip 하나로 / output="pdf": 합친 PDF 하나로
+    executor 가 있으면 학생(또는 학생 묶음) 단위로 나눠 병렬 렌더링한다.
+    """
+    if output == "zip":
+        if executor is not None:
+            # 작업 단위가 너무 잘면 프로세스 간 왕복 비용이 커지므로 묶어서 보낸다
+            chunksize = max(1, len(datas) // (workers * 4))
+            pdfs = executor.map(render_report_card, datas, chunksize=chunksize)
+        else:
+            pdfs = map(render_report_card, datas)
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            for data, pdf in zip(datas, pdfs):
+                zf.writestr(report_file_name(data), pdf)
+        return buf.getvalue()
+
+    # 합친 PDF: 조각을 병렬로 만들고 pypdf 로 이어 붙인다
+    if executor is None or PdfWriter is None or len(datas) < 2:
+        return render_report_cards_merged(datas)
+    parts = list(executor.map(render_report_cards_merged, _chunks(datas, workers)))
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(io.BytesIO(part))
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
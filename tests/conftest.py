@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """임시 academy.db 에 마이그레이션까지 적용한 app 모듈"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "DB_NAME", str(tmp_path / "academy.db"))
+    app._get_db_pool.clear()
+    app._get_query_cache.clear()
+    app.run_migrations()
+    yield app
+    app._get_db_pool.clear()
+    app._get_query_cache.clear()
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+
+import pytest
+
+
+def _seed_old_attendance(app, year, n=5):
+    conn = app.get_connection()
+    conn.execute("INSERT INTO students (id, name) VALUES (1, '홍길동')")
+    conn.executemany(
+        """
+        INSERT INTO attendance (student_id, date, status, checkin_time, via)
+        VALUES (1, ?, '정상출석', '15:00:00', '수동')
+        """,
+        [(f"{year}-04-{day:02d}",) for day in range(1, n + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_abandoned_export_detaches_archive(app_db):
+    _seed_old_attendance(app_db, 2020)
+    app_db.archive_academic_year(2020)
+
+    chunks = app_db.iter_export_chunks("attendance", chunk_rows=1)
+    assert len(next(chunks)) == 1
+    chunks.close()      # 커서를 읽는 도중에 그만둠
+
+    # 풀에 돌아간 연결에 보관 DB가 붙어 있으면 안 된다
+    pool = app_db._get_db_pool()
+    while not pool.empty():
+        conn = pool.get_nowait()
+        names = [row[1] for row in conn.execute("PRAGMA database_list")]
+        assert names == ["main"]
+
+    rows = [r for chunk in app_db.iter_export_chunks("attendance") for r in chunk]
+    assert len(rows) == 5
+
+
+def test_archive_file_is_backed_up(app_db):
+    _seed_old_attendance(app_db, 2020)
+    app_db.archive_academic_year(2020)
+
+    path = app_db.archive_file_path(2020)
+    backup = app_db.db_backup.archive_backup_path(path, app_db.db_backup.BACKUP_DIR)
+    ok, message = app_db.db_backup.verify_snapshot(backup)
+    assert ok, message
+
+
+def test_missing_archive_file_is_skipped(app_db):
+    _seed_old_attendance(app_db, 2020)
+    app_db.archive_academic_year(2020)
+    os.remove(app_db.archive_file_path(2020))
+
+    with app_db.history_connection(["attendance"]) as (conn, src):
+        assert src["attendance"] == "attendance"
+        count = conn.execute(f"SELECT COUNT(*) FROM {src['attendance']}").fetchone()[0]
+    assert count == 0
+
+
+def test_edit_during_archive_aborts_delete(app_db, monkeypatch):
+    _seed_old_attendance(app_db, 2020)
+    backup_archive = app_db.db_backup.backup_archive
+
+    def edit_then_backup(path, backup_dir):
+        # 복사와 삭제 사이에 지난 기록이 수정됨
+        conn = app_db.get_connection()
+        conn.execute("UPDATE attendance SET status='지각' WHERE date='2020-04-01'")
+        conn.commit()
+        conn.close()
+        return backup_archive(path, backup_dir)
+
+    monkeypatch.setattr(app_db.db_backup, "backup_archive", edit_then_backup)
+    with pytest.raises(sqlite3.DatabaseError):
+        app_db.archive_academic_year(2020)
+
+    conn = app_db.get_connection()
+    status = conn.execute(
+        "SELECT status FROM attendance WHERE date='2020-04-01'"
+    ).fetchone()[0]
+    remaining = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    assert (status, remaining) == ("지각", 5)
+
+    monkeypatch.setattr(app_db.db_backup, "backup_archive", backup_archive)
+    app_db.archive_academic_year(2020)
+    with app_db.history_connection(["attendance"]) as (conn, src):
+        status = conn.execute(
+            f"SELECT status FROM {src['attendance']} WHERE date='2020-04-01'"
+        ).fetchone()[0]
+    assert status == "지각"
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+
+def _frame(rows, columns):
+    return pd.DataFrame(rows, columns=columns, dtype=str)
+
+
+def test_existing_student_with_null_school_is_rejected(app_db):
+    app_db.add_student("김철수", None, "중2학년", None, None)
+    df = _frame([["김철수", "", "중 2"], ["이영희", "", "중2"]], ["이름", "학교", "학년"])
+
+    valid, errors = app_db.validate_bulk_import("students", df)
+    assert list(valid["name"]) == ["이영희"]
+    assert list(errors["사유"]) == ["이미 등록된 학생"]
+
+
+def test_scores_match_students_with_unnormalized_grade(app_db):
+    app_db.add_student("김철수", None, "중2학년", None, None)
+    df = _frame(
+        [["김철수", "중2", "2026-05-01", "수학", "90"]],
+        ["이름", "학년", "날짜", "과목", "점수"],
+    )
+    valid, errors = app_db.validate_bulk_import("school_scores", df)
+    assert errors.empty
+    assert app_db.apply_bulk_import("school_scores", valid) == 1
+
+
+def test_apply_students_stores_blanks_as_null(app_db):
+    app_db.add_class("A반", "중등", "")
+    df = _frame(
+        [["김철수", "", "중1", "", "", "A반"], ["이영희", "한빛중", "중2", "", "", ""]],
+        ["이름", "학교", "학년", "부모님 연락처", "비고", "반"],
+    )
+    valid, errors = app_db.validate_bulk_import("students", df)
+    assert errors.empty
+    assert app_db.apply_bulk_import("students", valid) == 2
+
+    conn = app_db.get_connection()
+    rows = conn.execute(
+        "SELECT name, school, parent_phone, memo FROM students ORDER BY id"
+    ).fetchall()
+    assigned = conn.execute(
+        "SELECT s.name FROM class_students cs JOIN students s ON s.id=cs.student_id"
+    ).fetchall()
+    conn.close()
+    assert rows == [("김철수", None, None, None), ("이영희", "한빛중", None, None)]
+    assert assigned == [("김철수",)]
+
+
+def test_apply_is_one_transaction(app_db):
+    app_db.add_class("A반", "중등", "")
+    conn = app_db.get_connection()
+    conn.execute(
+        """
+        CREATE TRIGGER fail_assign BEFORE INSERT ON class_students
+        BEGIN SELECT RAISE(ABORT, 'boom'); END
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    df = _frame([["김철수", "중1", "A반"]], ["이름", "학년", "반"])
+    valid, _ = app_db.validate_bulk_import("students", df)
+    with pytest.raises(sqlite3.IntegrityError):
+        app_db.apply_bulk_import("students", valid)
+
+    conn = app_db.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import db_backup
+
+
+@pytest.fixture
+def live_db(tmp_path):
+    path = str(tmp_path / "academy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, token_version INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.execute("INSERT INTO notes (body) VALUES ('처음')")
+    conn.execute("INSERT INTO users (id, token_version) VALUES (1, 0)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_create_and_verify(live_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    path = db_backup.create_snapshot(live_db, backup_dir)
+    assert db_backup.verify_snapshot(path) == (True, "ok")
+    assert _query(path, "SELECT body FROM notes") == [("처음",)]
+    assert [s["path"] for s in db_backup.list_snapshots(backup_dir)] == [path]
+
+
+def test_verify_reports_corruption(tmp_path):
+    bad = tmp_path / "academy-20260101-000000.db"
+    bad.write_bytes(b"not a database" * 100)
+    ok, _ = db_backup.verify_snapshot(str(bad))
+    assert not ok
+
+
+def test_prune_keeps_one_per_bucket(live_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    base = datetime(2026, 5, 1, 10, 0, 0)
+    for minutes in (0, 10, 20, 70):
+        db_backup.create_snapshot(live_db, backup_dir, now=base + timedelta(minutes=minutes))
+
+    removed = db_backup.prune_snapshots(
+        backup_dir, {"hourly": 24, "daily": 0, "weekly": 0}
+    )
+    assert sorted(removed) == ["academy-20260501-100000.db", "academy-20260501-101000.db"]
+    assert [s["name"] for s in db_backup.list_snapshots(backup_dir)] == [
+        "academy-20260501-111000.db", "academy-20260501-102000.db",
+    ]
+
+
+def test_restore_keeps_pre_restore_snapshot_and_revokes_tokens(live_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    snapshot = db_backup.create_snapshot(live_db, backup_dir)
+
+    conn = sqlite3.connect(live_db)
+    conn.execute("INSERT INTO notes (body) VALUES ('나중')")
+    conn.execute("UPDATE users SET token_version=3 WHERE id=1")   # 로그아웃으로 폐기
+    conn.commit()
+    conn.close()
+
+    before = db_backup.restore_snapshot(snapshot, live_db, backup_dir)
+    assert _query(live_db, "SELECT body FROM notes") == [("처음",)]
+    assert _query(live_db, "SELECT token_version FROM users") == [(4,)]
+
+    # 같은 시간대에 백업을 더 해도 복원 직전 스냅샷은 정리되지 않는다
+    assert os.path.basename(before).startswith(db_backup.PRE_RESTORE_PREFIX)
+    db_backup.create_snapshot(live_db, backup_dir)
+    db_backup.prune_snapshots(backup_dir)
+    assert os.path.exists(before)
+    assert _query(before, "SELECT body FROM notes") == [("처음",), ("나중",)]
+    assert [s["path"] for s in db_backup.list_snapshots(
+        backup_dir, db_backup.PRE_RESTORE_PREFIX
+    )] == [before]
@@ -0,0 +1,61 @@
+import io
+import os
+import sqlite3
+
+import pytest
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def _add(app, data, student_id=1):
+    staged = app.stage_uploaded_file(_Upload(data, "exam.pdf"), student_id)
+    return app.add_exam_document(
+        student_id, "수학", "중간", "1학기 중간", "2026-04-20", "", "", staged, 1
+    )
+
+
+def test_shared_blob_removed_with_last_reference(app_db):
+    path1 = _add(app_db, b"same content")
+    path2 = _add(app_db, b"same content")
+    assert path1 == path2
+
+    conn = app_db.get_connection()
+    ids = [r[0] for r in conn.execute("SELECT id FROM exam_documents ORDER BY id")]
+    conn.close()
+
+    app_db.delete_exam_document(ids[0])
+    assert os.path.exists(path1)
+    app_db.delete_exam_document(ids[1])
+    assert not os.path.exists(path1)
+    assert not os.listdir(os.path.dirname(path1))
+
+
+def test_failed_insert_removes_new_blob(app_db, monkeypatch):
+    staged = app_db.stage_uploaded_file(_Upload(b"orphan", "exam.pdf"), 1)
+    blob = app_db._blob_path(staged["content_hash"], staged["ext"])
+    with pytest.raises(sqlite3.IntegrityError):
+        # student_id NOT NULL 위반으로 INSERT 실패
+        app_db.add_exam_document(
+            None, "수학", "중간", "x", "2026-04-20", "", "", staged, 1
+        )
+    assert not os.path.exists(blob)
+    assert not os.path.exists(staged["tmp_path"])
+
+
+def test_failed_thumbnail_is_remembered(app_db, monkeypatch):
+    path = _add(app_db, b"not really a png")
+    os.rename(path, path + ".png")
+    path += ".png"
+
+    assert app_db.ensure_thumbnail(path, "abc123") is None
+    assert os.path.exists(app_db._thumbnail_failed_path("abc123"))
+
+    def fail_open(*args, **kwargs):
+        raise AssertionError("실패한 파일을 다시 열면 안 됨")
+
+    monkeypatch.setattr(app_db.Image, "open", fail_open)
+    assert app_db.ensure_thumbnail(path, "abc123") is None
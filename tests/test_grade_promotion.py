@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+
+def _add_students(app_db, grades):
+    conn = app_db.get_connection()
+    ids = []
+    for i, grade in enumerate(grades):
+        cur = conn.execute(
+            "INSERT INTO students (name, grade) VALUES (?, ?)", (f"학생{i}", grade)
+        )
+        ids.append(cur.lastrowid)
+    conn.execute(
+        "INSERT OR REPLACE INTO settings (key, value) VALUES ('last_grade_promotion_year', ?)",
+        (str(datetime.now().year - 1),),
+    )
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def _grades(app_db, ids):
+    conn = app_db.get_connection()
+    rows = dict(conn.execute("SELECT id, grade FROM students").fetchall())
+    conn.close()
+    return [rows[i] for i in ids]
+
+
+@pytest.mark.parametrize(
+    "grade, expected",
+    [
+        ("중1학년", "중2"),
+        ("중1 ", "중2"),
+        ("중3", "고1"),
+        ("초6", "중1"),
+        ("고3", "졸업"),
+        ("졸업", "졸업"),
+        ("대학생", "대학생"),
+        ("", ""),
+        (None, None),
+    ],
+)
+def test_promotion_matches_one_step_rule(app_db, grade, expected):
+    ids = _add_students(app_db, [grade])
+    app_db.promote_all_students_if_needed()
+    assert _grades(app_db, ids) == [expected]
+    if grade is not None:
+        assert app_db._promote_grade_one_step(grade) == (expected or "")
+
+
+def test_promotes_once_per_year(app_db):
+    ids = _add_students(app_db, ["중1학년", "고2", "기타"])
+    assert app_db.promote_all_students_if_needed() == 2
+    assert app_db.promote_all_students_if_needed() is None
+    assert _grades(app_db, ids) == ["중2", "고3", "기타"]
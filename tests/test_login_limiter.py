@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture
+def limiter(app_db):
+    app_db._get_login_limiter.clear()
+    yield app_db
+    app_db._get_login_limiter.clear()
+
+
+def _fail_until_blocked(app, username, client_id, ip_address):
+    for _ in range(app.LOGIN_BURST):
+        allowed, _ = app.check_login_allowed(username, client_id, ip_address)
+        assert allowed
+        app.record_login_result(username, client_id, False, ip_address)
+    allowed, _ = app.check_login_allowed(username, client_id, ip_address)
+    assert not allowed
+
+
+def test_stranger_cannot_lock_out_the_owner(limiter):
+    _fail_until_blocked(limiter, "victim", "attacker-session", "203.0.113.9")
+
+    allowed, _ = limiter.check_login_allowed("victim", "owner-session", "198.51.100.7")
+    assert allowed
+
+
+def test_new_session_from_same_address_stays_limited(limiter):
+    _fail_until_blocked(limiter, "victim", "attacker-session", "203.0.113.9")
+
+    allowed, _ = limiter.check_login_allowed("victim", "fresh-session", "203.0.113.9")
+    assert not allowed
+    # 같은 주소의 다른 계정(예: 같은 와이파이의 다른 학생)은 막히지 않는다
+    allowed, _ = limiter.check_login_allowed("classmate", "other-session", "203.0.113.9")
+    assert allowed
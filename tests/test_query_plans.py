@@ -0,0 +1,53 @@
+import inspect
+import re
+
+# 화면 함수는 대상이 아님 (조회는 데이터 함수로 검사)
+UI_PREFIXES = ("admin_", "master_", "student_")
+USES_CONNECTION = re.compile(r"get_connection\(\)|history_connection\(|db_transaction\(\)")
+RUNS_QUERY = re.compile(r"\bSELECT\b|_export_query\(|_existing_pairs\(")
+
+
+def _query_functions(app):
+    """연결을 열어 조회하는 app 모듈의 데이터 함수 이름"""
+    names = set()
+    for name, func in vars(app).items():
+        if not inspect.isfunction(func) or func.__module__ != app.__name__:
+            continue
+        if name.startswith(UI_PREFIXES):
+            continue
+        source = inspect.getsource(getattr(func, "__wrapped__", func))
+        if USES_CONNECTION.search(source) and RUNS_QUERY.search(source):
+            names.add(name)
+    return names
+
+
+def test_no_full_scans(app_db):
+    assert app_db.find_full_scans() == {}
+
+
+def test_every_query_function_is_checked_or_excluded(app_db):
+    checked = {func_name for func_name, _ in app_db.QUERY_PLAN_CHECKS.values()}
+    excluded = set(app_db.QUERY_PLAN_EXCLUDED)
+    assert not checked & excluded
+    assert _query_functions(app_db) - checked - excluded == set()
+    assert excluded - _query_functions(app_db) == set()
+
+
+def test_missing_index_is_reported(app_db):
+    conn = app_db.get_connection()
+    conn.execute("DROP INDEX idx_attendance_student_date")
+    conn.commit()
+    conn.close()
+
+    problems = app_db.find_full_scans()
+    assert "get_recent_attendance_for_student" in problems
+
+
+def test_aliased_scan_is_reported_by_table(app_db):
+    conn = app_db.get_connection()
+    conn.execute("DROP INDEX idx_vocab_results_taken")
+    conn.commit()
+    conn.close()
+
+    problems = app_db.find_full_scans()
+    assert problems["iter_export_chunks.vocab_results"] == ["SCAN vr (vocab_results)"]
@@ -0,0 +1,64 @@
+import io
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import report_cards
+
+
+def _seed_students(app, names):
+    conn = app.get_connection()
+    conn.executemany(
+        "INSERT INTO students (id, name, school, grade) VALUES (?, ?, ?, '중2')",
+        [(i, name, None if i % 2 else "<학교>") for i, name in enumerate(names, 1)],
+    )
+    conn.executemany(
+        """
+        INSERT INTO academy_scores (student_id, date, subject, test_name, score, max_score)
+        VALUES (?, '2026-05-01', '수학', '단원평가', 80, 100)
+        """,
+        [(i,) for i in range(1, len(names) + 1)],
+    )
+    conn.commit()
+    conn.close()
+    return list(range(1, len(names) + 1))
+
+
+def test_collect_and_render_sequentially(app_db):
+    ids = _seed_students(app_db, ["김철수 <b", "이영희 & 친구"])
+    datas = app_db.collect_report_card_data(ids, "2026-03-01", "2026-06-30")
+    assert [d["student"]["id"] for d in datas] == ids
+    assert datas[0]["academy_scores"] == [("2026-05-01", "수학", "단원평가", 80, 100)]
+
+    payload = report_cards.generate_report_cards(datas, output="zip")
+    with zipfile.ZipFile(io.BytesIO(payload)) as zf:
+        names = zf.namelist()
+        assert names == [report_cards.report_file_name(d) for d in datas]
+        assert zf.read(names[0]).startswith(b"%PDF")
+
+    assert report_cards.generate_report_cards(datas, output="pdf").startswith(b"%PDF")
+
+
+class _BrokenExecutor:
+    def map(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_broken_pool_falls_back_to_sequential(app_db, monkeypatch):
+    ids = _seed_students(app_db, ["김철수", "이영희"])
+    cleared = []
+
+    class _Factory:
+        def __call__(self):
+            return _BrokenExecutor()
+
+        def clear(self):
+            cleared.append(True)
+
+    monkeypatch.setattr(app_db, "_get_report_executor", _Factory())
+    payload, count = app_db.build_report_cards(ids, "2026-03-01", "2026-06-30")
+    assert count == 2 and cleared
+    with zipfile.ZipFile(io.BytesIO(payload)) as zf:
+        assert len(zf.namelist()) == 2
@@ -0,0 +1,29 @@
+import pytest
+
+
+def test_moving_average_skips_exams_without_percent(app_db):
+    conn = app_db.get_connection()
+    conn.execute("INSERT INTO students (id, name) VALUES (1, '김철수')")
+    conn.executemany(
+        """
+        INSERT INTO academy_scores (student_id, date, subject, test_name, score, max_score)
+        VALUES (1, ?, '수학', ?, ?, ?)
+        """,
+        [
+            ("2026-03-01", "1차", 80, 100),
+            ("2026-03-08", "2차", 90, 0),       # 만점 0 → 백분율 없음
+            ("2026-03-15", "3차", 60, 100),
+            ("2026-03-22", "4차", 70, 100),
+            ("2026-03-29", "5차", 100, 100),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    app_db._score_analytics.clear()
+    scores = app_db.get_score_analytics()["scores"]
+    moving = scores.sort_values("date")["moving_avg"].tolist()
+
+    assert moving[0] == pytest.approx(80)
+    assert moving[1] != moving[1]       # NaN
+    assert moving[2:] == pytest.approx([70, 70, (60 + 70 + 100) / 3])